@@ -8,18 +8,9 @@ import sys
 from pathlib import Path
 from dotenv import load_dotenv
 
-# Proje modüllerini içe aktar
-from src.data_processor import DataProcessor
+# Proje modüllerini içe aktar (DataProcessor is imported in main(), after argument parsing)
+from src.utils.logger import setup_logger, parse_log_rates, shutdown_logging
 
-# Logging configuration
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("logs/app.log"),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
 # Global değişkenler
@@ -30,6 +21,7 @@ def signal_handler(sig, frame):
     logger.info("Shutting down...")
     if processor:
         processor.stop()
+    shutdown_logging()
     sys.exit(0)
 
 def main():
@@ -41,15 +33,12 @@ def main():
     parser.add_argument("--log-level", type=str, default="INFO", 
                         choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
                         help="Set the logging level")
+    parser.add_argument("--role", type=str, default=None,
+                        help="Process role: all, ingest-sensors, ingest-social, collect or report "
+                             "(default: ROLE environment variable, or all)")
     
     args = parser.parse_args()
     
-    # Set log level
-    logging.getLogger().setLevel(getattr(logging, args.log_level))
-    
-    # Create log directory
-    Path("logs").mkdir(exist_ok=True)
-    
     # Create data directory
     Path("data/reports").mkdir(parents=True, exist_ok=True)
     
@@ -59,12 +48,23 @@ def main():
     # Configuration dictionary
     config = {key: os.getenv(key) for key in os.environ}
     
+    # Logging configuration (root logger, shared by all modules)
+    setup_logger(
+        log_level=getattr(logging, args.log_level),
+        log_file=config.get("LOG_FILE", "logs/app.log"),
+        async_mode=config.get("LOG_ASYNC", "false").lower() == "true",
+        json_format=config.get("LOG_FORMAT", "text").lower() == "json",
+        sample_rates=parse_log_rates(config.get("LOG_SAMPLE_RATES")),
+        rate_limits=parse_log_rates(config.get("LOG_RATE_LIMITS"))
+    )
+    
     try:
         # SIGINT (Ctrl+C) sinyalini ele al
         signal.signal(signal.SIGINT, signal_handler)
         
         # Create and start data processor
-        processor = DataProcessor(config)
+        from src.data_processor import DataProcessor
+        processor = DataProcessor(config, role=args.role)
         processor.start()
         
         logger.info("Application started. Press Ctrl+C to exit.")
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+import json
+import time
+import logging
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Projenin kök dizinini ekle
+sys.path.append(str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("backfill_enrichment")
+
+SOURCES = ("sql", "mongo", "trends")
+
+# Sentiment model of the worker process
+_connector = None
+
+def _init_worker():
+    global _connector
+    from src.social_media_connector import SocialMediaConnector
+
+    _connector = SocialMediaConnector()
+
+def score_chunk(texts):
+    """Sentiment of each text; runs in a worker process"""
+    return [_connector.analyze_sentiment(text or "") for text in texts]
+
+class Checkpoint:
+    """Position reached per source, in a JSON file rewritten after every chunk"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.positions = {}
+        if self.path.exists():
+            with open(self.path) as f:
+                self.positions = json.load(f)
+
+    def get(self, source):
+        return self.positions.get(source)
+
+    def set(self, source, position):
+        self.positions[source] = position
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Written to a temporary file first so an interrupted run never leaves half a checkpoint
+        temporary = self.path.with_suffix(".tmp")
+        with open(temporary, "w") as f:
+            json.dump(self.positions, f)
+        os.replace(temporary, self.path)
+
+class Progress:
+    """Logs rows scanned and updated, throughput and ETA every interval seconds"""
+
+    def __init__(self, name, total, interval=10.0):
+        self.name = name
+        self.total = total
+        self.interval = interval
+        self.scanned = 0
+        self.updated = 0
+        self.skipped = 0
+        self.started = time.perf_counter()
+        self._logged = self.started
+
+    def add(self, scanned, updated, skipped=0):
+        self.scanned += scanned
+        self.updated += updated
+        self.skipped += skipped
+        now = time.perf_counter()
+        if now - self._logged >= self.interval:
+            self._logged = now
+            self.log()
+
+    def log(self, final=False):
+        elapsed = time.perf_counter() - self.started
+        rate = self.scanned / elapsed if elapsed else 0.0
+        message = f"{self.name}: {self.scanned}/{self.total} rows scanned, {self.updated} updated, {self.skipped} skipped ({rate:.0f} rows/s"
+        if not final and rate and self.total > self.scanned:
+            message += f", about {(self.total - self.scanned) / rate:.0f}s left"
+        logger.info(message + ")")
+
+def rescore(name, chunks, write, pool, checkpoint, inflight, dry_run=False):
+    """Score chunks of (key, text, old sentiment) in the pool and write back the changed ones
+
+    chunks yields (position, rows); rows whose text is None cannot be scored
+    the way they originally were and are left alone. At most inflight chunks
+    are scored at a time, and results are written in order, so the
+    checkpoint always points at the end of a written chunk and memory stays
+    bounded by the chunk size.
+    """
+    pending = deque()
+    progress = Progress(name, chunks.total)
+
+    def finish():
+        future, position, rows = pending.popleft()
+        scored = [(key, old) for key, text, old in rows if text is not None]
+        changes = [
+            (key, sentiment)
+            for (key, old), sentiment in zip(scored, future.result())
+            if old is None or abs(old - sentiment) > 1e-9
+        ]
+        if changes and not dry_run:
+            write(changes)
+        if not dry_run:
+            checkpoint.set(name, position)
+        progress.add(len(rows), len(changes), len(rows) - len(scored))
+
+    for position, rows in chunks:
+        texts = [text for _, text, _ in rows if text is not None]
+        pending.append((pool.submit(score_chunk, texts), position, rows))
+        if len(pending) >= inflight:
+            finish()
+    while pending:
+        finish()
+
+    progress.log(final=True)
+    return progress.scanned, progress.updated
+
+class SqlPosts:
+    """social_media_posts in keyset chunks: short read transactions, resumable at any id
+
+    SQL only keeps the body of a post, but Reddit posts were scored on
+    "title body". Their titles are looked up in the reddit_data collection
+    (documents without a title, i.e. comments, are scored on the body);
+    Reddit rows that are not found there, or all of them when reddit_posts
+    is None, are skipped rather than scored differently.
+    """
+
+    def __init__(self, engine, start, chunk_size, reddit_posts=None):
+        from sqlalchemy import func, select
+
+        from src.database_manager import SocialMediaPost, SocialPlatform
+
+        self.engine = engine
+        self.posts = SocialMediaPost.__table__
+        self.start = start or 0
+        self.chunk_size = chunk_size
+        self.reddit_posts = reddit_posts
+        if reddit_posts is not None:
+            reddit_posts.create_index("id")
+        platforms = SocialPlatform.__table__
+        with engine.connect() as connection:
+            self.total = connection.execute(
+                select(func.count()).select_from(self.posts).where(self.posts.c.id > self.start)
+            ).scalar()
+            self.reddit_id = connection.execute(
+                select(platforms.c.id).where(platforms.c.name == "reddit")
+            ).scalar()
+
+    def __iter__(self):
+        from sqlalchemy import select
+
+        from src.post_writer import post_content
+
+        posts = self.posts
+        last = self.start
+        while True:
+            with self.engine.connect() as connection:
+                rows = connection.execute(
+                    select(posts.c.id, posts.c.platform, posts.c.platform_id, posts.c.post_id,
+                           posts.c.content, posts.c.content_compressed, posts.c.sentiment)
+                    .where(posts.c.id > last)
+                    .order_by(posts.c.id)
+                    .limit(self.chunk_size)
+                ).all()
+            if not rows:
+                return
+            last = rows[-1].id
+
+            reddit = [row for row in rows if self._is_reddit(row)]
+            titles = self._reddit_titles([row.post_id for row in reddit]) if reddit else {}
+            chunk = []
+            for row in rows:
+                text = post_content(row)
+                if self._is_reddit(row):
+                    if row.post_id not in titles:
+                        text = None
+                    elif titles[row.post_id]:
+                        text = f"{titles[row.post_id]} {text or ''}"
+                chunk.append((row.id, text, row.sentiment))
+            yield last, chunk
+
+    def _is_reddit(self, row):
+        # Rows written before the lookup table keep the name in platform
+        if row.platform_id is None:
+            return row.platform == "reddit"
+        return row.platform_id == self.reddit_id
+
+    def _reddit_titles(self, post_ids):
+        """post id -> title (None for comments) of the Reddit documents that exist"""
+        if self.reddit_posts is None:
+            return {}
+        return {
+            document["id"]: document.get("title")
+            for document in self.reddit_posts.find({"id": {"$in": post_ids}}, {"id": 1, "title": 1})
+        }
+
+    def write(self, changes):
+        from sqlalchemy import bindparam
+
+        statement = (
+            self.posts.update()
+            .where(self.posts.c.id == bindparam("row_id"))
+            .values(sentiment=bindparam("new_sentiment"))
+        )
+        with self.engine.begin() as connection:
+            connection.execute(statement, [{"row_id": key, "new_sentiment": sentiment} for key, sentiment in changes])
+
+class MongoPosts:
+    """Documents of a {platform}_data collection in _id order from one server-side cursor"""
+
+    def __init__(self, collection, start, chunk_size):
+        self.collection = collection
+        self.start = _object_id(start)
+        self.chunk_size = chunk_size
+        self.query = {"_id": {"$gt": self.start}} if self.start is not None else {}
+        self.total = collection.count_documents(self.query)
+
+    def __iter__(self):
+        cursor = (
+            self.collection.find(self.query, {"title": 1, "content": 1, "sentiment": 1})
+            .sort("_id", 1)
+            .batch_size(self.chunk_size)
+        )
+        rows = []
+        for document in cursor:
+            # Reddit posts were scored on "title body", comments and tweets on their text
+            text = " ".join(part for part in (document.get("title"), document.get("content")) if part)
+            rows.append((document["_id"], text, document.get("sentiment")))
+            if len(rows) >= self.chunk_size:
+                yield str(rows[-1][0]), rows
+                rows = []
+        if rows:
+            yield str(rows[-1][0]), rows
+
+    def write(self, changes):
+        from pymongo import UpdateOne
+
+        self.collection.bulk_write(
+            [UpdateOne({"_id": key}, {"$set": {"sentiment": sentiment}}) for key, sentiment in changes],
+            ordered=False
+        )
+
+def _object_id(value):
+    if value is None:
+        return None
+    from bson import ObjectId
+
+    return ObjectId(value) if ObjectId.is_valid(value) else value
+
+def recompute_trends(database, platform, key_field, keys, days=7):
+    """Store fresh {platform}_trends snapshots for each query/subreddit, aggregated by MongoDB
+
+    Same shape as SocialMediaConnector.analyze_trends() over the posts of
+    the last days; the posts never leave the server.
+    """
+    collection = database[f"{platform}_data"]
+    start = (datetime.now() - timedelta(days=days)).isoformat()
+    saved = 0
+    for key in keys:
+        match = {"created_at": {"$gte": start}}
+        if key_field == "subreddit":
+            match["subreddit"] = {"$regex": f"^{re.escape(key)}$", "$options": "i"}
+        elif key.startswith("#"):
+            match["hashtags"] = {"$regex": f"^#?{re.escape(key[1:])}$", "$options": "i"}
+        else:
+            match["content"] = {"$regex": re.escape(key), "$options": "i"}
+
+        daily = list(collection.aggregate([
+            {"$match": match},
+            {"$group": {
+                "_id": {"$substr": ["$created_at", 0, 10]},
+                "count": {"$sum": 1},
+                "sentiment": {"$avg": "$sentiment"}
+            }},
+            {"$sort": {"_id": 1}}
+        ]))
+        if not daily:
+            continue
+
+        trends = {
+            "daily_activity": [{"date": day["_id"], "count": day["count"]} for day in daily],
+            "sentiment_distribution": [
+                {"sentiment": bucket["_id"], "count": bucket["count"]}
+                for bucket in collection.aggregate([
+                    {"$match": dict(match, sentiment={"$type": "number"})},
+                    {"$group": {
+                        "_id": {"$cond": [
+                            {"$lte": ["$sentiment", -0.3]}, "Negative",
+                            {"$cond": [{"$lte": ["$sentiment", 0.3]}, "Neutral", "Positive"]}
+                        ]},
+                        "count": {"$sum": 1}
+                    }},
+                    {"$sort": {"count": -1}}
+                ])
+            ],
+            "sentiment_over_time": [
+                {"date": day["_id"], "sentiment": day["sentiment"]} for day in daily if day["sentiment"] is not None
+            ]
+        }
+        if platform == "twitter":
+            trends["top_hashtags"] = [
+                {"hashtag": tag["_id"], "count": tag["count"]}
+                for tag in collection.aggregate([
+                    {"$match": match},
+                    {"$unwind": "$hashtags"},
+                    {"$group": {"_id": "$hashtags", "count": {"$sum": 1}}},
+                    {"$sort": {"count": -1}},
+                    {"$limit": 10}
+                ])
+            ]
+
+        database[f"{platform}_trends"].insert_one({
+            key_field: key,
+            "timestamp": datetime.now().isoformat(),
+            "trends": trends,
+            "backfill": True
+        })
+        saved += 1
+    logger.info(f"Recomputed {saved} {platform} trend snapshots over the last {days} days")
+    return saved
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute sentiment and trend snapshots of stored social posts")
+    parser.add_argument("--sources", type=str, default=",".join(SOURCES),
+                        help="Comma separated: sql (social_media_posts), mongo ({platform}_data), trends ({platform}_trends)")
+    parser.add_argument("--collections", type=str, default="twitter_data,reddit_data",
+                        help="MongoDB collections to re-score")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Scoring processes")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="Rows per read, scoring task and bulk update")
+    parser.add_argument("--checkpoint", type=str, default="data/backfill_checkpoint.json",
+                        help="Resume positions; an interrupted run continues where it stopped")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start from the beginning")
+    parser.add_argument("--trend-days", type=int, default=7, help="Window of recomputed trend snapshots")
+    parser.add_argument("--dry-run", action="store_true", help="Score and report changes without writing them")
+
+    args = parser.parse_args()
+    sources = [source.strip() for source in args.sources.split(",") if source.strip()]
+    unknown = set(sources) - set(SOURCES)
+    if unknown:
+        parser.error(f"unknown sources: {', '.join(sorted(unknown))}")
+
+    load_dotenv()
+    from src.collection_scheduler import parse_targets
+    from src.database_manager import DatabaseManager
+
+    stores = ["sql"] if "sql" in sources else []
+    if stores or "mongo" in sources or "trends" in sources:
+        # The SQL pass reads Reddit titles from MongoDB
+        stores.append("mongo")
+    db_manager = DatabaseManager(
+        sql_conn_string=os.getenv("SQL_CONN_STRING", "sqlite:///data/iot_social_data.db"),
+        mongo_conn_string=os.getenv("MONGO_CONN_STRING", "mongodb://localhost:27017/"),
+        stores=stores
+    )
+
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    checkpoint = Checkpoint(args.checkpoint)
+    # Enough queued chunks to keep every worker busy while the main process reads and writes
+    inflight = max(args.workers, 1) * 2
+
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as pool:
+            if "sql" in sources:
+                engine = db_manager.sql_engine
+                if engine is None:
+                    logger.error("SQL database is not available")
+                    sys.exit(1)
+                database = db_manager.mongo_db
+                if database is None:
+                    logger.warning("MongoDB is not available: Reddit posts in SQL are skipped (their titles are only stored there)")
+                reddit_posts = database["reddit_data"] if database is not None else None
+                posts = SqlPosts(engine, checkpoint.get("sql:social_media_posts"), args.chunk_size, reddit_posts)
+                rescore("sql:social_media_posts", posts, posts.write, pool, checkpoint, inflight, args.dry_run)
+
+            if "mongo" in sources:
+                database = db_manager.mongo_db
+                if database is None:
+                    logger.error("MongoDB is not available")
+                    sys.exit(1)
+                for collection_name in args.collections.split(","):
+                    name = f"mongo:{collection_name}"
+                    documents = MongoPosts(database[collection_name], checkpoint.get(name), args.chunk_size)
+                    rescore(name, documents, documents.write, pool, checkpoint, inflight, args.dry_run)
+
+        if "trends" in sources and not args.dry_run:
+            database = db_manager.mongo_db
+            if database is None:
+                logger.error("MongoDB is not available")
+                sys.exit(1)
+            recompute_trends(database, "twitter", "query",
+                             [name for name, _ in parse_targets(os.getenv("TWITTER_QUERIES"), "#IoT:1")],
+                             args.trend_days)
+            recompute_trends(database, "reddit", "subreddit",
+                             [name for name, _ in parse_targets(os.getenv("REDDIT_SUBREDDITS"), "IoT:1")],
+                             args.trend_days)
+    finally:
+        db_manager.close_connections()
+
+    if not args.dry_run:
+        # Their query caches keep closed windows without a TTL, and the dashboard keeps its snapshots in memory
+        logger.info("Restart running processors to serve the updated sentiment and trends")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+import time
+import queue
+import random
+import logging
+import argparse
+import functools
+import resource
+import subprocess
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+
+# Projenin kök dizinini ekle
+sys.path.append(str(Path(__file__).parent.parent))
+
+from paho.mqtt.client import topic_matches_sub
+
+# Logging configuration
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("benchmark")
+
+class InProcessBroker:
+    """Minimal MQTT broker stand-in: one queue, one delivery thread
+
+    Messages are delivered to subscribed clients on a single thread, like
+    paho's network loop. The time from publish to the end of on_message is
+    recorded as handler latency; with track_stored(processor), the time
+    until every store has written the message is recorded as end-to-end
+    latency.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.clients = []
+        self.latencies_ns = []
+        self.stored_latencies_ns = []
+        self.delivered = 0
+        self._processor = None
+        self._on_stored = None
+        self._thread = None
+
+    def track_stored(self, processor):
+        """Time each message until processor.on_message_stored runs for it"""
+        self._processor = processor
+        self._on_stored = processor.on_message_stored
+
+    def start(self):
+        self._thread = threading.Thread(target=self._deliver, name="broker", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.queue.put(None)
+        self._thread.join()
+
+    def publish(self, topic, payload):
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        self.queue.put((topic, payload, time.perf_counter_ns()))
+
+    def _deliver(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            topic, payload, published_at = item
+            message = _Message(topic, payload)
+            if self._processor is not None:
+                # on_mqtt_message binds the completion callback of the message's write group
+                # on this thread, so each message gets one that knows its publish time
+                self._processor.on_message_stored = functools.partial(self._stored, published_at)
+            for client in self.clients:
+                if any(topic_matches_sub(sub, topic) for sub in client.topics):
+                    client.client.on_message(client.client, None, message)
+            self.latencies_ns.append(time.perf_counter_ns() - published_at)
+            self.delivered += 1
+
+    def _stored(self, published_at, results):
+        # Runs on the store executor that finished the message's last write
+        self.stored_latencies_ns.append(time.perf_counter_ns() - published_at)
+        self._on_stored(results)
+
+class _Message:
+    __slots__ = ("topic", "payload", "qos", "retain")
+
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+        self.qos = 0
+        self.retain = False
+
+class _PahoLike:
+    """Holds the on_message callback, like paho's Client object"""
+
+    def __init__(self):
+        self.on_message = None
+
+class FakeMQTTClient:
+    """MQTTClient replacement connected to an InProcessBroker"""
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.client = _PahoLike()
+        self.topics = []
+        broker.clients.append(self)
+
+    def connect(self):
+        return True
+
+    def disconnect(self):
+        pass
+
+    def subscribe(self, topic):
+        self.topics.append(topic)
+
+    def publish(self, topic, message):
+        if isinstance(message, dict):
+            message = json.dumps(message)
+        self.broker.publish(topic, message)
+        return True
+
+class _FakeNeo4jResult:
+    def consume(self):
+        return None
+
+    def __iter__(self):
+        return iter(())
+
+class _FakeNeo4jSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, query, parameters=None, **kwargs):
+        self.driver.queries += 1
+        return _FakeNeo4jResult()
+
+    def execute_write(self, work, *args, **kwargs):
+        # The session doubles as the transaction
+        return work(self, *args, **kwargs)
+
+class FakeNeo4jDriver:
+    """Neo4j driver stand-in that only counts queries"""
+
+    def __init__(self):
+        self.queries = 0
+
+    def session(self, **kwargs):
+        return _FakeNeo4jSession(self)
+
+    def close(self):
+        pass
+
+def build_sensor_message(rng, sensor_count):
+    sensor_type = rng.choice(["temperature", "humidity", "pressure", "motion", "light"])
+    return f"sensors/{sensor_type}", json.dumps({
+        "sensor_id": f"{sensor_type}_sensor_{rng.randrange(sensor_count)}",
+        "value": round(rng.uniform(0, 100), 1),
+        "unit": "",
+        "timestamp": datetime.now().isoformat()
+    })
+
+def build_social_message(rng, user_count, index):
+    hashtags = ["IoT", "BigData", "MQTT", "Python", "DataScience", "AI", "ML"]
+    if rng.random() < 0.6:
+        user_id = f"user_{rng.randrange(user_count)}"
+        tags = rng.sample(hashtags, rng.randint(0, 3))
+        mentions = [f"user_{rng.randrange(user_count)}" for _ in range(rng.randint(0, 2))]
+        return "social/twitter", json.dumps({
+            "id": f"tweet_{index}",
+            "user_id": user_id,
+            "user_name": user_id,
+            "user_followers": rng.randint(10, 10000),
+            "content": f"Benchmark tweet {index} " + " ".join(f"#{tag}" for tag in tags),
+            "created_at": datetime.now().isoformat(),
+            "retweet_count": rng.randint(0, 100),
+            "favorite_count": rng.randint(0, 200),
+            "platform": "twitter",
+            "sentiment": round(rng.uniform(-1, 1), 2),
+            "hashtags": tags,
+            "mentions": mentions
+        })
+
+    post_id = f"post_{index}"
+    return "social/reddit", json.dumps({
+        "id": post_id,
+        "user_id": f"redditor_{rng.randrange(user_count)}",
+        "title": f"Benchmark post {index}",
+        "content": "Benchmark post body " * rng.randint(1, 50),
+        "created_at": datetime.now().isoformat(),
+        "score": rng.randint(1, 1000),
+        "num_comments": rng.randint(0, 50),
+        "platform": "reddit",
+        "subreddit": "IoT",
+        "sentiment": round(rng.uniform(-1, 1), 2)
+    })
+
+def build_processor(broker, workdir):
+    """DataProcessor wired to the in-process broker, SQLite, mongomock and a Neo4j fake"""
+    try:
+        import mongomock
+    except ImportError:
+        logger.error("mongomock is required for the benchmark: pip install -r requirements-dev.txt")
+        sys.exit(2)
+
+    from src.data_processor import DataProcessor
+    from src.database_manager import DatabaseManager
+    from src.social_media_connector import SocialMediaConnector
+
+    db_manager = DatabaseManager(
+        sql_conn_string=f"sqlite:///{workdir}/benchmark.db",
+        mongo_client=mongomock.MongoClient(),
+        neo4j_driver=FakeNeo4jDriver()
+    )
+    mqtt_client = FakeMQTTClient(broker)
+    processor = DataProcessor(
+        {"METRICS_PORT": "0"},
+        mqtt_client=mqtt_client,
+        db_manager=db_manager,
+        social_connector=SocialMediaConnector()
+    )
+    mqtt_client.subscribe("sensors/+")
+    mqtt_client.subscribe("social/+")
+    return processor
+
+def run_benchmark(args):
+    rng = random.Random(args.seed)
+    broker = InProcessBroker()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        processor = build_processor(broker, workdir)
+        broker.track_stored(processor)
+        broker.start()
+
+        # Open-loop producer: messages are published on schedule regardless of how fast they are consumed
+        started = time.perf_counter()
+        interval = 1.0 / args.rate if args.rate else 0.0
+        for index in range(args.messages):
+            if interval:
+                delay = started + index * interval - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            if rng.random() < args.sensor_ratio:
+                topic, payload = build_sensor_message(rng, args.sensors)
+            else:
+                topic, payload = build_social_message(rng, args.users, index)
+            broker.publish(topic, payload)
+        published = time.perf_counter()
+
+        broker.stop()
+        # Store writes run on the write coordinator's executors; they are part of the work
+        processor.drain()
+        finished = time.perf_counter()
+
+    from src.utils.metrics import REGISTRY
+
+    latencies = sorted(broker.stored_latencies_ns)
+    handler_latencies = sorted(broker.latencies_ns)
+    elapsed = finished - started
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "commit": _git_commit(),
+        "config": {
+            "messages": args.messages,
+            "rate": args.rate,
+            "sensor_ratio": args.sensor_ratio,
+            "sensors": args.sensors,
+            "users": args.users,
+            "seed": args.seed
+        },
+        "delivered": broker.delivered,
+        # Messages whose writes all completed; messages that write nothing are not counted
+        "stored": len(latencies),
+        "elapsed_seconds": elapsed,
+        "publish_seconds": published - started,
+        "messages_per_second": broker.delivered / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            "p50": _percentile(latencies, 0.50) / 1e6,
+            "p99": _percentile(latencies, 0.99) / 1e6,
+            "max": (latencies[-1] if latencies else 0) / 1e6
+        },
+        "handler_latency_ms": {
+            "p50": _percentile(handler_latencies, 0.50) / 1e6,
+            "p99": _percentile(handler_latencies, 0.99) / 1e6,
+            "max": (handler_latencies[-1] if handler_latencies else 0) / 1e6
+        },
+        # ru_maxrss is reported in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "stages": REGISTRY.snapshot()
+    }
+
+def _percentile(values, q):
+    if not values:
+        return 0
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=Path(__file__).parent.parent
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def compare(result, baseline, tolerance):
+    """Return a list of regressions of result against a baseline result"""
+    regressions = []
+    if result["messages_per_second"] < baseline["messages_per_second"] * (1 - tolerance):
+        regressions.append(
+            f"throughput {result['messages_per_second']:.0f} msg/s < baseline {baseline['messages_per_second']:.0f} msg/s"
+        )
+    for key in ("p50", "p99"):
+        if result["latency_ms"][key] > baseline["latency_ms"][key] * (1 + tolerance):
+            regressions.append(
+                f"{key} latency {result['latency_ms'][key]:.3f} ms > baseline {baseline['latency_ms'][key]:.3f} ms"
+            )
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end ingestion benchmark with in-process stand-ins")
+    parser.add_argument("--messages", type=int, default=20000, help="Number of messages to publish")
+    parser.add_argument("--rate", type=float, default=500, help="Target messages/sec (0 = as fast as possible)")
+    parser.add_argument("--sensor-ratio", type=float, default=0.7, help="Fraction of sensor messages in the mix")
+    parser.add_argument("--sensors", type=int, default=1000, help="Number of simulated sensors")
+    parser.add_argument("--users", type=int, default=5000, help="Number of simulated users")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for a reproducible workload")
+    parser.add_argument("--output", type=str, default="data/benchmarks", help="Directory for JSON results")
+    parser.add_argument("--compare", type=str, help="Baseline result JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative regression")
+
+    args = parser.parse_args()
+
+    result = run_benchmark(args)
+
+    output_dir = Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_file = output_dir / f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, "w") as f:
+        json.dump(result, f, indent=2)
+
+    print(f"Delivered:   {result['delivered']} messages in {result['elapsed_seconds']:.2f}s ({result['stored']} stored)")
+    print(f"Throughput:  {result['messages_per_second']:.0f} msg/s")
+    print(f"Latency:     p50 {result['latency_ms']['p50']:.3f} ms, p99 {result['latency_ms']['p99']:.3f} ms (until stored)")
+    print(f"Handler:     p50 {result['handler_latency_ms']['p50']:.3f} ms, p99 {result['handler_latency_ms']['p99']:.3f} ms")
+    print(f"Peak RSS:    {result['peak_rss_mb']:.1f} MB")
+    print(f"Results:     {output_file}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+import timeit
+import argparse
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+# Projenin kök dizinini ekle
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.records import SocialPost, msgpack
+
+def build_post_dict(index):
+    """A Reddit post as the connector used to return it"""
+    return {
+        "id": f"post_{index}",
+        "user_id": f"redditor_{index % 1000}",
+        "title": f"Benchmark post {index}",
+        "content": "Benchmark post body",
+        "created_at": datetime.now(),
+        "score": index % 500,
+        "upvote_ratio": 0.9,
+        "num_comments": index % 50,
+        "url": f"https://example.com/{index}",
+        "platform": "reddit",
+        "subreddit": "IoT",
+        "sentiment": 0.25
+    }
+
+def build_post_record(index):
+    return SocialPost.from_dict(build_post_dict(index))
+
+def measure_memory(build, count):
+    """Bytes allocated per item while holding count items"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    items = [build(index) for index in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del items
+    return allocated / count
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare dict and record encoding cost and memory")
+    parser.add_argument("--items", type=int, default=100000, help="Items held for the memory measurement")
+    parser.add_argument("--number", type=int, default=100000, help="Iterations per timing")
+
+    args = parser.parse_args()
+
+    post_dict = build_post_dict(1)
+    post_record = build_post_record(1)
+
+    timings = {
+        # What collect_reddit_data did per post before records: copy the dict to convert the timestamp
+        "dict -> json (copy + isoformat)": lambda: json.dumps({**post_dict, "created_at": post_dict["created_at"].isoformat()}),
+        "record -> json": post_record.to_json,
+        "json -> dict": lambda payload=post_record.to_json(): json.loads(payload),
+        "json -> record": lambda payload=post_record.to_json(): SocialPost.from_json(payload)
+    }
+    if msgpack is not None:
+        timings["record -> msgpack"] = post_record.to_msgpack
+        timings["msgpack -> record"] = lambda payload=post_record.to_msgpack(): SocialPost.from_msgpack(payload)
+
+    for name, func in timings.items():
+        seconds = timeit.timeit(func, number=args.number) / args.number
+        print(f"{name:34s} {seconds * 1e6:8.2f} us")
+
+    if msgpack is None:
+        print("(install msgpack to include MessagePack timings)")
+    else:
+        print(f"{'json size / msgpack size':34s} {len(post_record.to_json())} / {len(post_record.to_msgpack())} bytes")
+
+    print(f"{'memory per dict':34s} {measure_memory(build_post_dict, args.items):8.0f} bytes")
+    print(f"{'memory per record':34s} {measure_memory(build_post_record, args.items):8.0f} bytes")
+
+if __name__ == "__main__":
+    main()
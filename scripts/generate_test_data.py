@@ -2,10 +2,14 @@
 
 import os
 import sys
+import math
+import bisect
 import logging
 import json
 import random
 import time
+import argparse
+import multiprocessing
 from datetime import datetime, timedelta
 from pathlib import Path
 
@@ -180,12 +184,254 @@ def generate_social_data(client, count=50, interval=2):
     
     logger.info("Finished generating social media data")
 
+class ZipfSampler:
+    """Sample ranks 0..n-1 with probability proportional to 1 / (rank + 1) ** exponent"""
+    
+    def __init__(self, n, exponent=1.1, rng=random):
+        self.rng = rng
+        self.cum_weights = []
+        total = 0.0
+        for rank in range(1, n + 1):
+            total += 1.0 / rank ** exponent
+            self.cum_weights.append(total)
+        self.total = total
+    
+    def sample(self):
+        return bisect.bisect_left(self.cum_weights, self.rng.random() * self.total)
+
+class BurstyHashtags:
+    """Zipf-distributed hashtag popularity with short, exponentially decaying bursts"""
+    
+    def __init__(self, hashtags, rng, burst_probability=0.05, burst_size=30.0, half_life=30.0):
+        self.hashtags = hashtags
+        self.rng = rng
+        self.base = [1.0 / rank ** 1.1 for rank in range(1, len(hashtags) + 1)]
+        self.bursts = [0.0] * len(hashtags)
+        self.burst_probability = burst_probability
+        self.burst_size = burst_size
+        self.decay = 0.5 ** (1.0 / half_life)
+        self.updated_second = None
+        self.cum_weights = []
+        self.total = 0.0
+    
+    def _update(self, now):
+        second = int(now)
+        if second == self.updated_second:
+            return
+        elapsed = 1 if self.updated_second is None else second - self.updated_second
+        self.updated_second = second
+        
+        factor = self.decay ** elapsed
+        self.bursts = [burst * factor for burst in self.bursts]
+        if self.rng.random() < self.burst_probability:
+            # Any hashtag can suddenly trend, not only the popular ones
+            self.bursts[self.rng.randrange(len(self.hashtags))] += self.burst_size
+        
+        self.cum_weights = []
+        self.total = 0.0
+        for base, burst in zip(self.base, self.bursts):
+            self.total += base * (1.0 + burst)
+            self.cum_weights.append(self.total)
+    
+    def sample(self, k, now):
+        self._update(now)
+        tags = set()
+        for _ in range(k):
+            tags.add(self.hashtags[bisect.bisect_left(self.cum_weights, self.rng.random() * self.total)])
+        return list(tags)
+
+# Baseline, daily amplitude and noise per sensor type; values peak in the afternoon
+DIURNAL_PROFILES = {
+    "temperature": (22.0, 5.0, 0.5, "C"),
+    "humidity": (55.0, -15.0, 2.0, "%"),
+    "pressure": (1013.0, 2.0, 1.0, "hPa"),
+    "light": (300.0, 400.0, 50.0, "lux"),
+    "motion": (0.3, 0.25, 0.0, "bool")
+}
+
+def diurnal_value(sensor_type, device_offset, now, rng):
+    """Sensor value following a daily cycle (peak around 15:00) plus noise"""
+    base, amplitude, noise, _ = DIURNAL_PROFILES[sensor_type]
+    local = time.localtime(now)
+    hour = local.tm_hour + local.tm_min / 60.0
+    cycle = math.sin(2 * math.pi * (hour - 9.0) / 24.0)
+    if sensor_type == "motion":
+        return 1 if rng.random() < base + amplitude * cycle else 0
+    value = base + device_offset + amplitude * cycle + rng.gauss(0, noise)
+    if sensor_type == "light":
+        value = max(value, 0.0)
+    return round(value, 1)
+
+def load_worker(worker_id, options, results):
+    """Publish messages at a fixed rate from one process, with open-loop pacing"""
+    rng = random.Random(options["seed"] + worker_id)
+    client = MQTTClient(
+        broker_address=options["broker_address"],
+        broker_port=options["broker_port"],
+        client_id=f"load_generator_{os.getpid()}_{worker_id}"
+    )
+    # connect() only starts connecting; publishing before the broker answers would just queue or drop
+    client.connect()
+    connect_deadline = time.time() + options["connect_timeout"]
+    while not client.connected and time.time() < connect_deadline:
+        time.sleep(0.05)
+    if not client.connected:
+        client.disconnect()
+        results.put({"worker": worker_id, "sent": 0, "dropped": 0, "elapsed": 0.0, "max_lag": 0.0,
+                     "error": "could not connect"})
+        return
+    
+    sensor_types = list(DIURNAL_PROFILES)
+    device_offsets = [rng.gauss(0, 1.5) for _ in range(options["devices"])]
+    users = ZipfSampler(options["users"], options["zipf_exponent"], rng)
+    hashtags = BurstyHashtags(
+        ["IoT", "BigData", "MQTT", "Python", "DataScience", "AI", "ML"] + [f"topic{i}" for i in range(200)],
+        rng
+    )
+    
+    interval = 1.0 / options["rate"]
+    started = time.time()
+    deadline = started + options["duration"]
+    attempted = 0
+    sent = 0
+    dropped = 0
+    max_lag = 0.0
+    
+    while True:
+        # Open loop: the send time of message n is fixed in advance, so a slow
+        # broker shows up as lag instead of silently lowering the rate
+        scheduled = started + attempted * interval
+        if scheduled >= deadline:
+            break
+        now = time.time()
+        if scheduled > now:
+            time.sleep(scheduled - now)
+            now = scheduled
+        else:
+            max_lag = max(max_lag, now - scheduled)
+        
+        if rng.random() < options["sensor_ratio"]:
+            device = rng.randrange(options["devices"])
+            sensor_type = sensor_types[device % len(sensor_types)]
+            topic = f"sensors/{sensor_type}"
+            message = {
+                "sensor_id": f"{sensor_type}_sensor_{device}",
+                "value": diurnal_value(sensor_type, device_offsets[device], now, rng),
+                "unit": DIURNAL_PROFILES[sensor_type][3],
+                "timestamp": datetime.fromtimestamp(now).isoformat()
+            }
+        else:
+            user_id = f"user_{users.sample()}"
+            tags = hashtags.sample(rng.randint(0, 3), now)
+            mentions = [f"user_{users.sample()}" for _ in range(rng.randint(0, 2))]
+            topic = "social/twitter"
+            message = {
+                "id": f"tweet_{worker_id}_{attempted}",
+                "user_id": user_id,
+                "user_name": user_id,
+                "user_followers": int(rng.paretovariate(1.2) * 50),
+                "content": "Load test tweet " + " ".join(f"#{tag}" for tag in tags)
+                           + " " + " ".join(f"@{mention}" for mention in mentions),
+                "created_at": datetime.fromtimestamp(now).isoformat(),
+                "retweet_count": int(rng.expovariate(0.1)),
+                "favorite_count": int(rng.expovariate(0.05)),
+                "platform": "twitter",
+                "hashtags": tags,
+                "mentions": mentions
+            }
+        
+        attempted += 1
+        # False: dropped after waiting for the publish window, or a client error
+        if client.publish(topic, json.dumps(message)):
+            sent += 1
+        else:
+            dropped += 1
+    
+    elapsed = time.time() - started
+    # Messages still queued in paho (QoS 1 while disconnected) are not delivered yet
+    acknowledged = client.wait_for_publishes(timeout=options["connect_timeout"])
+    client.disconnect()
+    results.put({
+        "worker": worker_id, "sent": sent, "dropped": dropped, "elapsed": elapsed, "max_lag": max_lag,
+        "error": None if acknowledged else "not every message was acknowledged"
+    })
+
+def generate_load(options):
+    """Run publisher processes and report the achieved rate"""
+    processes = options["processes"]
+    per_process = dict(options, rate=options["rate"] / processes)
+    logger.info(
+        f"Generating load: {options['rate']:.0f} msg/s for {options['duration']}s with {processes} processes, "
+        f"{options['devices']} devices and {options['users']} users"
+    )
+    
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=load_worker, args=(worker_id, per_process, results))
+        for worker_id in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    
+    reports = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    
+    sent = sum(report["sent"] for report in reports)
+    dropped = sum(report["dropped"] for report in reports)
+    elapsed = max(report["elapsed"] for report in reports) or 1.0
+    max_lag = max(report["max_lag"] for report in reports)
+    
+    logger.info(f"Sent {sent} messages in {elapsed:.1f}s, dropped {dropped}")
+    logger.info(f"Achieved rate: {sent / elapsed:.0f} msg/s (target {options['rate']:.0f} msg/s)")
+    logger.info(f"Maximum publisher lag behind schedule: {max_lag * 1000:.1f} ms")
+    for report in reports:
+        if report.get("error"):
+            logger.error(f"Publisher process {report['worker']}: {report['error']}")
+    return sent / elapsed
+
 def main():
+    parser = argparse.ArgumentParser(description="Generate test data for the MQTT Social Big Data project")
+    parser.add_argument("--mode", choices=["sample", "load"], default="sample",
+                        help="sample: a few paced messages; load: high-rate load generation")
+    parser.add_argument("--rate", type=float, default=1000, help="Target messages/sec in load mode")
+    parser.add_argument("--duration", type=float, default=60, help="Load duration in seconds")
+    parser.add_argument("--processes", type=int, default=max(multiprocessing.cpu_count() // 2, 1),
+                        help="Number of publisher processes in load mode")
+    parser.add_argument("--devices", type=int, default=10000, help="Number of simulated sensor devices")
+    parser.add_argument("--users", type=int, default=50000, help="Number of simulated social media users")
+    parser.add_argument("--sensor-ratio", type=float, default=0.8, help="Fraction of sensor messages")
+    parser.add_argument("--zipf-exponent", type=float, default=1.1, help="Skew of user activity")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--connect-timeout", type=float, default=10,
+                        help="Seconds to wait for the broker connection and for the last acks in load mode")
+    
+    args = parser.parse_args()
+    
+    broker_address = os.getenv("MQTT_BROKER_ADDRESS", "localhost")
+    broker_port = int(os.getenv("MQTT_BROKER_PORT", 1883))
+    
+    if args.mode == "load":
+        generate_load({
+            "broker_address": broker_address,
+            "broker_port": broker_port,
+            "rate": args.rate,
+            "duration": args.duration,
+            "processes": max(args.processes, 1),
+            "devices": args.devices,
+            "users": args.users,
+            "sensor_ratio": args.sensor_ratio,
+            "zipf_exponent": args.zipf_exponent,
+            "seed": args.seed,
+            "connect_timeout": args.connect_timeout
+        })
+        return
+    
     try:
         # Create MQTT client
         client = MQTTClient(
-            broker_address=os.getenv("MQTT_BROKER_ADDRESS", "localhost"),
-            broker_port=int(os.getenv("MQTT_BROKER_PORT", 1883)),
+            broker_address=broker_address,
+            broker_port=broker_port,
             client_id="test_data_generator"
         )
         
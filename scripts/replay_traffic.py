@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+import logging
+import argparse
+from pathlib import Path
+
+# Projenin kök dizinini ekle
+sys.path.append(str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+from paho.mqtt.client import topic_matches_sub
+
+from src.traffic_capture import read_capture, CapturedMessage
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("replay_traffic")
+
+def parse_speed(value):
+    """'max' replays without pauses; a number N replays N times faster than recorded"""
+    if value.lower() in ("max", "0"):
+        return None
+    speed = float(value.lower().rstrip("x"))
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive or 'max'")
+    return speed
+
+def build_sender(target, config):
+    """Return (send(topic, payload), close()) for the replay target"""
+    if target == "mqtt":
+        from src.mqtt_client import MQTTClient
+
+        client = MQTTClient(
+            broker_address=config.get("MQTT_BROKER_ADDRESS", "localhost"),
+            broker_port=int(config.get("MQTT_BROKER_PORT", 1883)),
+            client_id=f"traffic_replay_{os.getpid()}"
+        )
+        if not client.connect():
+            logger.error("Could not connect to MQTT broker")
+            sys.exit(1)
+        return client.publish, client.disconnect
+
+    from src.data_processor import DataProcessor
+
+    # Replayed traffic must not be captured again, and must not clash with a running service's metrics port
+    config = dict(config, CAPTURE_FILE="", METRICS_PORT="0")
+    processor = DataProcessor(config)
+
+    def send(topic, payload):
+        processor.on_mqtt_message(None, None, CapturedMessage(topic, payload))
+
+    def close():
+        # Batched messages and writes still running on the store executors
+        processor.drain()
+
+    return send, close
+
+def replay(files, send, speed=None, topics=None, limit=None):
+    """Feed captured records to send() with the recorded timing scaled by speed
+
+    Returns (messages sent, elapsed seconds, maximum lag behind schedule).
+    """
+    sent = 0
+    max_lag = 0.0
+    first_timestamp = None
+    started = time.perf_counter()
+
+    for path in files:
+        for timestamp, topic, payload in read_capture(path):
+            if topics and not any(topic_matches_sub(sub, topic) for sub in topics):
+                continue
+            if first_timestamp is None:
+                first_timestamp = timestamp
+
+            if speed is not None:
+                # Open loop: keep the recorded inter-arrival times, even if send() falls behind
+                delay = started + (timestamp - first_timestamp) / speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    max_lag = max(max_lag, -delay)
+
+            send(topic, payload)
+            sent += 1
+            if sent % 10000 == 0:
+                elapsed = time.perf_counter() - started
+                logger.info(f"Replayed {sent} messages ({sent / elapsed:.0f} msg/s)")
+            if limit and sent >= limit:
+                return sent, time.perf_counter() - started, max_lag
+
+    return sent, time.perf_counter() - started, max_lag
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured MQTT traffic (see CAPTURE_FILE)")
+    parser.add_argument("files", nargs="+", help="Capture files, replayed in the given order")
+    parser.add_argument("--speed", type=parse_speed, default=parse_speed("1"),
+                        help="Replay speed: 1 (recorded pace), N (N times faster) or max")
+    parser.add_argument("--target", choices=["mqtt", "direct"], default="mqtt",
+                        help="mqtt: publish to the broker; direct: feed a DataProcessor in this process")
+    parser.add_argument("--topic", action="append", help="Only replay topics matching this filter (repeatable)")
+    parser.add_argument("--limit", type=int, help="Stop after this many messages")
+
+    args = parser.parse_args()
+
+    load_dotenv()
+    config = {key: os.getenv(key) for key in os.environ}
+
+    send, close = build_sender(args.target, config)
+    try:
+        sent, elapsed, max_lag = replay(args.files, send, args.speed, args.topic, args.limit)
+    finally:
+        close()
+
+    logger.info(f"Replayed {sent} messages in {elapsed:.1f}s ({sent / elapsed if elapsed else 0:.0f} msg/s)")
+    if args.speed is not None:
+        logger.info(f"Maximum lag behind recorded schedule: {max_lag * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
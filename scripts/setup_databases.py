@@ -24,6 +24,8 @@ def setup_sqlite():
     """Set up SQLite database and create tables"""
     try:
         from src.database_manager import Base, SensorData, SocialMediaPost
+        from src.search_index import PostSearchIndex
+        from src.post_writer import SocialPostWriter
         from sqlalchemy import create_engine
         
         db_path = os.getenv("SQL_CONN_STRING", "sqlite:///data/iot_social_data.db")
@@ -35,6 +37,8 @@ def setup_sqlite():
         
         engine = create_engine(db_path)
         Base.metadata.create_all(engine)
+        SocialPostWriter(engine).setup()
+        PostSearchIndex(engine).setup()
         logger.info(f"SQLite tables created successfully at {db_path}")
         return True
     except Exception as e:
@@ -45,6 +49,7 @@ def setup_mongodb():
     """Set up MongoDB database and create collections"""
     try:
         from pymongo import MongoClient
+        from src.search_index import ensure_mongo_text_indexes
         
         mongo_conn_string = os.getenv("MONGO_CONN_STRING", "mongodb://localhost:27017/")
         client = MongoClient(mongo_conn_string)
@@ -55,14 +60,27 @@ def setup_mongodb():
             "sensor_data", 
             "twitter_data", 
             "reddit_data", 
+            "reddit_comment_data", 
             "twitter_trends", 
             "reddit_trends", 
             "twitter_influencers", 
             "reddit_influencers"
         ]
         
+        # Raw posts (long Reddit bodies) are stored with zstd block compression instead of snappy
+        compressed = {"twitter_data", "reddit_data", "reddit_comment_data"}
+        storage = {"wiredTiger": {"configString": "block_compressor=zstd"}}
+        
+        existing = set(db.list_collection_names())
         for collection_name in collections:
-            db.create_collection(collection_name)
+            if collection_name not in existing:
+                if collection_name in compressed:
+                    db.create_collection(collection_name, storageEngine=storage)
+                else:
+                    db.create_collection(collection_name)
+        
+        # Text indexes for keyword search over raw posts and comments
+        ensure_mongo_text_indexes(db)
         
         logger.info(f"MongoDB collections created successfully at {mongo_conn_string}")
         client.close()
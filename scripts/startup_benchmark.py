@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+import re
+import sys
+import argparse
+import subprocess
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# Import statements that make up the startup path of each entry point
+DEFAULT_TARGETS = {
+    "main": "import main",
+    "data_processor": "from src.data_processor import DataProcessor"
+}
+
+# "import time: self [us] | cumulative | imported package" (nesting shown by indentation)
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+def measure_imports(statement, python=sys.executable):
+    """Run a statement under -X importtime in a fresh interpreter
+
+    Returns (total microseconds, {module: cumulative microseconds}) for the
+    modules the statement imported, excluding interpreter startup.
+    """
+    result = subprocess.run(
+        [python, "-X", "importtime", "-c", statement],
+        capture_output=True, text=True, cwd=PROJECT_ROOT
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"'{statement}' failed:\n{result.stderr.strip().splitlines()[-1]}")
+
+    modules = {}
+    total = 0
+    # Modules imported during interpreter startup are listed before site
+    seen_site = False
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, module = match.groups()
+        if not seen_site:
+            seen_site = module == "site"
+            continue
+        modules[module] = int(cumulative)
+        # Only top-level imports count towards the total; nested ones are in their cumulative time
+        if len(indent) == 1:
+            total += int(cumulative)
+    return total, modules
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time of the application's startup path")
+    parser.add_argument("--target", action="append",
+                        help=f"Import statement to measure (repeatable), or one of: {', '.join(DEFAULT_TARGETS)}")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per target; the fastest run is reported")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest modules to list")
+    parser.add_argument("--budget-ms", type=float, help="Fail if a target's import time exceeds this budget")
+
+    args = parser.parse_args()
+
+    targets = args.target or list(DEFAULT_TARGETS)
+    over_budget = []
+
+    for target in targets:
+        statement = DEFAULT_TARGETS.get(target, target)
+        runs = [measure_imports(statement) for _ in range(max(args.runs, 1))]
+        total, modules = min(runs, key=lambda run: run[0])
+
+        print(f"{target}: {total / 1000:.1f} ms")
+        for module, cumulative in sorted(modules.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+            print(f"  {cumulative / 1000:8.1f} ms  {module}")
+
+        if args.budget_ms is not None and total / 1000 > args.budget_ms:
+            over_budget.append(f"{target}: {total / 1000:.1f} ms > budget {args.budget_ms:.1f} ms")
+
+    for message in over_budget:
+        print(f"OVER BUDGET: {message}")
+    if over_budget:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Token bucket mirroring an API's request budget
+
+    The bucket refills continuously at capacity / period, and can be corrected
+    with the remaining budget reported by the API itself.
+    """
+
+    def __init__(self, capacity, period, max_concurrent=1):
+        self.capacity = float(capacity)
+        self.refill_rate = self.capacity / period
+        self.tokens = self.capacity
+        self.max_concurrent = max_concurrent
+        self.running = 0
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+
+    def wait_time(self, cost, now):
+        """Seconds until cost tokens are available (0 if available now)"""
+        self._refill(now)
+        if self.tokens >= cost:
+            return 0.0
+        return (cost - self.tokens) / self.refill_rate
+
+    def consume(self, cost, now):
+        self._refill(now)
+        self.tokens -= cost
+
+    def update_from_limits(self, remaining, reset_at, now):
+        """Align the bucket with the API's reported remaining requests and reset time"""
+        self._refill(now)
+        self.tokens = min(self.tokens, float(remaining))
+
+        # Budget exhausted: hold every job for this API until the window resets
+        seconds_left = reset_at - time.time()
+        if remaining < 1 and seconds_left > 0:
+            self.tokens = -seconds_left * self.refill_rate
+
+class CollectionJob:
+    """A periodic job with a priority, an API budget and an adaptive interval"""
+
+    def __init__(self, name, func, interval, priority=1, api=None, cost=1,
+                 adaptive=False, expected_items=None, min_interval=None, max_interval=None, pool="collect"):
+        self.name = name
+        self.func = func
+        self.interval = float(interval)
+        self.priority = priority
+        self.api = api
+        self.pool = pool
+        self.cost = cost
+        self.adaptive = adaptive
+        self.expected_items = expected_items
+        self.min_interval = float(min_interval if min_interval is not None else interval)
+        self.max_interval = float(max_interval if max_interval is not None else interval)
+        self.next_run = 0.0
+        self.last_items = None
+        self.runs = 0
+        self.failures = 0
+
+    def adapt_interval(self, items):
+        """Poll busy sources more often and quiet sources less often
+
+        The interval is scaled so a poll returns about half of expected_items
+        new items, changing by at most 2x per run.
+        """
+        self.last_items = items
+        if not self.adaptive or not self.expected_items or items is None:
+            return
+
+        fill_ratio = max(items / self.expected_items, 0.05)
+        factor = min(max(0.5 / fill_ratio, 0.5), 2.0)
+        self.interval = min(max(self.interval * factor, self.min_interval), self.max_interval)
+
+class CollectionScheduler:
+    """Runs collection jobs concurrently, ordered by due time and priority
+
+    Jobs that share an API also share its token bucket and concurrency limit,
+    so a slow Reddit run never delays a Twitter run and neither API is asked
+    for more than its remaining rate limit. Each job runs in the thread pool
+    named by its pool: "collect" by default, or one added with add_pool, so
+    that e.g. buffer flushes are not queued behind slow API calls.
+    """
+
+    def __init__(self, max_workers=4, rate_limit_provider=None):
+        self.executors = {"collect": ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="collector")}
+        self.rate_limit_provider = rate_limit_provider
+        self.buckets = {}
+        self.jobs = {}
+        self._queue = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def add_api(self, name, capacity, period, max_concurrent=1):
+        """Register an API budget, e.g. 180 requests per 900 seconds"""
+        self.buckets[name] = TokenBucket(capacity, period, max_concurrent)
+
+    def add_pool(self, name, max_workers):
+        """Register a separate thread pool for the jobs added with pool=name"""
+        self.executors[name] = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+
+    def add_job(self, name, func, interval, first_run=None, **kwargs):
+        """Add a job; first_run is an absolute time.time() value, default now"""
+        job = CollectionJob(name, func, interval, **kwargs)
+        if job.pool not in self.executors:
+            raise ValueError(f"Unknown pool '{job.pool}' for job {name}")
+        delay = 0.0 if first_run is None else max(first_run - time.time(), 0.0)
+        with self._condition:
+            self.jobs[name] = job
+            self._push(job, time.monotonic() + delay)
+        return job
+
+    def _push(self, job, run_at):
+        job.next_run = run_at
+        # Lower tuples run first: earliest due time, then highest priority
+        heapq.heappush(self._queue, (run_at, -job.priority, next(self._counter), job))
+        self._condition.notify()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="collection-scheduler", daemon=True)
+        self._thread.start()
+        logger.info(f"Collection scheduler started with {len(self.jobs)} jobs")
+
+    def stop(self, wait=True):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join(timeout=5)
+        for executor in self.executors.values():
+            executor.shutdown(wait=wait)
+        logger.info("Collection scheduler stopped")
+
+    def _next_ready(self, now):
+        """Pop the highest-priority due job whose API has budget; return (job, wait)"""
+        due = []
+        while self._queue and self._queue[0][0] <= now:
+            due.append(heapq.heappop(self._queue))
+        # Among the due jobs the priority decides, not which became due first
+        due.sort(key=lambda entry: (entry[1], entry[0], entry[2]))
+
+        deferred = []
+        ready = None
+        wait = None
+
+        for entry in due:
+            job = entry[3]
+            if ready is not None:
+                deferred.append(entry)
+                continue
+
+            bucket = self.buckets.get(job.api)
+            if bucket is None:
+                ready = job
+                continue
+
+            if bucket.running >= bucket.max_concurrent:
+                deferred.append(entry)
+                continue
+
+            budget_wait = bucket.wait_time(job.cost, now)
+            if budget_wait > 0:
+                # Not enough budget left: retry once the bucket has refilled
+                deferred.append((now + budget_wait, entry[1], entry[2], job))
+                continue
+
+            bucket.consume(job.cost, now)
+            bucket.running += 1
+            ready = job
+
+        for entry in deferred:
+            heapq.heappush(self._queue, entry)
+
+        if ready is None and self._queue:
+            wait = max(self._queue[0][0] - now, 0.0)
+            if deferred:
+                # Deferred jobs wait for a running job to finish, which notifies us
+                wait = max(wait, 1.0)
+        return ready, wait
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._running:
+                    return
+                job, wait = self._next_ready(time.monotonic())
+                if job is None:
+                    self._condition.wait(timeout=wait if wait is not None else 60)
+                    continue
+
+            self.executors[job.pool].submit(self._execute, job)
+
+    def _execute(self, job):
+        started = time.monotonic()
+        items = None
+        try:
+            items = job.func()
+            job.runs += 1
+        except Exception as e:
+            job.failures += 1
+            logger.error(f"Collection job {job.name} failed: {e}")
+
+        if isinstance(items, bool):
+            items = None
+
+        # Read outside the lock: the provider may be slow, and nothing else should wait on it
+        limits = self._read_limits(job.api) if job.api in self.buckets else None
+
+        with self._condition:
+            bucket = self.buckets.get(job.api)
+            if bucket is not None:
+                bucket.running -= 1
+                if limits:
+                    bucket.update_from_limits(limits["remaining"], limits["reset_at"], time.monotonic())
+
+            job.adapt_interval(items)
+            if self._running:
+                self._push(job, started + job.interval)
+
+        logger.info(
+            f"Collection job {job.name} finished in {time.monotonic() - started:.1f}s "
+            f"(items: {items}, next run in {job.interval:.0f}s)"
+        )
+
+    def _read_limits(self, api):
+        if not self.rate_limit_provider:
+            return None
+        try:
+            return self.rate_limit_provider(api)
+        except Exception as e:
+            logger.warning(f"Could not read rate limit for {api}: {e}")
+            return None
+
+    def get_status(self):
+        """Return the current interval and statistics of each job"""
+        now = time.monotonic()
+        with self._condition:
+            return {
+                name: {
+                    "interval": job.interval,
+                    "priority": job.priority,
+                    "next_run_in": max(job.next_run - now, 0.0),
+                    "last_items": job.last_items,
+                    "runs": job.runs,
+                    "failures": job.failures
+                }
+                for name, job in self.jobs.items()
+            }
+
+def parse_targets(value, default):
+    """Parse 'name:priority,name:priority' configuration into [(name, priority)]"""
+    targets = []
+    for item in (value or default).split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, priority = item.rpartition(":")
+        if not name or not priority.isdigit():
+            name, priority = item, "1"
+        targets.append((name, int(priority)))
+    return targets
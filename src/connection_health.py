@@ -0,0 +1,184 @@
+import logging
+import random
+import threading
+import time
+
+from src.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Exception class names (anywhere in the class hierarchy) that mean the backend
+# itself is unreachable, as opposed to a bad query or document. Names keep the
+# optional drivers out of this module.
+CONNECTION_ERRORS = frozenset({
+    "ConnectionError", "TimeoutError", "BackendUnavailable",
+    # pymongo
+    "ConnectionFailure", "AutoReconnect", "ServerSelectionTimeoutError", "NetworkTimeout",
+    # SQLAlchemy / DB-API
+    "OperationalError", "DisconnectionError", "InterfaceError",
+    # neo4j
+    "ServiceUnavailable", "SessionExpired"
+})
+
+def is_connection_error(error):
+    return any(cls.__name__ in CONNECTION_ERRORS for cls in type(error).__mro__)
+
+class BackendUnavailable(Exception):
+    """The backend is down or its circuit breaker is open"""
+
+class CircuitBreaker:
+    """Keeps calls away from a backend that keeps failing
+
+    After failure_threshold consecutive connection failures the breaker opens
+    and allow() returns False. Once the backoff has passed it lets one trial
+    call through (half-open): success closes it, failure opens it again with
+    the backoff doubled, up to max_delay. Each backoff is jittered between
+    half and all of its length so that processes do not retry in lockstep.
+    """
+
+    def __init__(self, name, failure_threshold=3, base_delay=1.0, max_delay=60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.state = CLOSED
+        self.failures = 0
+        # Consecutive openings, for the backoff
+        self.openings = 0
+        self.retry_at = 0.0
+        self._lock = threading.Lock()
+        self._opened = REGISTRY.counter("db_circuit_opened_total", store=name)
+        REGISTRY.gauge("db_circuit_state", callback=lambda: _STATE_VALUES[self.state], store=name)
+
+    def allow(self):
+        """Whether a call may go to the backend now"""
+        if self.state == CLOSED:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            if now < self.retry_at:
+                return False
+            # One trial call per backoff period until one of them succeeds
+            self.state = HALF_OPEN
+            self.retry_at = now + self._delay()
+            return True
+
+    def record_success(self):
+        if self.state == CLOSED and not self.failures:
+            return
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"{self.name} is available again")
+            self.state = CLOSED
+            self.failures = 0
+            self.openings = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self._open()
+
+    def trip(self):
+        """Open the breaker now (e.g. the backend could not be reached at all)"""
+        with self._lock:
+            self._open()
+
+    def _open(self):
+        if self.state != OPEN:
+            self.openings += 1
+            self._opened.inc()
+        self.state = OPEN
+        self.retry_at = time.monotonic() + self._delay()
+        logger.warning(f"{self.name} is unavailable; next attempt in {self.retry_at - time.monotonic():.1f}s")
+
+    def _delay(self):
+        delay = min(self.max_delay, self.base_delay * 2 ** min(max(self.openings - 1, 0), 30))
+        return random.uniform(delay / 2, delay)
+
+class Backend:
+    """A database client that connects on first use, guarded by a circuit breaker
+
+    connect() returns the client and should fail fast when the server cannot
+    be reached; probe(client) is a cheap round trip; close(client) releases
+    it. get() returns None while the backend is down, so callers skip it
+    instead of waiting on timeouts.
+    """
+
+    def __init__(self, name, connect, probe=None, close=None, breaker=None):
+        self.name = name
+        self.breaker = breaker or CircuitBreaker(name)
+        self.client = None
+        self._connect = connect
+        self._probe = probe
+        self._close = close
+        self._lock = threading.Lock()
+        REGISTRY.gauge("db_backend_up", callback=lambda: int(self.available), store=name)
+
+    @property
+    def available(self):
+        return self.client is not None and self.breaker.state == CLOSED
+
+    def get(self):
+        """The client, connecting on first use; None while the backend is unavailable"""
+        client = self.client
+        if client is not None and self.breaker.state == CLOSED:
+            return client
+        if not self.breaker.allow():
+            return None
+        if client is None:
+            with self._lock:
+                if self.client is None:
+                    try:
+                        self.client = self._connect()
+                    except Exception as e:
+                        logger.error(f"Could not connect to {self.name}: {e}")
+                        self.breaker.trip()
+                        return None
+                    self.breaker.record_success()
+                    logger.info(f"{self.name} connection established")
+                client = self.client
+        return client
+
+    def require(self):
+        """Like get(), but raises BackendUnavailable instead of returning None"""
+        client = self.get()
+        if client is None:
+            raise BackendUnavailable(f"{self.name} is unavailable")
+        return client
+
+    def succeeded(self):
+        self.breaker.record_success()
+
+    def failed(self, error):
+        """Count a failed call against the breaker if the backend itself failed"""
+        if is_connection_error(error):
+            self.breaker.record_failure()
+            return True
+        return False
+
+    def check(self):
+        """Health probe: connects if needed, otherwise one cheap round trip; True if the backend is up"""
+        if self.client is None:
+            return self.get() is not None
+        if self._probe is None:
+            return self.available
+        try:
+            self._probe(self.client)
+        except Exception as e:
+            logger.warning(f"Health check of {self.name} failed: {e}")
+            self.breaker.record_failure()
+            return False
+        self.breaker.record_success()
+        return True
+
+    def close(self):
+        with self._lock:
+            client, self.client = self.client, None
+        if client is not None and self._close is not None:
+            self._close(client)
@@ -0,0 +1,224 @@
+import logging
+import threading
+from collections import OrderedDict, defaultdict, deque
+
+from src.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+NODES_EVICTED = {
+    kind: REGISTRY.counter("cooccurrence_nodes_evicted_total", kind=kind)
+    for kind in ("hashtag", "user")
+}
+EDGES_DROPPED = REGISTRY.counter("cooccurrence_pending_edges_dropped_total")
+
+class CooccurrenceGraph:
+    """In-memory sparse co-occurrence graph of hashtags and users.
+
+    Edges are kept as nested dicts (node -> neighbour -> weight), so a message
+    with k hashtags costs O(k^2) updates and no database round trip.
+
+    At most max_hashtags hashtags and max_users users are kept; the ones seen
+    least recently are dropped with their edges. Neo4j keeps the full graph.
+    Up to max_pending_edges edge deltas are kept for a Neo4j that is down.
+    """
+
+    def __init__(self, max_hashtags=50000, max_users=100000, max_pending_edges=500000):
+        self.max_hashtags = max_hashtags
+        self.max_users = max_users
+        self.max_pending_edges = max_pending_edges
+
+        # hashtag <-> hashtag (symmetric)
+        self.hashtag_edges = defaultdict(lambda: defaultdict(int))
+        # user -> hashtag and hashtag -> user; user_hashtags is in least recently seen order
+        self.user_hashtags = OrderedDict()
+        self.hashtag_users = defaultdict(lambda: defaultdict(int))
+        # In least recently seen order
+        self.hashtag_counts = OrderedDict()
+
+        # Weight deltas accumulated since the last Neo4j sync
+        self._pending_hashtag_edges = defaultdict(int)
+        self._pending_user_edges = defaultdict(int)
+
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize_hashtag(tag):
+        """Normalize a hashtag so '#IoT' and 'iot' map to the same node"""
+        return tag.lstrip("#").strip().lower()
+
+    def add_message(self, user_id, hashtags):
+        """Update the graph with one message; only its author is linked to its hashtags"""
+        tags = sorted({self.normalize_hashtag(tag) for tag in hashtags or [] if tag})
+        tags = [tag for tag in tags if tag]
+        if not tags:
+            return
+
+        with self._lock:
+            if user_id:
+                user_tags = self.user_hashtags.get(user_id)
+                if user_tags is None:
+                    user_tags = self.user_hashtags[user_id] = defaultdict(int)
+                else:
+                    self.user_hashtags.move_to_end(user_id)
+
+            for i, tag in enumerate(tags):
+                self.hashtag_counts[tag] = self.hashtag_counts.get(tag, 0) + 1
+                self.hashtag_counts.move_to_end(tag)
+
+                for other in tags[i + 1:]:
+                    self.hashtag_edges[tag][other] += 1
+                    self.hashtag_edges[other][tag] += 1
+                    self._pending_hashtag_edges[(tag, other)] += 1
+
+                if user_id:
+                    user_tags[tag] += 1
+                    self.hashtag_users[tag][user_id] += 1
+                    self._pending_user_edges[(user_id, tag)] += 1
+
+            while len(self.hashtag_counts) > self.max_hashtags:
+                self._evict_hashtag()
+            while len(self.user_hashtags) > self.max_users:
+                self._evict_user()
+
+    def _evict_hashtag(self):
+        tag, _ = self.hashtag_counts.popitem(last=False)
+        for other in self.hashtag_edges.pop(tag, {}):
+            neighbours = self.hashtag_edges.get(other)
+            if neighbours is not None:
+                neighbours.pop(tag, None)
+        for user in self.hashtag_users.pop(tag, {}):
+            user_tags = self.user_hashtags.get(user)
+            if user_tags is not None:
+                user_tags.pop(tag, None)
+        NODES_EVICTED["hashtag"].inc()
+
+    def _evict_user(self):
+        user, user_tags = self.user_hashtags.popitem(last=False)
+        for tag in user_tags:
+            users = self.hashtag_users.get(tag)
+            if users is not None:
+                users.pop(user, None)
+        NODES_EVICTED["user"].inc()
+
+    def related_hashtags(self, hashtag, top_n=10):
+        """Return the hashtags that most often appear together with the given one"""
+        tag = self.normalize_hashtag(hashtag)
+        with self._lock:
+            neighbours = list(self.hashtag_edges.get(tag, {}).items())
+
+        neighbours.sort(key=lambda item: item[1], reverse=True)
+        return [{"hashtag": other, "weight": weight} for other, weight in neighbours[:top_n]]
+
+    def top_users_for_hashtag(self, hashtag, top_n=10):
+        """Return the users most strongly associated with a hashtag"""
+        tag = self.normalize_hashtag(hashtag)
+        with self._lock:
+            users = list(self.hashtag_users.get(tag, {}).items())
+
+        users.sort(key=lambda item: item[1], reverse=True)
+        return [{"user_id": user, "weight": weight} for user, weight in users[:top_n]]
+
+    def community(self, hashtag, min_weight=2, max_depth=2, max_size=100):
+        """Find the hashtags and users around a hashtag
+
+        Walks hashtag edges breadth-first, keeping only edges with at least
+        min_weight co-occurrences, and collects the users of every hashtag found.
+        """
+        start = self.normalize_hashtag(hashtag)
+        with self._lock:
+            if start not in self.hashtag_edges and start not in self.hashtag_users:
+                return {"hashtags": [], "users": []}
+
+            seen = {start: 0}
+            queue = deque([start])
+            while queue and len(seen) < max_size:
+                tag = queue.popleft()
+                depth = seen[tag]
+                if depth >= max_depth:
+                    continue
+                for other, weight in self.hashtag_edges.get(tag, {}).items():
+                    if weight >= min_weight and other not in seen:
+                        seen[other] = depth + 1
+                        queue.append(other)
+                        if len(seen) >= max_size:
+                            break
+
+            users = defaultdict(int)
+            for tag in seen:
+                for user, weight in self.hashtag_users.get(tag, {}).items():
+                    users[user] += weight
+
+        hashtags = sorted(seen, key=lambda tag: (seen[tag], -self.hashtag_counts.get(tag, 0)))
+        top_users = sorted(users.items(), key=lambda item: item[1], reverse=True)[:max_size]
+        return {
+            "hashtags": [{"hashtag": tag, "distance": seen[tag]} for tag in hashtags],
+            "users": [{"user_id": user, "weight": weight} for user, weight in top_users]
+        }
+
+    def take_pending_edges(self):
+        """Return and reset the weight deltas accumulated since the last sync"""
+        with self._lock:
+            hashtag_edges = self._pending_hashtag_edges
+            user_edges = self._pending_user_edges
+            self._pending_hashtag_edges = defaultdict(int)
+            self._pending_user_edges = defaultdict(int)
+
+        return (
+            [{"source": a, "target": b, "weight": w} for (a, b), w in hashtag_edges.items()],
+            [{"source": a, "target": b, "weight": w} for (a, b), w in user_edges.items()]
+        )
+
+    def restore_pending_edges(self, hashtag_edges, user_edges):
+        """Put edge deltas back after a failed sync so they are retried next time
+
+        Deltas beyond max_pending_edges are dropped.
+        """
+        dropped = 0
+        with self._lock:
+            size = len(self._pending_hashtag_edges) + len(self._pending_user_edges)
+            for edges, pending in ((hashtag_edges, self._pending_hashtag_edges), (user_edges, self._pending_user_edges)):
+                for edge in edges:
+                    key = (edge["source"], edge["target"])
+                    if key not in pending:
+                        if size >= self.max_pending_edges:
+                            dropped += 1
+                            continue
+                        size += 1
+                    pending[key] += edge["weight"]
+        if dropped:
+            EDGES_DROPPED.inc(dropped)
+            logger.warning(f"Dropped {dropped} co-occurrence edge deltas that could not be synced")
+
+    def sync_to_neo4j(self, db_manager, batch_size=1000):
+        """Write accumulated edge weights to Neo4j in bulk
+
+        Edges that were not written are kept for the next sync.
+        """
+        hashtag_edges, user_edges = self.take_pending_edges()
+        if not hashtag_edges and not user_edges:
+            return True
+
+        hashtags_written = db_manager.save_weighted_edges_to_neo4j(
+            "Hashtag", "Hashtag", "CO_OCCURS_WITH", hashtag_edges, batch_size=batch_size
+        )
+        users_written = db_manager.save_weighted_edges_to_neo4j(
+            "User", "Hashtag", "USED_HASHTAG", user_edges, batch_size=batch_size
+        )
+
+        if hashtags_written < len(hashtag_edges) or users_written < len(user_edges):
+            self.restore_pending_edges(hashtag_edges[hashtags_written:], user_edges[users_written:])
+            return False
+
+        logger.info(f"Synced {len(hashtag_edges)} hashtag edges and {len(user_edges)} user edges to Neo4j")
+        return True
+
+# Test usage
+if __name__ == "__main__":
+    graph = CooccurrenceGraph()
+    graph.add_message("user_1", ["IoT", "MQTT"])
+    graph.add_message("user_3", ["IoT", "BigData"])
+    graph.add_message("user_1", ["#iot", "MQTT", "Python"])
+
+    print(graph.related_hashtags("#IoT"))
+    print(graph.community("#IoT", min_weight=1))
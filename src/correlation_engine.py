@@ -0,0 +1,348 @@
+import logging
+import threading
+import time
+
+from src.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+CORRELATION_SERIES = REGISTRY.counter("correlation_series_evicted_total")
+
+# Social signals correlated with every sensor series
+SIGNALS = ("post_volume", "sentiment")
+
+def rank_columns(values):
+    """Ranks of each column, ties sharing their average rank (like scipy.stats.rankdata(axis=0))"""
+    import numpy as np
+
+    n = values.shape[0]
+    order = np.argsort(values, axis=0, kind="mergesort")
+    ordered = np.take_along_axis(values, order, axis=0)
+    index = np.broadcast_to(np.arange(n)[:, None], values.shape)
+
+    # Each run of equal values spans [start, end] in sorted order
+    first = np.ones(values.shape, dtype=bool)
+    first[1:] = ordered[1:] != ordered[:-1]
+    last = np.ones(values.shape, dtype=bool)
+    last[:-1] = first[1:]
+    start = np.maximum.accumulate(np.where(first, index, 0), axis=0)
+    end = np.minimum.accumulate(np.where(last, index, n - 1)[::-1], axis=0)[::-1]
+
+    ranks = np.empty(values.shape)
+    np.put_along_axis(ranks, order, (start + end) / 2.0 + 1, axis=0)
+    return ranks
+
+class CorrelationEngine:
+    """Rolling correlation of per-minute sensor aggregates with social activity
+
+    Readings and posts are bucketed by arrival minute. Each closed minute adds
+    one row per sensor series (its mean, carried forward when it did not
+    report) and one row of social signals (post count, mean sentiment).
+
+    Over the last window minutes, every sensor series is correlated with every
+    signal: Pearson at lags 0..max_lag in both directions, kept as running
+    sums that are updated with the minute entering and the minute leaving the
+    window, and Spearman at lag 0, ranked on demand. The sums are rebuilt from
+    the history every resync_minutes to shed floating point drift. Series that
+    have not reported for window + max_lag minutes are dropped and their slot
+    reused.
+    """
+
+    def __init__(self, window=60, max_lag=15, min_abs=0.5, top_n=50, resync_minutes=None, initial_series=256):
+        # NumPy is only imported by processes that correlate
+        import numpy as np
+
+        if window < 3:
+            raise ValueError("window must be at least 3 minutes")
+        self.np = np
+        self.window = window
+        self.max_lag = max_lag
+        self.min_abs = min_abs
+        self.top_n = top_n
+        self.resync_minutes = resync_minutes or window
+
+        # Enough rows for the oldest value of the oldest lagged pair, plus the row leaving the window
+        self._rows = window + max_lag + 1
+        self._lags = np.arange(max_lag + 1)
+        self._capacity = 0
+        self._series = {}
+        self._free = []
+        # Column -> minute the series was first / last seen
+        self._first_seen = np.zeros(0, dtype=np.int64)
+        self._last_seen = np.zeros(0, dtype=np.int64)
+        self._last_value = np.zeros(0)
+
+        self._x = np.zeros((self._rows, 0))
+        self._y = np.zeros((self._rows, len(SIGNALS)))
+        self._last_sentiment = 0.0
+        self._minutes = 0
+        self._last_closed = None
+        self._since_resync = 0
+        self._grow(initial_series)
+
+        # Arrival minute -> {sensor: [sum, count]} and [posts, sentiment sum, sentiment count]
+        self._open_minute = None
+        self._closed = []
+        self._sensor_sums = {}
+        self._social_sums = [0, 0.0, 0]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._series)
+
+    def add_sensor(self, sensor_id, value, now=None):
+        minute = int((time.time() if now is None else now) // 60)
+        with self._lock:
+            self._roll(minute)
+            sums = self._sensor_sums.get(sensor_id)
+            if sums is None:
+                self._sensor_sums[sensor_id] = [value, 1]
+            else:
+                sums[0] += value
+                sums[1] += 1
+
+    def add_post(self, sentiment=None, now=None):
+        minute = int((time.time() if now is None else now) // 60)
+        with self._lock:
+            self._roll(minute)
+            sums = self._social_sums
+            sums[0] += 1
+            if sentiment is not None:
+                sums[1] += sentiment
+                sums[2] += 1
+
+    def _roll(self, minute):
+        # Late arrivals for a minute that is already closed count towards the open one
+        if self._open_minute is None or minute > self._open_minute:
+            if self._open_minute is not None:
+                self._closed.append((self._open_minute, self._sensor_sums, self._social_sums))
+            self._open_minute = minute
+            self._sensor_sums = {}
+            self._social_sums = [0, 0.0, 0]
+
+    def advance(self, now=None):
+        """Close every minute before the current one; returns the number of rows added"""
+        minute = int((time.time() if now is None else now) // 60)
+        with self._lock:
+            self._roll(minute)
+            closed, self._closed = self._closed, []
+
+        added = 0
+        previous = self._last_closed if self._last_closed is not None else (closed[0][0] - 1 if closed else None)
+        for closed_minute, sensor_sums, social_sums in closed:
+            # Minutes without any traffic still move the window; only the last window's worth is filled
+            for gap_minute in range(max(previous + 1, closed_minute - self._rows), closed_minute):
+                self._close_minute(gap_minute, {}, [0, 0.0, 0])
+                added += 1
+            self._close_minute(closed_minute, sensor_sums, social_sums)
+            previous = closed_minute
+            added += 1
+        return added
+
+    def _close_minute(self, minute, sensor_sums, social_sums):
+        for sensor_id, (total, count) in sensor_sums.items():
+            column = self._series.get(sensor_id)
+            if column is None:
+                column = self._add_series(sensor_id, minute)
+            self._last_value[column] = total / count
+            self._last_seen[column] = minute
+
+        posts, sentiment_sum, sentiment_count = social_sums
+        if sentiment_count:
+            self._last_sentiment = sentiment_sum / sentiment_count
+
+        self._evict(minute)
+
+        row = self._minutes % self._rows
+        self._x[row] = self._last_value
+        self._y[row] = (posts, self._last_sentiment)
+        self._minutes += 1
+        self._last_closed = minute
+        self._since_resync += 1
+
+        if self._since_resync >= self.resync_minutes:
+            self._resync()
+        else:
+            self._accumulate(self._minutes - 1, 1.0)
+            if self._minutes > self.window:
+                self._accumulate(self._minutes - 1 - self.window, -1.0)
+
+    def _add_series(self, sensor_id, minute):
+        if not self._free:
+            self._grow(self._capacity * 2)
+        column = self._free.pop()
+        self._series[sensor_id] = column
+        self._first_seen[column] = minute
+        return column
+
+    def _grow(self, capacity):
+        np = self.np
+        extra = capacity - self._capacity
+        lags = len(self._lags)
+        signals = len(SIGNALS)
+
+        def pad(array, axis):
+            shape = list(array.shape)
+            shape[axis] = extra
+            return np.concatenate([array, np.zeros(shape, dtype=array.dtype)], axis=axis)
+
+        self._x = pad(self._x, 1)
+        self._first_seen = pad(self._first_seen, 0)
+        self._last_seen = pad(self._last_seen, 0)
+        self._last_value = pad(self._last_value, 0)
+        if self._capacity == 0:
+            self._reset_sums(capacity, lags, signals)
+        else:
+            for name in ("_sx", "_sxx"):
+                setattr(self, name, pad(getattr(self, name), 0))
+            for name in ("_sx_lag", "_sxx_lag", "_sxy_social_leads", "_sxy_sensor_leads"):
+                setattr(self, name, pad(getattr(self, name), 1))
+        # Lowest columns first
+        self._free.extend(range(capacity - 1, self._capacity - 1, -1))
+        self._capacity = capacity
+
+    def _reset_sums(self, capacity, lags, signals):
+        np = self.np
+        # Sensor values in the window and their lagged copies (sensor leads social)
+        self._sx = np.zeros(capacity)
+        self._sxx = np.zeros(capacity)
+        self._sx_lag = np.zeros((lags, capacity))
+        self._sxx_lag = np.zeros((lags, capacity))
+        # Signals in the window and their lagged copies (social leads sensor)
+        self._sy = np.zeros(signals)
+        self._syy = np.zeros(signals)
+        self._sy_lag = np.zeros((lags, signals))
+        self._syy_lag = np.zeros((lags, signals))
+        # Cross products: x[t] * y[t - lag] and x[t - lag] * y[t]
+        self._sxy_social_leads = np.zeros((lags, capacity, signals))
+        self._sxy_sensor_leads = np.zeros((lags, capacity, signals))
+
+    def _evict(self, minute):
+        stale = [
+            sensor_id for sensor_id, column in self._series.items()
+            if minute - self._last_seen[column] > self.window + self.max_lag
+        ]
+        for sensor_id in stale:
+            column = self._series.pop(sensor_id)
+            self._x[:, column] = 0.0
+            self._last_value[column] = 0.0
+            for name in ("_sx", "_sxx"):
+                getattr(self, name)[column] = 0.0
+            for name in ("_sx_lag", "_sxx_lag", "_sxy_social_leads", "_sxy_sensor_leads"):
+                getattr(self, name)[:, column] = 0.0
+            self._free.append(column)
+        if stale:
+            CORRELATION_SERIES.inc(len(stale))
+            logger.debug(f"Dropped {len(stale)} sensor series that stopped reporting")
+
+    def _accumulate(self, t, sign):
+        """Add (sign=1) or remove (sign=-1) the pairs of minute t for every lag"""
+        np = self.np
+        x, y = self._x[t % self._rows], self._y[t % self._rows]
+        # Minutes before the first one are zero rows
+        lagged = (t - self._lags) % self._rows
+        valid = (t - self._lags >= 0)[:, None]
+        x_lag = np.where(valid, self._x[lagged], 0.0)
+        y_lag = np.where(valid, self._y[lagged], 0.0)
+
+        self._sx += sign * x
+        self._sxx += sign * x * x
+        self._sy += sign * y
+        self._syy += sign * y * y
+        self._sx_lag += sign * x_lag
+        self._sxx_lag += sign * x_lag * x_lag
+        self._sy_lag += sign * y_lag
+        self._syy_lag += sign * y_lag * y_lag
+        self._sxy_social_leads += sign * x[None, :, None] * y_lag[:, None, :]
+        self._sxy_sensor_leads += sign * x_lag[:, :, None] * y[None, None, :]
+
+    def _resync(self):
+        self._reset_sums(self._capacity, len(self._lags), len(SIGNALS))
+        for t in range(max(0, self._minutes - self.window), self._minutes):
+            self._accumulate(t, 1.0)
+        self._since_resync = 0
+
+    def _pearson(self, n, sx, sy, sxx, syy, sxy):
+        np = self.np
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r = (n * sxy - sx * sy) / np.sqrt((n * sxx - sx * sx) * (n * syy - sy * sy))
+        # Constant series have no defined correlation
+        return np.where(np.isfinite(r), np.clip(r, -1.0, 1.0), np.nan)
+
+    def correlations(self):
+        """Strongest sensor/signal correlations over the current window
+
+        A list of at most top_n dicts, strongest first, for pairs whose lag-0
+        or best lagged correlation reaches min_abs. best_lag is in minutes:
+        positive when social activity leads the sensor, negative when the
+        sensor leads.
+        """
+        np = self.np
+        n = self.window
+        if self._minutes < self.window + self.max_lag:
+            return []
+
+        # Series seen for a full window of lagged pairs
+        columns = np.array(sorted(self._series.values()), dtype=np.int64)
+        if not len(columns):
+            return []
+        columns = columns[self._first_seen[columns] <= self._last_closed - self.window - self.max_lag + 1]
+        if not len(columns):
+            return []
+        names = {column: sensor_id for sensor_id, column in self._series.items()}
+
+        social_leads = self._pearson(
+            n, self._sx[None, columns, None], self._sy_lag[:, None, :],
+            self._sxx[None, columns, None], self._syy_lag[:, None, :], self._sxy_social_leads[:, columns, :]
+        )
+        sensor_leads = self._pearson(
+            n, self._sx_lag[:, columns, None], self._sy[None, None, :],
+            self._sxx_lag[:, columns, None], self._syy[None, None, :], self._sxy_sensor_leads[:, columns, :]
+        )
+        pearson = social_leads[0]
+
+        # Lags -max_lag..max_lag in one array; lag 0 appears once
+        by_lag = np.concatenate([sensor_leads[:0:-1], social_leads], axis=0)
+        strength = np.nan_to_num(np.abs(by_lag), nan=-1.0)
+        best = strength.argmax(axis=0)
+        best_r = np.take_along_axis(by_lag, best[None], axis=0)[0]
+        best_lag = best - self.max_lag
+
+        spearman = self._spearman(columns)
+
+        score = np.fmax(np.abs(pearson), np.abs(best_r))
+        candidates = np.argwhere(np.nan_to_num(score, nan=0.0) >= self.min_abs)
+        candidates = sorted(candidates.tolist(), key=lambda item: -score[item[0], item[1]])[:self.top_n]
+
+        def value(number):
+            return None if np.isnan(number) else round(float(number), 4)
+
+        return [
+            {
+                "sensor_id": names[int(columns[row])],
+                "signal": SIGNALS[signal],
+                "pearson": value(pearson[row, signal]),
+                "spearman": value(spearman[row, signal]),
+                "best_lag": int(best_lag[row, signal]),
+                "lag_correlation": value(best_r[row, signal])
+            }
+            for row, signal in candidates
+        ]
+
+    def _spearman(self, columns):
+        np = self.np
+        rows = (np.arange(self._minutes - self.window, self._minutes)) % self._rows
+        x = rank_columns(self._x[rows][:, columns])
+        y = rank_columns(self._y[rows])
+        x -= x.mean(axis=0)
+        y -= y.mean(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r = (x.T @ y) / np.sqrt(np.outer((x * x).sum(axis=0), (y * y).sum(axis=0)))
+        return np.where(np.isfinite(r), r, np.nan)
+
+    def get_stats(self):
+        return {
+            "series": len(self._series),
+            "minutes": self._minutes,
+            "capacity": self._capacity
+        }
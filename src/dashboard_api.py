@@ -0,0 +1,360 @@
+import asyncio
+import gzip
+import hashlib
+import heapq
+import json
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from datetime import datetime
+
+from src.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+REQUESTS = {
+    200: REGISTRY.counter("dashboard_requests_total", status="200"),
+    304: REGISTRY.counter("dashboard_requests_total", status="304"),
+    "error": REGISTRY.counter("dashboard_requests_total", status="error")
+}
+RENDERS = REGISTRY.counter("dashboard_view_renders_total")
+
+# Bodies smaller than this are sent uncompressed
+GZIP_MIN_BYTES = 512
+
+class View:
+    """A JSON document served from memory
+
+    The document is built and encoded (plain and gzip, with its ETag) only
+    when the data behind it has changed, and at most once per min_interval
+    seconds; every other request is served from the encoded bytes. Views over
+    time windows set max_age so that expired data drops out without new data.
+    """
+
+    __slots__ = ("build", "min_interval", "max_age", "version", "rendered_version", "rendered_at", "body", "gzipped", "etag")
+
+    def __init__(self, build, min_interval=1.0, max_age=None):
+        self.build = build
+        self.min_interval = min_interval
+        self.max_age = max_age
+        self.version = 0
+        self.rendered_version = -1
+        self.rendered_at = 0.0
+        self.body = None
+        self.gzipped = None
+        self.etag = None
+
+    def touch(self):
+        self.version += 1
+
+    def render(self):
+        """Encoded (body, gzipped body or None, etag)"""
+        now = time.monotonic()
+        age = now - self.rendered_at
+        changed = self.rendered_version != self.version or (self.max_age is not None and age >= self.max_age)
+        if self.body is None or (changed and age >= self.min_interval):
+            version = self.version
+            body = json.dumps(self.build(), default=str, separators=(",", ":")).encode("utf-8")
+            self.etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+            self.gzipped = gzip.compress(body, 6) if len(body) >= GZIP_MIN_BYTES else None
+            self.body = body
+            self.rendered_version = version
+            self.rendered_at = now
+            RENDERS.inc()
+        return self.body, self.gzipped, self.etag
+
+class Dashboard:
+    """Read-side materializations of the ingested data
+
+    Route handlers feed every sensor reading and post in as it arrives:
+    latest value per sensor, per-minute windows (count, mean, min, max) over
+    the last window_minutes, and hashtag and post counts over the same window,
+    all kept as running aggregates. Snapshots computed elsewhere (trend
+    analyses, influencers, correlations) are stored with set(). Requests never
+    reach the databases. related_hashtags(tag, top_n), if given, adds the
+    hashtags used together with each top hashtag to the trends view.
+    """
+
+    def __init__(self, window_minutes=60, top_hashtags=20, max_sensors=10000, min_refresh=1.0, related_hashtags=None):
+        self.window_minutes = window_minutes
+        self.top_hashtags = top_hashtags
+        self.max_sensors = max_sensors
+        self.related_hashtags = related_hashtags
+
+        # sensor_id -> latest reading, least recently updated first
+        self._latest = OrderedDict()
+        # sensor_id -> deque of [minute, count, sum, min, max]
+        self._windows = {}
+        # deque of [minute, posts per platform, hashtag counts]; totals over the window
+        self._social = deque()
+        self._posts = Counter()
+        self._hashtags = Counter()
+        # view -> key -> document
+        self._documents = {"trends": {}, "influencers": {}, "correlations": {}}
+        self._lock = threading.Lock()
+
+        self.views = {
+            "sensors/latest": View(self._build_latest, min_refresh),
+            "sensors/windows": View(self._build_windows, min_refresh, max_age=60),
+            "trends": View(self._build_trends, min_refresh, max_age=60),
+            "influencers": View(self._build_documents("influencers"), min_refresh),
+            "correlations": View(self._build_documents("correlations"), min_refresh)
+        }
+
+    def record_sensor(self, topic, data):
+        value = data.get("value")
+        sensor_id = data.get("sensor_id") or topic
+        minute = int(time.time() // 60)
+        with self._lock:
+            self._latest[sensor_id] = {
+                "topic": topic,
+                "value": value,
+                "unit": data.get("unit"),
+                "timestamp": data.get("timestamp")
+            }
+            self._latest.move_to_end(sensor_id)
+            if len(self._latest) > self.max_sensors:
+                evicted, _ = self._latest.popitem(last=False)
+                self._windows.pop(evicted, None)
+
+            if isinstance(value, (int, float)):
+                window = self._windows.get(sensor_id)
+                if window is None:
+                    window = self._windows[sensor_id] = deque()
+                if window and window[-1][0] == minute:
+                    bucket = window[-1]
+                    bucket[1] += 1
+                    bucket[2] += value
+                    bucket[3] = min(bucket[3], value)
+                    bucket[4] = max(bucket[4], value)
+                else:
+                    window.append([minute, 1, value, value, value])
+                    while window[0][0] <= minute - self.window_minutes:
+                        window.popleft()
+                self.views["sensors/windows"].touch()
+            self.views["sensors/latest"].touch()
+
+    def record_post(self, topic, data):
+        platform = topic.split("/")[1]
+        minute = int(time.time() // 60)
+        with self._lock:
+            self._expire_social(minute)
+            if not self._social or self._social[-1][0] != minute:
+                self._social.append([minute, Counter(), Counter()])
+            _, posts, hashtags = self._social[-1]
+            posts[platform] += 1
+            self._posts[platform] += 1
+            for tag in data.get("hashtags") or ():
+                tag = tag.lstrip("#").lower()
+                hashtags[tag] += 1
+                self._hashtags[tag] += 1
+            self.views["trends"].touch()
+
+    def _expire_social(self, minute):
+        while self._social and self._social[0][0] <= minute - self.window_minutes:
+            _, posts, hashtags = self._social.popleft()
+            self._posts.subtract(posts)
+            self._hashtags.subtract(hashtags)
+            # subtract() leaves zero counts behind
+            self._posts += Counter()
+            self._hashtags += Counter()
+
+    def set(self, view, key, document):
+        """Store a snapshot computed elsewhere (e.g. set("trends", "twitter", analysis))"""
+        document = {name: value for name, value in document.items() if name != "_id"}
+        with self._lock:
+            self._documents[view][key] = document
+            self.views[view].touch()
+
+    def _build_latest(self):
+        with self._lock:
+            return {"sensors": dict(self._latest)}
+
+    def _build_windows(self):
+        # Sensors that stopped reporting keep their buckets until the next reading; skip expired ones here
+        oldest = int(time.time() // 60) - self.window_minutes
+        with self._lock:
+            windows = {
+                sensor_id: [tuple(bucket) for bucket in window if bucket[0] > oldest]
+                for sensor_id, window in self._windows.items()
+            }
+        return {
+            "window_minutes": self.window_minutes,
+            "sensors": {
+                sensor_id: [
+                    {
+                        "minute": datetime.fromtimestamp(minute * 60).isoformat(),
+                        "count": count,
+                        "mean": total / count,
+                        "min": low,
+                        "max": high
+                    }
+                    for minute, count, total, low, high in window
+                ]
+                for sensor_id, window in windows.items()
+                if window
+            }
+        }
+
+    def _build_trends(self):
+        with self._lock:
+            self._expire_social(int(time.time() // 60))
+            trends = {
+                "window_minutes": self.window_minutes,
+                "posts": dict(self._posts),
+                "hashtags": [
+                    {"tag": tag, "count": count}
+                    for tag, count in heapq.nlargest(self.top_hashtags, self._hashtags.items(), key=lambda item: item[1])
+                ],
+                "platforms": dict(self._documents["trends"])
+            }
+        # Outside the lock: the co-occurrence graph has its own
+        if self.related_hashtags is not None:
+            for entry in trends["hashtags"]:
+                entry["related"] = self.related_hashtags(entry["tag"], 5)
+        return trends
+
+    def _build_documents(self, view):
+        def build():
+            with self._lock:
+                return dict(self._documents[view])
+        return build
+
+class DashboardServer:
+    """Serves Dashboard views as JSON over HTTP from an asyncio loop in a background thread
+
+    GET /api lists the views, GET /api/<view> returns one. Responses carry an
+    ETag; a request whose If-None-Match matches gets 304 Not Modified with no
+    body. Clients that accept gzip get the pre-compressed body.
+    """
+
+    def __init__(self, dashboard, host="127.0.0.1", port=8088, idle_timeout=30.0):
+        self.dashboard = dashboard
+        self.host = host
+        self.port = port
+        self.idle_timeout = idle_timeout
+        self._loop = None
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        started = threading.Event()
+        errors = []
+
+        def run():
+            loop = self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                self._server = loop.run_until_complete(asyncio.start_server(self._handle, self.host, self.port))
+            except OSError as e:
+                errors.append(e)
+                started.set()
+                loop.close()
+                return
+            started.set()
+            try:
+                loop.run_forever()
+            finally:
+                # Idle keep-alive connections are still waiting for their next request
+                self._server.close()
+                tasks = asyncio.all_tasks(loop)
+                for task in tasks:
+                    task.cancel()
+                loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+                loop.run_until_complete(self._server.wait_closed())
+                loop.close()
+
+        self._thread = threading.Thread(target=run, name="dashboard-api", daemon=True)
+        self._thread.start()
+        started.wait()
+        if errors:
+            logger.error(f"Could not start dashboard API on {self.host}:{self.port}: {errors[0]}")
+            self._thread = None
+            return False
+        logger.info(f"Dashboard API available at http://{self.host}:{self.port}/api")
+        return True
+
+    def stop(self):
+        if self._thread:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                    if len(headers) > 100:
+                        break
+
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    self._write(writer, 400, {}, b"", keep_alive=False)
+                    break
+                # Requests with a body are not supported, so the connection cannot be reused after one
+                keep_alive = (
+                    version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                    and "content-length" not in headers and "transfer-encoding" not in headers
+                )
+                status, response_headers, body = self.respond(method, target, headers)
+                self._write(writer, status, response_headers, body if method != "HEAD" else b"", keep_alive,
+                            content_length=len(body))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            # Idle, gone, or the server is stopping
+            pass
+        finally:
+            writer.close()
+
+    def respond(self, method, target, headers):
+        """(status, headers, body) for a request"""
+        if method not in ("GET", "HEAD"):
+            REQUESTS["error"].inc()
+            return 405, {"Allow": "GET, HEAD"}, b""
+
+        path = target.split("?", 1)[0].rstrip("/")
+        if path == "/api":
+            body = json.dumps({"views": [f"/api/{name}" for name in self.dashboard.views]}).encode("utf-8")
+            REQUESTS[200].inc()
+            return 200, {"Content-Type": "application/json"}, body
+
+        view = self.dashboard.views.get(path[len("/api/"):]) if path.startswith("/api/") else None
+        if view is None:
+            REQUESTS["error"].inc()
+            return 404, {}, b""
+
+        body, gzipped, etag = view.render()
+        response_headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if etag in (tag.strip() for tag in headers.get("if-none-match", "").split(",")):
+            REQUESTS[304].inc()
+            return 304, response_headers, b""
+
+        response_headers["Content-Type"] = "application/json"
+        if gzipped is not None and "gzip" in headers.get("accept-encoding", ""):
+            response_headers["Content-Encoding"] = "gzip"
+            body = gzipped
+        REQUESTS[200].inc()
+        return 200, response_headers, body
+
+    @staticmethod
+    def _write(writer, status, headers, body, keep_alive, content_length=None):
+        reason = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}[status]
+        lines = [f"HTTP/1.1 {status} {reason}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        if status != 304:
+            lines.append(f"Content-Length: {len(body) if content_length is None else content_length}")
+        lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
@@ -1,216 +1,660 @@
 import json
 import time
+import math
 import logging
-import threading
-import schedule
 import datetime
 import os
-import pandas as pd
+import itertools
+from collections import OrderedDict
 from pathlib import Path
 
 # Import other modules from our project
 from src.mqtt_client import MQTTClient
 from src.database_manager import DatabaseManager
 from src.social_media_connector import SocialMediaConnector
+from src.cooccurrence_graph import CooccurrenceGraph
+from src.collection_scheduler import CollectionScheduler, parse_targets
+from src.traffic_capture import TrafficRecorder
+from src.timeseries_store import create_sensor_store
+from src.retention import RetentionManager, parse_retention_policies
+from src.dedup import NearDuplicateDetector
+from src.correlation_engine import CorrelationEngine
+from src.dashboard_api import Dashboard, DashboardServer
+from src.topic_router import STOP, TopicRouter
+from src.write_coordinator import WriteCoordinator
+from src.utils.metrics import REGISTRY, MetricsServer, timed
+
+# Per-stage instrumentation of the ingestion path
+MESSAGES_RECEIVED = {
+    "sensors": REGISTRY.counter("mqtt_messages_received_total", kind="sensor"),
+    "social": REGISTRY.counter("mqtt_messages_received_total", kind="social"),
+    "invalid": REGISTRY.counter("mqtt_messages_received_total", kind="invalid"),
+    "failed": REGISTRY.counter("mqtt_messages_received_total", kind="failed"),
+    "unrouted": REGISTRY.counter("mqtt_messages_received_total", kind="unrouted")
+}
+MESSAGES_STORED = {
+    True: REGISTRY.counter("messages_stored_total", result="complete"),
+    False: REGISTRY.counter("messages_stored_total", result="partial")
+}
+JSON_DECODE_SECONDS = REGISTRY.histogram("stage_latency_seconds", stage="json_decode")
 
-# Logging configuration
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Sensor types stored as readings in the time-series store
+STRUCTURED_SENSORS = ("temperature", "humidity", "pressure")
+
+# What each process role builds: database stores, social API clients, MQTT
+# subscriptions, scheduled jobs and whether the dashboard API runs by default.
+# "all" is the single-process deployment; the others let hot ingestion scale
+# out separately from collection and reports.
+ROLES = {
+    "all": {
+        "stores": ("sql", "mongo", "neo4j"),
+        "social_apis": True,
+        "subscriptions": ("sensors/+", "social/+"),
+        "jobs": ("collect", "cooccurrence_sync", "graph_analytics", "daily_report", "sensor_retention", "retention",
+                 "correlation"),
+        "dashboard": True
+    },
+    "ingest-sensors": {
+        "stores": ("sql", "mongo"),
+        "social_apis": False,
+        "subscriptions": ("sensors/+",),
+        "jobs": (),
+        "dashboard": False
+    },
+    "ingest-social": {
+        "stores": ("sql", "mongo", "neo4j"),
+        "social_apis": False,
+        "subscriptions": ("social/+",),
+        "jobs": ("cooccurrence_sync",),
+        "dashboard": False
+    },
+    "collect": {
+        "stores": ("mongo",),
+        "social_apis": True,
+        "subscriptions": (),
+        "jobs": ("collect",),
+        "dashboard": False
+    },
+    "report": {
+        "stores": ("sql", "mongo", "neo4j"),
+        "social_apis": False,
+        "subscriptions": (),
+        "jobs": ("graph_analytics", "daily_report", "sensor_retention", "retention"),
+        "dashboard": False
+    }
+}
+
+def document_key(platform, data):
+    """Write key of a social post's MongoDB document ("platform:id", as in duplicate_of), or None"""
+    return f"{platform}:{data['id']}" if data.get("id") else None
+
 class DataProcessor:
-    def __init__(self, config=None):
+    def __init__(self, config=None, mqtt_client=None, db_manager=None, social_connector=None, role=None):
         if config is None:
             config = {}
         
-        # Start MQTT client setup
-        self.mqtt_client = MQTTClient(
-            broker_address=config.get("MQTT_BROKER_ADDRESS", "localhost"),
-            broker_port=int(config.get("MQTT_BROKER_PORT", 1883))
-        )
+        self.role = role or config.get("ROLE") or "all"
+        if self.role not in ROLES:
+            raise ValueError(f"Unknown role '{self.role}', expected one of: {', '.join(ROLES)}")
+        role_spec = ROLES[self.role]
+        self.subscriptions = role_spec["subscriptions"]
+        self.jobs = role_spec["jobs"]
+        # Several processes of one role share the topics with an MQTT shared subscription
+        self.shared_group = config.get("MQTT_SHARED_GROUP")
+        
+        # Components can be injected (e.g. in-process stand-ins for benchmarks)
+        self.mqtt_client = mqtt_client
+        self.db_manager = db_manager
+        self.social_connector = social_connector
+        
+        # Start MQTT client setup (roles that neither receive nor publish need none)
+        if self.mqtt_client is None and (self.subscriptions or "collect" in self.jobs):
+            self.mqtt_client = MQTTClient(
+                broker_address=config.get("MQTT_BROKER_ADDRESS", "localhost"),
+                broker_port=int(config.get("MQTT_BROKER_PORT", 1883)),
+                # Client IDs must be unique per connection, or workers disconnect each other
+                client_id=config.get("MQTT_CLIENT_ID") or f"data_processor_{self.role}_{os.getpid()}",
+                max_inflight=int(config.get("MQTT_MAX_INFLIGHT", 1000)),
+                publish_timeout=float(config.get("MQTT_PUBLISH_TIMEOUT", 30)),
+                publish_qos=int(config.get("MQTT_PUBLISH_QOS", 1)),
+                keepalive=int(config.get("MQTT_KEEPALIVE", 60)),
+                reconnect_min_delay=float(config.get("MQTT_RECONNECT_MIN_SECONDS", 1)),
+                reconnect_max_delay=float(config.get("MQTT_RECONNECT_MAX_SECONDS", 120))
+            )
         
         # Start database manager setup
-        self.db_manager = DatabaseManager(
-            sql_conn_string=config.get("SQL_CONN_STRING", "sqlite:///data/iot_social_data.db"),
-            mongo_conn_string=config.get("MONGO_CONN_STRING", "mongodb://localhost:27017/"),
-            neo4j_uri=config.get("NEO4J_URI", "bolt://localhost:7687"),
-            neo4j_user=config.get("NEO4J_USER", "neo4j"),
-            neo4j_password=config.get("NEO4J_PASSWORD", "password")
-        )
+        if self.db_manager is None:
+            self.db_manager = DatabaseManager(
+                sql_conn_string=config.get("SQL_CONN_STRING", "sqlite:///data/iot_social_data.db"),
+                mongo_conn_string=config.get("MONGO_CONN_STRING", "mongodb://localhost:27017/"),
+                neo4j_uri=config.get("NEO4J_URI", "bolt://localhost:7687"),
+                neo4j_user=config.get("NEO4J_USER", "neo4j"),
+                neo4j_password=config.get("NEO4J_PASSWORD", "password"),
+                cache_ttl=int(config.get("QUERY_CACHE_TTL", 60)),
+                cache_max_entries=int(config.get("QUERY_CACHE_MAX_ENTRIES", 1024)),
+                cache_max_bytes=int(config.get("QUERY_CACHE_MAX_MB", 64)) * 1024 * 1024,
+                stores=role_spec["stores"],
+                post_batch_size=int(config.get("SQL_POST_BATCH_SIZE", 500)),
+                post_flush_interval=float(config.get("SQL_POST_FLUSH_SECONDS", 1.0)),
+                post_compress_min_bytes=int(config.get("POST_COMPRESS_MIN_BYTES", 1024)),
+                post_max_queued=int(config.get("SQL_POST_MAX_QUEUED", 10000)),
+                connect_timeout=float(config.get("DB_CONNECT_TIMEOUT", 5)),
+                failure_threshold=int(config.get("DB_FAILURE_THRESHOLD", 3)),
+                retry_min_delay=float(config.get("DB_RETRY_MIN_SECONDS", 1)),
+                retry_max_delay=float(config.get("DB_RETRY_MAX_SECONDS", 60))
+            )
+        self.db_health_interval = float(config.get("DB_HEALTH_INTERVAL", 15))
+        
+        # Sensor readings go to the configured time-series backend ("sql" or "partitioned")
+        self.sensor_store = None
+        if "sensors/+" in self.subscriptions or "daily_report" in self.jobs:
+            retention_days = int(config.get("SENSOR_RETENTION_DAYS", 0))
+            self.sensor_store = create_sensor_store(
+                config.get("SENSOR_STORE", "sql"),
+                self.db_manager,
+                conn_string=config.get("SENSOR_STORE_URL") or None,
+                retention_days=retention_days or None,
+                compress_after_days=int(config.get("SENSOR_COMPRESS_AFTER_DAYS", 7)) or None
+            )
+        # Writer pool of the sensor store: the SQL one (one writer at a time) unless it has its own database
+        self.sensor_store_writer = "timeseries" if getattr(self.sensor_store, "owns_engine", False) else "sql"
+        
+        # Per table/collection/relationship retention, applied in small batches
+        self.retention_manager = None
+        policies = parse_retention_policies(config.get("RETENTION_POLICIES"))
+        if policies and "retention" in self.jobs:
+            self.retention_manager = RetentionManager(
+                self.db_manager,
+                policies,
+                batch_size=int(config.get("RETENTION_BATCH_SIZE", 5000)),
+                archive_dir=config.get("RETENTION_ARCHIVE_DIR", "data/archive")
+            )
+        self.retention_interval_hours = float(config.get("RETENTION_INTERVAL_HOURS", 24))
+        
+        # Near-duplicate (copy-paste/spam) detection: "off", "mark" or "collapse"
+        self.dedup_mode = config.get("DEDUP_MODE", "off")
+        if self.dedup_mode not in ("off", "mark", "collapse"):
+            raise ValueError(f"Unknown DEDUP_MODE '{self.dedup_mode}', expected 'off', 'mark' or 'collapse'")
+        self.near_duplicates = None
+        if self.dedup_mode != "off" and ("social/+" in self.subscriptions or role_spec["social_apis"]):
+            self.near_duplicates = NearDuplicateDetector(
+                threshold=float(config.get("DEDUP_THRESHOLD", 0.8)),
+                window=int(config.get("DEDUP_WINDOW_MINUTES", 60)) * 60,
+                max_clusters=int(config.get("DEDUP_MAX_CLUSTERS", 20000))
+            )
+            REGISTRY.gauge("dedup_clusters", callback=lambda: len(self.near_duplicates))
+        self._anonymous_ids = itertools.count()
         
         # Start social media connector setup
-        twitter_credentials = {
-            "consumer_key": config.get("TWITTER_API_KEY"),
-            "consumer_secret": config.get("TWITTER_API_SECRET"),
-            "access_token": config.get("TWITTER_ACCESS_TOKEN"),
-            "access_token_secret": config.get("TWITTER_ACCESS_SECRET")
-        }
-        
-        reddit_credentials = {
-            "client_id": config.get("REDDIT_CLIENT_ID"),
-            "client_secret": config.get("REDDIT_CLIENT_SECRET"),
-            "user_agent": config.get("REDDIT_USER_AGENT"),
-            "username": config.get("REDDIT_USERNAME"),
-            "password": config.get("REDDIT_PASSWORD")
-        }
-        
-        self.social_connector = SocialMediaConnector(
-            twitter_credentials=twitter_credentials,
-            reddit_credentials=reddit_credentials
+        if self.social_connector is None and role_spec["social_apis"]:
+            twitter_credentials = {
+                "consumer_key": config.get("TWITTER_API_KEY"),
+                "consumer_secret": config.get("TWITTER_API_SECRET"),
+                "access_token": config.get("TWITTER_ACCESS_TOKEN"),
+                "access_token_secret": config.get("TWITTER_ACCESS_SECRET")
+            }
+            
+            reddit_credentials = {
+                "client_id": config.get("REDDIT_CLIENT_ID"),
+                "client_secret": config.get("REDDIT_CLIENT_SECRET"),
+                "user_agent": config.get("REDDIT_USER_AGENT"),
+                "username": config.get("REDDIT_USERNAME"),
+                "password": config.get("REDDIT_PASSWORD")
+            }
+            
+            self.social_connector = SocialMediaConnector(
+                twitter_credentials=twitter_credentials,
+                reddit_credentials=reddit_credentials,
+                near_duplicates=self.near_duplicates
+            )
+        
+        # In-memory hashtag/user co-occurrence graph, synced to Neo4j periodically
+        self.cooccurrence_graph = CooccurrenceGraph(
+            max_hashtags=int(config.get("COOCCURRENCE_MAX_HASHTAGS", 50000)),
+            max_users=int(config.get("COOCCURRENCE_MAX_USERS", 100000)),
+            max_pending_edges=int(config.get("COOCCURRENCE_MAX_PENDING_EDGES", 500000))
+        )
+        self.cooccurrence_sync_minutes = int(config.get("COOCCURRENCE_SYNC_MINUTES", 5))
+        
+        # Graph-based influence (PageRank, degree, communities) over the Neo4j social graph;
+        # created on first use so NumPy/SciPy are only imported when the job runs
+        self.graph_analytics = None
+        self.graph_analytics_hours = int(config.get("GRAPH_ANALYTICS_HOURS", 6))
+        
+        # Collection targets as "name:priority" lists
+        self.twitter_queries = parse_targets(config.get("TWITTER_QUERIES"), "#IoT:1")
+        self.reddit_subreddits = parse_targets(config.get("REDDIT_SUBREDDITS"), "IoT:1")
+        self.twitter_count = int(config.get("TWITTER_COUNT", 100))
+        self.reddit_limit = int(config.get("REDDIT_LIMIT", 50))
+        
+        # Newest item seen per target, so each poll only counts (and publishes) new items
+        self.twitter_since_ids = {}
+        self.reddit_watermarks = {}
+        self.comment_watermarks = OrderedDict()
+        
+        # Budgets for walking Reddit comment trees
+        self.comment_max_depth = int(config.get("REDDIT_COMMENT_MAX_DEPTH", 5))
+        self.comment_max_count = int(config.get("REDDIT_COMMENT_MAX", 100))
+        self.comment_max_more = int(config.get("REDDIT_COMMENT_MAX_MORE", 4))
+        
+        # Concurrent, rate-limit-aware scheduler for collection and maintenance jobs
+        self.scheduler = CollectionScheduler(
+            max_workers=int(config.get("COLLECT_WORKERS", 4)),
+            rate_limit_provider=self.social_connector.get_rate_limit if self.social_connector else None
+        )
+        # Flushes and health checks run apart from the collectors, and apart from
+        # the long analytics and retention runs, so neither can hold them up
+        self.scheduler.add_pool("maintenance", int(config.get("MAINTENANCE_WORKERS", 2)))
+        self.scheduler.add_pool("analytics", int(config.get("ANALYTICS_WORKERS", 1)))
+        self.collect_min_interval = int(config.get("COLLECT_MIN_INTERVAL", 300))
+        self.collect_max_interval = int(config.get("COLLECT_MAX_INTERVAL", 21600))
+        
+        # Metrics endpoint (Prometheus text format); port 0 disables it
+        self.metrics_server = None
+        metrics_port = int(config.get("METRICS_PORT", 9108))
+        if metrics_port:
+            self.metrics_server = MetricsServer(config.get("METRICS_HOST", "127.0.0.1"), metrics_port)
+        for stat in ("hits", "misses", "evictions", "entries", "bytes"):
+            REGISTRY.gauge("query_cache_" + stat, callback=lambda stat=stat: self.db_manager.query_cache.get_stats()[stat])
+        
+        # Optional capture of received traffic for later replay (scripts/replay_traffic.py)
+        self.traffic_recorder = None
+        if config.get("CAPTURE_FILE") and self.subscriptions:
+            self.traffic_recorder = TrafficRecorder(config["CAPTURE_FILE"])
+        
+        # Read API over in-memory views of incoming data. On by default only in the
+        # all-in-one role: other roles see part of the data, and sharded workers on one
+        # host would compete for the port. DASHBOARD_PORT enables it, 0 disables it.
+        self.dashboard = None
+        self.dashboard_server = None
+        dashboard_port = config.get("DASHBOARD_PORT")
+        if dashboard_port in (None, ""):
+            dashboard_port = 8088 if role_spec["dashboard"] else 0
+        dashboard_port = int(dashboard_port)
+        if dashboard_port:
+            self.dashboard = Dashboard(
+                window_minutes=int(config.get("DASHBOARD_WINDOW_MINUTES", 60)),
+                min_refresh=float(config.get("DASHBOARD_REFRESH_SECONDS", 1.0)),
+                related_hashtags=self.related_hashtags
+            )
+            self.dashboard_server = DashboardServer(self.dashboard, config.get("DASHBOARD_HOST", "127.0.0.1"), dashboard_port)
+        self.dashboard_snapshot_minutes = float(config.get("DASHBOARD_SNAPSHOT_MINUTES", 5))
+        
+        # Sensor/social correlation needs both streams, so it only runs in the all-in-one role
+        self.correlation_engine = None
+        correlation_window = int(config.get("CORRELATION_WINDOW_MINUTES", 60))
+        if "correlation" in self.jobs and correlation_window:
+            self.correlation_engine = CorrelationEngine(
+                window=correlation_window,
+                max_lag=int(config.get("CORRELATION_MAX_LAG_MINUTES", 15)),
+                min_abs=float(config.get("CORRELATION_MIN_ABS", 0.5)),
+                top_n=int(config.get("CORRELATION_TOP_N", 50))
+            )
+        self.correlation_topic = config.get("CORRELATION_TOPIC", "analytics/correlations")
+        
+        # Store writes of a message run concurrently, one executor per store
+        self.write_coordinator = WriteCoordinator(
+            workers=dict(parse_targets(config.get("WRITE_WORKERS"), "")) or None,
+            max_pending=int(config.get("WRITE_MAX_PENDING", 10000)),
+            concurrent=str(config.get("WRITE_FANOUT", "true")).lower() == "true"
         )
         
+        # Topic routes: core handlers plus plugin modules (comma separated) that add their own
+        self.router = TopicRouter()
+        self.mongo_batch_size = int(config.get("MONGO_BATCH_SIZE", 100))
+        self.mongo_batch_seconds = float(config.get("MONGO_BATCH_SECONDS", 1.0))
+        self.register_routes()
+        plugins = [name.strip() for name in (config.get("ROUTE_PLUGINS") or "").split(",") if name.strip()]
+        self.router.load_plugins(plugins, self)
+        
         # Customize MQTT callback
-        self.mqtt_client.client.on_message = self.on_mqtt_message
+        if self.mqtt_client is not None:
+            self.mqtt_client.client.on_message = self.on_mqtt_message
         
         # Create directory for reports
         reports_dir = Path("data/reports")
         reports_dir.mkdir(parents=True, exist_ok=True)
     
     def start(self):
-        """Start all services"""
+        """Start the services of this process's role"""
+        if self.metrics_server:
+            self.metrics_server.start()
+        if self.dashboard_server:
+            self.dashboard_server.start()
+        
         # Establish MQTT connection
-        if self.mqtt_client.connect():
-            # Subscribe to relevant MQTT topics
-            self.mqtt_client.subscribe("sensors/+")  # All sensor data
-            self.mqtt_client.subscribe("social/+")   # All social media data
+        if self.mqtt_client is not None and self.mqtt_client.connect():
+            # Subscribe to the role's topics (sensors/+, social/+ or both)
+            for topic in self.subscriptions:
+                if self.shared_group:
+                    topic = f"$share/{self.shared_group}/{topic}"
+                self.mqtt_client.subscribe(topic)
         
-        # Schedule tasks
-        schedule.every(1).hours.do(self.collect_twitter_data, query="#IoT", count=100)
-        schedule.every(2).hours.do(self.collect_reddit_data, subreddit="IoT", limit=50)
-        schedule.every(1).days.at("00:00").do(self.generate_daily_report)
+        self.schedule_jobs()
+        self.scheduler.start()
         
-        # Start a thread to run scheduled tasks
-        scheduler_thread = threading.Thread(target=self.run_scheduler)
-        scheduler_thread.daemon = True
-        scheduler_thread.start()
+        logger.info(f"Data processor started successfully (role: {self.role})")
+    
+    def schedule_jobs(self):
+        """Register the role's collection and maintenance jobs with the scheduler"""
+        if "collect" in self.jobs:
+            self.schedule_collection_jobs()
         
-        # Start initial data collection immediately
-        self.collect_twitter_data(query="#IoT", count=50)
-        self.collect_reddit_data(subreddit="IoT", limit=20)
+        # Daily report at midnight, maintenance jobs at fixed intervals
+        if "daily_report" in self.jobs:
+            tomorrow = datetime.datetime.combine(datetime.date.today() + datetime.timedelta(days=1), datetime.time())
+            self.scheduler.add_job("daily_report", self.generate_daily_report, interval=86400,
+                                   first_run=tomorrow.timestamp(), pool="analytics")
+        if "cooccurrence_sync" in self.jobs:
+            self.scheduler.add_job("cooccurrence_sync", self.sync_cooccurrence_graph,
+                                   interval=self.cooccurrence_sync_minutes * 60,
+                                   first_run=time.time() + self.cooccurrence_sync_minutes * 60, pool="maintenance")
+        if "graph_analytics" in self.jobs:
+            self.scheduler.add_job("graph_analytics", self.compute_graph_influence,
+                                   interval=self.graph_analytics_hours * 3600,
+                                   first_run=time.time() + self.graph_analytics_hours * 3600, pool="analytics")
+        if "sensor_retention" in self.jobs and self.sensor_store:
+            self.scheduler.add_job("sensor_retention", self.apply_sensor_retention, interval=3600, pool="maintenance")
+        if self.subscriptions:
+            # Hands batches that did not fill up to their handlers
+            self.scheduler.add_job("route_flush", self.router.flush, interval=self.mongo_batch_seconds,
+                                   pool="maintenance")
+        if "social/+" in self.subscriptions and "sql" in self.db_manager.stores:
+            # Writes out batches that did not fill up during quiet periods
+            self.scheduler.add_job("post_flush", self.db_manager.flush_posts,
+                                   interval=self.db_manager.post_flush_interval, pool="maintenance")
+        if self.db_manager.stores and self.db_health_interval:
+            # Detects outages (and recoveries) of stores that are not being written to
+            self.scheduler.add_job("db_health", self.db_manager.check_health, interval=self.db_health_interval,
+                                   pool="maintenance")
+        if self.dashboard and "mongo" in self.db_manager.stores:
+            # Snapshots stored by other processes (or before a restart); starts immediately
+            self.scheduler.add_job("dashboard_snapshots", self.load_dashboard_snapshots,
+                                   interval=self.dashboard_snapshot_minutes * 60, first_run=time.time(),
+                                   pool="maintenance")
+        if self.correlation_engine:
+            # Just after each minute closes
+            self.scheduler.add_job("correlation", self.publish_correlations, interval=60,
+                                   first_run=(time.time() // 60 + 1) * 60 + 1, pool="maintenance")
+        if "retention" in self.jobs and self.retention_manager:
+            self.scheduler.add_job("retention", self.retention_manager.apply,
+                                   interval=self.retention_interval_hours * 3600, pool="analytics")
+    
+    def schedule_collection_jobs(self):
+        """Register the Twitter and Reddit collection jobs and their API budgets"""
+        # Twitter search: 180 requests per 15 minutes, one page per 100 tweets
+        self.scheduler.add_api("twitter", capacity=180, period=900, max_concurrent=2)
+        # Reddit OAuth: 60 requests per minute; PRAW is not thread-safe
+        self.scheduler.add_api("reddit", capacity=60, period=60, max_concurrent=1)
         
-        logger.info("Data processor started successfully")
+        for query, priority in self.twitter_queries:
+            self.scheduler.add_job(
+                f"twitter:{query}",
+                lambda query=query: self.collect_twitter_data(query=query, count=self.twitter_count),
+                interval=3600,
+                priority=priority,
+                api="twitter",
+                cost=math.ceil(self.twitter_count / 100),
+                adaptive=True,
+                expected_items=self.twitter_count,
+                min_interval=self.collect_min_interval,
+                max_interval=self.collect_max_interval
+            )
+        
+        for subreddit, priority in self.reddit_subreddits:
+            self.scheduler.add_job(
+                f"reddit:{subreddit}",
+                lambda subreddit=subreddit: self.collect_reddit_data(subreddit=subreddit, limit=self.reddit_limit),
+                interval=7200,
+                priority=priority,
+                api="reddit",
+                cost=math.ceil(self.reddit_limit / 100),
+                adaptive=True,
+                expected_items=self.reddit_limit,
+                min_interval=self.collect_min_interval,
+                max_interval=self.collect_max_interval
+            )
     
-    def run_scheduler(self):
-        """Run scheduled tasks"""
-        while True:
-            schedule.run_pending()
-            time.sleep(1)
+    def register_routes(self):
+        """Core topic routes; ROUTE_PLUGINS modules add their own with register_routes(router, processor)"""
+        # Structured sensor readings go to the time-series store, anything else under sensors/ to MongoDB
+        for sensor_type in STRUCTURED_SENSORS:
+            self.router.add(f"sensors/{sensor_type}", self.process_sensor_reading)
+        self.router.add("sensors/+", self.save_sensor_documents, fallback=True,
+                        batch=True, batch_size=self.mongo_batch_size, max_delay=self.mongo_batch_seconds)
+        
+        # Every social message: duplicate check, then the raw document, then per-platform processing
+        if self.dedup_mode != "off":
+            self.router.add("social/+", self.filter_duplicate_post, priority=10)
+        self.router.add("social/+", self.save_social_document, priority=20)
+        self.router.add("social/twitter", self.process_twitter_post, priority=30)
+        self.router.add("social/reddit", self.process_reddit_post, priority=30)
+        
+        # Per-minute sensor means and post counts for the correlation engine (duplicates excluded)
+        if self.correlation_engine:
+            for sensor_type in STRUCTURED_SENSORS:
+                self.router.add(f"sensors/{sensor_type}", self.track_sensor_reading, priority=110)
+            self.router.add("social/+", self.track_social_post, priority=25)
+        
+        # Dashboard views: every sensor reading (fallback covers the unstructured types) and unique post
+        if self.dashboard:
+            for sensor_type in STRUCTURED_SENSORS:
+                self.router.add(f"sensors/{sensor_type}", self.dashboard.record_sensor, priority=120)
+            self.router.add("sensors/+", self.dashboard.record_sensor, fallback=True, priority=120)
+            self.router.add("social/+", self.dashboard.record_post, priority=26)
     
+    @timed("stage_latency_seconds", stage="mqtt_message")
     def on_mqtt_message(self, client, userdata, msg):
         """Process MQTT messages"""
         try:
             topic = msg.topic
+            if self.traffic_recorder:
+                self.traffic_recorder.record(topic, msg.payload)
             payload = msg.payload.decode("utf-8")
-            logger.info(f"Received message on topic {topic}: {payload}")
+            logger.debug("Received message on topic %s: %s", topic, payload, extra={"msg_class": "mqtt.receive"})
             
             # Convert message to JSON
             try:
+                started = time.perf_counter_ns()
                 data = json.loads(payload)
+                JSON_DECODE_SECONDS.observe_ns(time.perf_counter_ns() - started)
+                
+                counter = MESSAGES_RECEIVED.get(topic.partition("/")[0])
+                if counter is not None:
+                    counter.inc()
                 
-                # Route data to appropriate database based on topic
-                if topic.startswith("sensors/"):
-                    self.process_sensor_data(topic, data)
-                elif topic.startswith("social/"):
-                    self.process_social_data(topic, data)
+                # Route data to the handlers registered for the topic; their store writes form one group
+                with self.write_coordinator.group(self.on_message_stored):
+                    routed = self.router.dispatch(topic, data)
+                if not routed:
+                    MESSAGES_RECEIVED["unrouted"].inc()
+                    logger.debug("No route for topic %s", topic, extra={"msg_class": "mqtt.unrouted"})
                 
             except json.JSONDecodeError:
-                logger.warning(f"Received message is not valid JSON: {payload}")
+                MESSAGES_RECEIVED["invalid"].inc()
+                logger.warning("Received message is not valid JSON: %s", payload, extra={"msg_class": "mqtt.invalid"})
                 
         except Exception as e:
-            logger.error(f"Error processing MQTT message: {e}")
+            MESSAGES_RECEIVED["failed"].inc()
+            logger.error("Error processing MQTT message: %s", e, extra={"msg_class": "mqtt.error"})
+    
+    def on_message_stored(self, results):
+        """Called once every store has acknowledged (or failed) the writes of a message"""
+        stored = all(results.values())
+        MESSAGES_STORED[stored].inc()
+        if not stored:
+            failed = [store for store, ok in results.items() if not ok]
+            logger.debug("Message only partially stored (failed: %s)", ", ".join(failed), extra={"msg_class": "db.partial"})
+    
+    @timed("stage_latency_seconds", stage="sensor_reading")
+    def process_sensor_reading(self, topic, data):
+        """Structured sensor data for the time-series store (SQL by default)"""
+        self.write_coordinator.submit(self.sensor_store_writer, self.sensor_store.write, topic, data)
+    
+    @timed("stage_latency_seconds", stage="sensor_documents")
+    def save_sensor_documents(self, messages):
+        """Other sensor data for MongoDB, one insert per batch"""
+        # BSON dates are UTC; also what TTL retention on this collection expects
+        now = datetime.datetime.utcnow()
+        self.write_coordinator.submit("mongo", self.db_manager.save_data_to_mongodb, "sensor_data", [
+            {"topic": topic, "data": data, "timestamp": now}
+            for topic, data in messages
+        ])
     
-    def process_sensor_data(self, topic, data):
-        """Process sensor data and route to appropriate database"""
-        sensor_type = topic.split("/")[1]
+    def track_sensor_reading(self, topic, data):
+        value = data.get("value")
+        if isinstance(value, (int, float)):
+            self.correlation_engine.add_sensor(data.get("sensor_id") or topic, value)
+    
+    def track_social_post(self, topic, data):
+        sentiment = data.get("sentiment")
+        self.correlation_engine.add_post(sentiment if isinstance(sentiment, (int, float)) else None)
+    
+    def find_duplicate(self, platform, data):
+        """Key ("platform:id") of an earlier near-identical post, or None"""
+        if data.get("duplicate_of"):
+            # Already detected by the collector
+            return data["duplicate_of"]
+        if self.near_duplicates is None:
+            return None
         
-        if sensor_type in ["temperature", "humidity", "pressure"]:
-            # Structured data for SQL
-            self.db_manager.save_sensor_data_to_sql(topic, data)
+        key = f"{platform}:{data.get('id') or f'anonymous_{next(self._anonymous_ids)}'}"
+        text = " ".join(part for part in (data.get("title"), data.get("content")) if part)
+        cluster = self.near_duplicates.check(key, text)
+        if cluster is None or cluster.key == key:
+            return None
+        return cluster.key
+    
+    def filter_duplicate_post(self, topic, data):
+        """Keep near-duplicates out of SQL, Neo4j and hashtag counts"""
+        platform = topic.split("/")[1]
+        duplicate_of = self.find_duplicate(platform, data)
+        if not duplicate_of:
+            return None
+        
+        if self.dedup_mode == "collapse":
+            # Only the first post of the cluster is kept, with a count of its copies
+            original_platform, _, original_id = duplicate_of.partition(":")
+            # Keyed like the original's insert, so the increment runs after it
+            self.write_coordinator.submit(
+                "mongo", self.db_manager.increment_mongodb_field,
+                f"{original_platform}_data", {"id": original_id}, "duplicate_count", key=duplicate_of
+            )
         else:
-            # Other sensor data for MongoDB
-            self.db_manager.save_data_to_mongodb("sensor_data", {
-                "topic": topic,
-                "data": data,
-                "timestamp": datetime.datetime.now()
-            })
-    
-    def process_social_data(self, topic, data):
-        """Process social media data and route to appropriate databases"""
+            data["duplicate_of"] = duplicate_of
+            self.write_coordinator.submit(
+                "mongo", self.db_manager.save_data_to_mongodb, f"{platform}_data", data, key=document_key(platform, data)
+            )
+        logger.debug("Near-duplicate of %s on %s", duplicate_of, topic, extra={"msg_class": "social.duplicate"})
+        return STOP
+    
+    @timed("stage_latency_seconds", stage="social_document")
+    def save_social_document(self, topic, data):
+        """Save all social data to MongoDB (semi-structured)"""
+        # A copy: the insert adds _id while other handlers' writes still read the message
         platform = topic.split("/")[1]
+        self.write_coordinator.submit(
+            "mongo", self.db_manager.save_data_to_mongodb, f"{platform}_data", dict(data), key=document_key(platform, data)
+        )
+    
+    @timed("stage_latency_seconds", stage="twitter_post")
+    def process_twitter_post(self, topic, data):
+        """Tweets: SQL post with sentiment, hashtag co-occurrence and mention relationships"""
+        if "user_id" in data and "content" in data:
+            self.write_coordinator.submit_deferred("sql", self.db_manager.save_social_post_to_sql, "twitter", data)
         
-        # Save all data to MongoDB (semi-structured)
-        self.db_manager.save_data_to_mongodb(f"{platform}_data", data)
+        # Update the local hashtag co-occurrence graph
+        if data.get("hashtags"):
+            self.cooccurrence_graph.add_message(data.get("user_id"), data["hashtags"])
         
-        # Platform-specific processing
-        if platform == "twitter":
-            # Save tweet content and sentiment analysis to SQL
-            if "user_id" in data and "content" in data:
-                self.db_manager.save_social_post_to_sql(platform, data)
-            
-            # Save interactions to Neo4j
-            if "user_id" in data and "mentions" in data:
-                for mentioned_user in data["mentions"]:
-                    self.db_manager.save_social_relationship_to_neo4j(
-                        data["user_id"],
-                        mentioned_user,
-                        "MENTIONS",
-                        {"timestamp": datetime.datetime.now().isoformat()}
-                    )
-        
-        elif platform == "reddit":
-            # Save Reddit posts to SQL
-            if "user_id" in data and "content" in data:
-                self.db_manager.save_social_post_to_sql(platform, data)
-            
-            # Save comment relationships to Neo4j
-            if "user_id" in data and "post_id" in data and "parent_id" in data:
-                self.db_manager.save_social_relationship_to_neo4j(
-                    data["user_id"],
-                    data["parent_id"],
-                    "COMMENTED_ON",
-                    {"timestamp": datetime.datetime.now().isoformat()}
-                )
+        # Save interactions to Neo4j; one write per tweet so its merges do not contend with each
+        # other, and one worker per author so that the author's tweets do not contend either
+        if "user_id" in data and data.get("mentions"):
+            self.write_coordinator.submit(
+                "neo4j", self.save_mentions, data["user_id"], data["mentions"], datetime.datetime.now().isoformat(),
+                key=data["user_id"]
+            )
+    
+    def save_mentions(self, user_id, mentions, timestamp):
+        """MENTIONS relationships of one tweet; False if any of them failed"""
+        saved = True
+        for mentioned_user in mentions:
+            saved = self.db_manager.save_social_relationship_to_neo4j(
+                user_id,
+                mentioned_user,
+                "MENTIONS",
+                {"timestamp": timestamp}
+            ) and saved
+        return saved
+    
+    @timed("stage_latency_seconds", stage="reddit_post")
+    def process_reddit_post(self, topic, data):
+        """Reddit posts: SQL post with sentiment and comment relationships"""
+        if "user_id" in data and "content" in data:
+            self.write_coordinator.submit_deferred("sql", self.db_manager.save_social_post_to_sql, "reddit", data)
+        
+        # Save comment relationships to Neo4j
+        if "user_id" in data and "post_id" in data and "parent_id" in data:
+            self.write_coordinator.submit(
+                "neo4j", self.db_manager.save_social_relationship_to_neo4j,
+                data["user_id"],
+                data["parent_id"],
+                "COMMENTED_ON",
+                {"timestamp": datetime.datetime.now().isoformat()},
+                key=data["user_id"]
+            )
     
     def collect_twitter_data(self, query, count=100):
-        """Collect Twitter data and publish to MQTT"""
+        """Collect Twitter data and publish to MQTT; returns the number of new tweets"""
         try:
             logger.info(f"Collecting Twitter data for query: {query}")
-            tweets = self.social_connector.search_twitter(query, count)
+            tweets = self.social_connector.search_twitter(query, count, since_id=self.twitter_since_ids.get(query))
             
             if tweets:
                 logger.info(f"Collected {len(tweets)} tweets")
                 
-                # Publish each tweet as an MQTT message
-                for tweet in tweets:
-                    self.mqtt_client.publish("social/twitter", json.dumps(tweet))
+                # Publish each tweet as an MQTT message, oldest first, so the watermark only
+                # moves past tweets that were published (publish waits while the broker is behind)
+                for tweet in sorted(tweets, key=lambda tweet: int(tweet.id)):
+                    if self.mqtt_client.publish("social/twitter", tweet.to_json()) is False:
+                        logger.warning(f"MQTT publishing stalled; the rest of '{query}' is fetched again next poll")
+                        break
+                    self.twitter_since_ids[query] = tweet.id
+                
+                # Copies of earlier tweets are published (and marked) but not analyzed again
+                unique_tweets = [tweet for tweet in tweets if tweet.duplicate_of is None]
                 
                 # Identify influential users
-                influencers = self.social_connector.identify_influencers(tweets, "twitter")
+                influencers = self.social_connector.identify_influencers(unique_tweets, "twitter")
                 if influencers:
-                    self.db_manager.save_data_to_mongodb("twitter_influencers", {
+                    self.save_snapshot("twitter_influencers", "influencers", f"twitter:{query}", {
                         "query": query,
                         "timestamp": datetime.datetime.now().isoformat(),
                         "influencers": influencers
                     })
                 
                 # Perform trend analysis
-                trends = self.social_connector.analyze_trends(tweets, "twitter")
+                trends = self.social_connector.analyze_trends(unique_tweets, "twitter")
                 if trends:
-                    self.db_manager.save_data_to_mongodb("twitter_trends", {
+                    self.add_hashtag_context(trends)
+                    self.save_snapshot("twitter_trends", "trends", f"twitter:{query}", {
                         "query": query,
                         "timestamp": datetime.datetime.now().isoformat(),
                         "trends": trends
                     })
                 
-                return True
+                return len(tweets)
             else:
                 logger.warning(f"No tweets found for query: {query}")
-                return False
+                return 0
         except Exception as e:
             logger.error(f"Error collecting Twitter data: {e}")
-            return False
+            return None
     
     def collect_reddit_data(self, subreddit, limit=100, time_filter="week"):
-        """Collect Reddit data and publish to MQTT"""
+        """Collect Reddit data and publish to MQTT; returns the number of new posts"""
         try:
             logger.info(f"Collecting Reddit data for subreddit: {subreddit}")
             posts = self.social_connector.search_reddit(subreddit, limit, time_filter)
@@ -218,62 +662,229 @@ class DataProcessor:
             if posts:
                 logger.info(f"Collected {len(posts)} posts from r/{subreddit}")
                 
-                # Publish each post as an MQTT message
-                for post in posts:
-                    self.mqtt_client.publish("social/reddit", json.dumps({
-                        **post,
-                        "created_at": post["created_at"].isoformat() if isinstance(post["created_at"], datetime.datetime) else post["created_at"]
-                    }))
+                # Only posts newer than the previous poll are published again
+                watermark = self.reddit_watermarks.get(subreddit)
+                new_posts = [post for post in posts if watermark is None or post.created_at > watermark]
+                
+                # Publish each post as an MQTT message, oldest first; the watermark follows what was published
+                for post in sorted(new_posts, key=lambda post: post.created_at):
+                    if self.mqtt_client.publish("social/reddit", post.to_json()) is False:
+                        logger.warning(f"MQTT publishing stalled; the rest of r/{subreddit} is fetched again next poll")
+                        break
+                    self.reddit_watermarks[subreddit] = post.created_at
                     
                     # Collect comments for popular posts
-                    if post["num_comments"] > 10 and post["score"] > 50:
-                        comments = self.social_connector.get_reddit_comments(post["id"], limit=100)
-                        
-                        for comment in comments:
-                            self.mqtt_client.publish("social/reddit_comment", json.dumps({
-                                **comment,
-                                "created_at": comment["created_at"].isoformat() if isinstance(comment["created_at"], datetime.datetime) else comment["created_at"]
-                            }))
+                    if post.num_comments > 10 and post.score > 50:
+                        self.collect_reddit_comments(post.id)
+                
+                # Copies of earlier posts are published (and marked) but not analyzed again
+                unique_posts = [post for post in posts if post.duplicate_of is None]
                 
                 # Identify influential users
-                influencers = self.social_connector.identify_influencers(posts, "reddit")
+                influencers = self.social_connector.identify_influencers(unique_posts, "reddit")
                 if influencers:
-                    self.db_manager.save_data_to_mongodb("reddit_influencers", {
+                    self.save_snapshot("reddit_influencers", "influencers", f"reddit:{subreddit}", {
                         "subreddit": subreddit,
                         "timestamp": datetime.datetime.now().isoformat(),
                         "influencers": influencers
                     })
                 
                 # Perform trend analysis
-                trends = self.social_connector.analyze_trends(posts, "reddit")
+                trends = self.social_connector.analyze_trends(unique_posts, "reddit")
                 if trends:
-                    self.db_manager.save_data_to_mongodb("reddit_trends", {
+                    self.save_snapshot("reddit_trends", "trends", f"reddit:{subreddit}", {
                         "subreddit": subreddit,
                         "timestamp": datetime.datetime.now().isoformat(),
                         "trends": trends
                     })
                 
-                return True
+                return len(new_posts)
             else:
                 logger.warning(f"No posts found for subreddit: {subreddit}")
-                return False
+                return 0
         except Exception as e:
             logger.error(f"Error collecting Reddit data: {e}")
+            return None
+    
+    @timed("connector_call_seconds", call="reddit_comments")
+    def collect_reddit_comments(self, post_id):
+        """Stream a post's new comments to MQTT; returns the number published
+        
+        The post's watermark only moves after a complete walk. When the walk
+        stops early (comment budget, MoreComments budget or a dropped publish),
+        older unvisited comments may still follow, so the watermark stays and
+        the ids published so far are remembered and skipped next time instead.
+        """
+        since, newest, published_ids = self.comment_watermarks.get(post_id, (None, None, frozenset()))
+        published = 0
+        complete = None
+        
+        comments = self.social_connector.iter_reddit_comments(
+            post_id,
+            max_depth=self.comment_max_depth,
+            max_comments=self.comment_max_count,
+            max_more=self.comment_max_more,
+            since=since,
+            skip_ids=published_ids
+        )
+        
+        new_ids = set()
+        while True:
+            try:
+                comment = next(comments)
+            except StopIteration as stop:
+                complete = stop.value
+                break
+            if self.mqtt_client.publish("social/reddit_comment", comment.to_json()) is False:
+                comments.close()
+                break
+            published += 1
+            new_ids.add(comment.id)
+            
+            if isinstance(comment.created_at, datetime.datetime):
+                newest = max(newest or 0, comment.created_at.timestamp())
+        
+        if complete:
+            state = (newest, newest, frozenset())
+        else:
+            state = (since, newest, published_ids | new_ids)
+        if newest is not None:
+            self.comment_watermarks[post_id] = state
+            self.comment_watermarks.move_to_end(post_id)
+            # Keep watermarks for recently active posts only
+            while len(self.comment_watermarks) > 10000:
+                self.comment_watermarks.popitem(last=False)
+        
+        return published
+    
+    def save_snapshot(self, collection_name, view, key, document):
+        """Store an analysis result in MongoDB and show it on the dashboard"""
+        if self.dashboard:
+            self.dashboard.set(view, key, document)
+        return self.db_manager.save_data_to_mongodb(collection_name, document)
+    
+    def load_dashboard_snapshots(self):
+        """Show the latest stored analysis results, including those of other processes"""
+        sources = [
+            ("twitter_trends", "trends", "twitter", "query"),
+            ("reddit_trends", "trends", "reddit", "subreddit"),
+            ("twitter_influencers", "influencers", "twitter", "query"),
+            ("reddit_influencers", "influencers", "reddit", "subreddit"),
+            ("graph_influencers", "influencers", "graph", None),
+            ("sensor_social_correlations", "correlations", "sensor_social", None)
+        ]
+        loaded = 0
+        for collection_name, view, key, key_field in sources:
+            try:
+                documents = self.db_manager.find_mongodb(collection_name, sort=[("_id", -1)], limit=1)
+            except Exception as e:
+                logger.error(f"Error loading dashboard snapshot from {collection_name}: {e}")
+                continue
+            if documents:
+                document = documents[0]
+                self.dashboard.set(view, f"{key}:{document.get(key_field)}" if key_field else key, document)
+                loaded += 1
+        return loaded
+    
+    def related_hashtags(self, hashtag, top_n=10):
+        """Hashtags most often used together with hashtag, from the in-memory co-occurrence graph
+
+        The graph is fed by the tweets this process receives, so it is empty in
+        roles without social subscriptions.
+        """
+        return self.cooccurrence_graph.related_hashtags(hashtag, top_n)
+    
+    def hashtag_community(self, hashtag, min_weight=2):
+        """Hashtags and users around hashtag, from the in-memory co-occurrence graph"""
+        return self.cooccurrence_graph.community(hashtag, min_weight=min_weight)
+    
+    def add_hashtag_context(self, trends):
+        """Add related hashtags to a trend analysis' top hashtags, and the top hashtag's community"""
+        top_hashtags = trends.get("top_hashtags")
+        if not top_hashtags or not self.cooccurrence_graph.hashtag_counts:
+            return
+        for entry in top_hashtags:
+            entry["related"] = self.related_hashtags(entry["hashtag"], top_n=5)
+        trends["community"] = self.hashtag_community(top_hashtags[0]["hashtag"])
+    
+    def sync_cooccurrence_graph(self):
+        """Push accumulated hashtag co-occurrence weights to Neo4j"""
+        try:
+            return self.cooccurrence_graph.sync_to_neo4j(self.db_manager)
+        except Exception as e:
+            logger.error(f"Error syncing co-occurrence graph: {e}")
             return False
     
+    def publish_correlations(self):
+        """Close finished minutes and publish the strongest sensor/social correlations"""
+        try:
+            self.correlation_engine.advance()
+            correlations = self.correlation_engine.correlations()
+            if not correlations:
+                return True
+            
+            document = {
+                "timestamp": datetime.datetime.now().isoformat(),
+                "window_minutes": self.correlation_engine.window,
+                "max_lag_minutes": self.correlation_engine.max_lag,
+                "correlations": correlations
+            }
+            if self.mqtt_client is not None:
+                self.mqtt_client.publish(self.correlation_topic, document)
+            # After publishing: the insert adds a (non-JSON) _id to the document
+            self.save_snapshot("sensor_social_correlations", "correlations", "sensor_social", document)
+            return True
+        except Exception as e:
+            logger.error(f"Error computing sensor/social correlations: {e}")
+            return False
+    
+    def compute_graph_influence(self):
+        """Recompute graph-based influence and store the top users in MongoDB"""
+        try:
+            if self.graph_analytics is None:
+                from src.graph_analytics import GraphAnalytics
+                self.graph_analytics = GraphAnalytics(self.db_manager)
+            
+            results = self.graph_analytics.run()
+            if results:
+                self.save_snapshot("graph_influencers", "influencers", "graph", {
+                    "timestamp": datetime.datetime.now().isoformat(),
+                    "influencers": self.graph_analytics.top_influencers(results, top_n=20)
+                })
+            return True
+        except Exception as e:
+            logger.error(f"Error computing graph influence: {e}")
+            return False
+    
+    def apply_sensor_retention(self):
+        """Drop sensor data older than the retention period"""
+        try:
+            return self.sensor_store.apply_retention()
+        except Exception as e:
+            logger.error(f"Error applying sensor data retention: {e}")
+            return None
+    
     def generate_daily_report(self):
         """Generate daily report"""
         try:
-            now = datetime.datetime.now()
-            report_date = now.strftime("%Y-%m-%d")
+            # Rows are stamped in UTC, so the window is too
+            now = datetime.datetime.utcnow()
+            report_date = datetime.date.today().isoformat()
             logger.info(f"Generating daily report for {report_date}")
             
+            # The report covers the last 24 hours; the window reaches into today, so it is cached with a TTL
+            start = now - datetime.timedelta(days=1)
+            
             report = {
                 "date": report_date,
-                "generated_at": now.isoformat(),
-                "twitter_stats": {},
-                "reddit_stats": {},
-                "sensor_stats": {}
+                "generated_at": now.replace(tzinfo=datetime.timezone.utc).isoformat(),
+                "twitter_stats": self.db_manager.get_social_post_stats("twitter", start, now),
+                "reddit_stats": self.db_manager.get_social_post_stats("reddit", start, now),
+                "sensor_stats": {
+                    row["sensor_id"]: row
+                    for row in self.sensor_store.get_stats(start, now)
+                },
+                "cache_stats": self.db_manager.get_cache_stats()
             }
             
             # Determine report file name
@@ -281,7 +892,7 @@ class DataProcessor:
             
             # Save report to JSON file
             with open(report_filename, "w") as f:
-                json.dump(report, f, indent=2)
+                json.dump(report, f, indent=2, default=str)
             
             logger.info(f"Daily report saved to {report_filename}")
             return True
@@ -291,16 +902,47 @@ class DataProcessor:
     
     def stop(self):
         """Stop all services"""
+        # Stop scheduling new jobs; running jobs finish first
+        self.scheduler.stop()
+        
+        if self.metrics_server:
+            self.metrics_server.stop()
+        if self.dashboard_server:
+            self.dashboard_server.stop()
+        
         # Close MQTT connection
-        self.mqtt_client.disconnect()
+        if self.mqtt_client is not None:
+            self.mqtt_client.disconnect()
         
-        # Close database connections
-        self.db_manager.close_connections()
+        if self.traffic_recorder:
+            self.traffic_recorder.close()
+        
+        self.drain()
         
         logger.info("Data processor stopped")
+    
+    def drain(self):
+        """Store everything received so far and close the stores
+
+        Also used on its own when messages are fed in directly (replay, benchmarks).
+        """
+        # Hand queued batches to their handlers and finish their writes before the stores close
+        self.router.flush()
+        self.write_coordinator.close()
+        
+        # Flush pending co-occurrence edges before closing Neo4j
+        if "cooccurrence_sync" in self.jobs:
+            self.sync_cooccurrence_graph()
+        
+        # Close database connections (queued social posts are written first)
+        if self.sensor_store:
+            self.sensor_store.close()
+        self.db_manager.close_connections()
 
 # Test usage
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    
     # Load environment variables from .env file (requires dotenv library)
     from dotenv import load_dotenv
     load_dotenv()
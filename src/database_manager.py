@@ -1,16 +1,23 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, LargeBinary, ForeignKey, Index, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from pymongo import MongoClient
-from neo4j import GraphDatabase
 import datetime
 import logging
 import os
 
-# Logging configuration
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from src.query_cache import QueryCache
+from src.search_index import PostSearchIndex
+from src.post_writer import SocialPostWriter
+from src.connection_health import Backend, BackendUnavailable, CircuitBreaker
+from src.utils.metrics import REGISTRY, timed
+
 logger = logging.getLogger(__name__)
 
+WRITES_SKIPPED = {
+    store: REGISTRY.counter("db_writes_skipped_total", store=store)
+    for store in ("sql", "mongo", "neo4j")
+}
+
 Base = declarative_base()
 
 # Model definitions for SQL tables
@@ -27,134 +34,349 @@ class SensorData(Base):
     def __repr__(self):
         return f"<SensorData(sensor_id='{self.sensor_id}', value={self.value}, unit='{self.unit}')>"
 
+class SensorDataHourly(Base):
+    __tablename__ = 'sensor_data_hourly'
+    
+    id = Column(Integer, primary_key=True)
+    sensor_id = Column(String)
+    unit = Column(String)
+    hour = Column(DateTime, index=True)
+    count = Column(Integer)
+    avg_value = Column(Float)
+    min_value = Column(Float)
+    max_value = Column(Float)
+    
+    def __repr__(self):
+        return f"<SensorDataHourly(sensor_id='{self.sensor_id}', hour={self.hour}, count={self.count})>"
+
+class SocialPlatform(Base):
+    __tablename__ = 'social_platforms'
+    
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+
+class Subreddit(Base):
+    __tablename__ = 'subreddits'
+    
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+
 class SocialMediaPost(Base):
     __tablename__ = 'social_media_posts'
+    __table_args__ = (
+        Index('ix_social_media_posts_platform_time', 'platform_id', 'timestamp'),
+    )
     
     id = Column(Integer, primary_key=True)
+    # Only set on rows written before the social_platforms lookup table; see SocialPostWriter.setup()
     platform = Column(String)
+    platform_id = Column(Integer, ForeignKey('social_platforms.id'))
+    subreddit_id = Column(Integer, ForeignKey('subreddits.id'))
     post_id = Column(String)
     user_id = Column(String)
+    # Long content is stored compressed in content_compressed instead (see src/post_writer.py)
     content = Column(String)
+    content_compressed = Column(LargeBinary)
     sentiment = Column(Float)
     timestamp = Column(DateTime)
     
     def __repr__(self):
-        return f"<SocialMediaPost(platform='{self.platform}', user_id='{self.user_id}')>"
+        return f"<SocialMediaPost(platform_id={self.platform_id}, user_id='{self.user_id}')>"
 
 class DatabaseManager:
     def __init__(self, sql_conn_string="sqlite:///iot_social_data.db", 
                  mongo_conn_string="mongodb://localhost:27017/", 
                  neo4j_uri="bolt://localhost:7687", 
                  neo4j_user="neo4j", 
-                 neo4j_password="password"):
+                 neo4j_password="password",
+                 cache_ttl=60,
+                 cache_max_entries=1024,
+                 cache_max_bytes=64 * 1024 * 1024,
+                 mongo_client=None,
+                 neo4j_driver=None,
+                 stores=("sql", "mongo", "neo4j"),
+                 post_batch_size=500,
+                 post_flush_interval=1.0,
+                 post_compress_min_bytes=1024,
+                 post_max_queued=10000,
+                 connect_timeout=5.0,
+                 failure_threshold=3,
+                 retry_min_delay=1.0,
+                 retry_max_delay=60.0):
         
-        # Create database connections
-        if sql_conn_string.startswith("sqlite"):
-            db_path = sql_conn_string.replace("sqlite:///", "")
-            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        # Cache for read queries, invalidated by the write paths below
+        self.query_cache = QueryCache(
+            max_entries=cache_max_entries,
+            max_bytes=cache_max_bytes,
+            default_ttl=cache_ttl
+        )
         
-        # SQLite connection
-        try:
-            self.sql_engine = create_engine(sql_conn_string)
-            Base.metadata.create_all(self.sql_engine)
-            Session = sessionmaker(bind=self.sql_engine)
-            self.sql_session = Session()
-            logger.info("SQL database connection established")
-        except Exception as e:
-            logger.error(f"Failed to connect to SQL database: {e}")
-            self.sql_session = None
+        self.sql_conn_string = sql_conn_string
+        self.mongo_conn_string = mongo_conn_string
+        self.neo4j_uri = neo4j_uri
+        self.neo4j_auth = (neo4j_user, neo4j_password)
+        self.connect_timeout = connect_timeout
+        self.post_batch_size = post_batch_size
+        self.post_flush_interval = post_flush_interval
+        self.post_compress_min_bytes = post_compress_min_bytes
+        self.post_max_queued = post_max_queued
         
-        # MongoDB connection
-        try:
-            self.mongo_client = MongoClient(mongo_conn_string)
-            self.mongo_db = self.mongo_client["iot_social_data"]
-            logger.info("MongoDB connection established")
-        except Exception as e:
-            logger.error(f"Failed to connect to MongoDB: {e}")
-            self.mongo_db = None
+        # Only the stores in `stores` are used. Each connects on first use and
+        # is skipped while its circuit breaker is open
+        self.stores = tuple(stores)
+        self.mongo_client = mongo_client
+        self._neo4j_driver = neo4j_driver
+        self._sql_session = None
+        self._search_index = None
+        self._post_writer = None
+        connectors = {
+            "sql": (self._connect_sql, self._probe_sql, lambda engine: engine.dispose()),
+            "mongo": (self._connect_mongo, lambda db: db.client.admin.command("ping"), lambda db: db.client.close()),
+            "neo4j": (self._connect_neo4j, self._probe_neo4j, lambda driver: driver.close())
+        }
+        self.backends = {
+            store: Backend(
+                store, connect, probe, close,
+                CircuitBreaker(store, failure_threshold, retry_min_delay, retry_max_delay)
+            )
+            for store, (connect, probe, close) in connectors.items()
+            if store in self.stores
+        }
+    
+    def _connect_sql(self):
+        if self.sql_conn_string.startswith("sqlite:///"):
+            db_path = self.sql_conn_string.replace("sqlite:///", "")
+            if os.path.dirname(db_path):
+                os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        
+        connect_args = {}
+        if self.sql_conn_string.startswith("postgresql"):
+            connect_args["connect_timeout"] = int(self.connect_timeout)
+        engine = create_engine(self.sql_conn_string, connect_args=connect_args)
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+        self._sql_session = Session()
+        
+        # Social posts are written in batches, with lookup tables and compressed long content
+        post_writer = SocialPostWriter(
+            engine,
+            query_cache=self.query_cache,
+            batch_size=self.post_batch_size,
+            flush_interval=self.post_flush_interval,
+            compress_min_bytes=self.post_compress_min_bytes,
+            max_queued=self.post_max_queued
+        )
+        post_writer.setup()
         
-        # Neo4j connection
+        # Full-text index over post content, kept in sync by the database
+        self._search_index = PostSearchIndex(engine)
+        self._search_index.setup()
+        post_writer.backend = self.backends["sql"]
+        self._post_writer = post_writer
+        return engine
+    
+    @staticmethod
+    def _probe_sql(engine):
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    
+    def _connect_mongo(self):
+        # An existing client (e.g. mongomock) can be passed in
+        if self.mongo_client is None:
+            # Imported here so processes that do not use MongoDB (or inject a client) do not load pymongo
+            from pymongo import MongoClient
+            timeout_ms = int(self.connect_timeout * 1000)
+            self.mongo_client = MongoClient(
+                self.mongo_conn_string, serverSelectionTimeoutMS=timeout_ms, connectTimeoutMS=timeout_ms
+            )
+        self.mongo_client.admin.command("ping")
+        return self.mongo_client["iot_social_data"]
+    
+    def _connect_neo4j(self):
+        driver = self._neo4j_driver
+        if driver is None:
+            from neo4j import GraphDatabase
+            driver = GraphDatabase.driver(self.neo4j_uri, auth=self.neo4j_auth, connection_timeout=self.connect_timeout)
+        self._probe_neo4j(driver)
+        return driver
+    
+    @staticmethod
+    def _probe_neo4j(driver):
+        with driver.session() as session:
+            session.run("RETURN 1").consume()
+    
+    # Connected clients, or None while a store is not configured or unavailable
+    
+    def _client(self, store):
+        backend = self.backends.get(store)
+        return backend.get() if backend is not None else None
+    
+    @property
+    def sql_engine(self):
+        return self._client("sql")
+    
+    @property
+    def sql_session(self):
+        return self._sql_session if self._client("sql") is not None else None
+    
+    @property
+    def post_writer(self):
+        return self._post_writer if self._client("sql") is not None else None
+    
+    @property
+    def search_index(self):
+        return self._search_index if self._client("sql") is not None else None
+    
+    @property
+    def mongo_db(self):
+        return self._client("mongo")
+    
+    @property
+    def neo4j_driver(self):
+        return self._client("neo4j")
+    
+    def _require(self, store):
+        backend = self.backends.get(store)
+        if backend is None:
+            raise BackendUnavailable(f"{store} is not configured for this process")
+        return backend.require()
+    
+    def _read(self, store, query):
+        """query(client) for a read, counted against the store's circuit breaker like writes are"""
+        client = self._require(store)
         try:
-            self.neo4j_driver = GraphDatabase.driver(neo4j_uri, auth=(neo4j_user, neo4j_password))
-            logger.info("Neo4j connection established")
+            result = query(client)
         except Exception as e:
-            logger.error(f"Failed to connect to Neo4j: {e}")
-            self.neo4j_driver = None
+            self._failed(store, e)
+            raise
+        self._succeeded(store)
+        return result
+    
+    def _skipped(self, store):
+        WRITES_SKIPPED[store].inc()
+        logger.debug("Skipped write to unavailable %s", store, extra={"msg_class": "db.skipped"})
+        return False
+    
+    def _failed(self, store, error):
+        backend = self.backends.get(store)
+        if backend is not None:
+            backend.failed(error)
+    
+    def _succeeded(self, store):
+        self.backends[store].succeeded()
+    
+    def check_health(self):
+        """Probe every store (connecting those not connected yet); returns {store: up}"""
+        return {store: backend.check() for store, backend in self.backends.items()}
+    
+    def get_backend_status(self):
+        return {
+            store: {"up": backend.available, "circuit": backend.breaker.state}
+            for store, backend in self.backends.items()
+        }
+    
+    def flush_posts(self):
+        """Write queued social posts (once SQL is available)"""
+        post_writer = self.post_writer
+        return post_writer.flush() if post_writer is not None else 0
     
     def close_connections(self):
         """Close all database connections"""
-        if self.sql_session:
-            self.sql_session.close()
+        if self._post_writer is not None:
+            self._post_writer.close()
         
-        if self.mongo_client:
-            self.mongo_client.close()
+        if self._sql_session:
+            self._sql_session.close()
         
-        if self.neo4j_driver:
-            self.neo4j_driver.close()
+        for backend in self.backends.values():
+            try:
+                backend.close()
+            except Exception as e:
+                logger.warning(f"Error closing {backend.name} connection: {e}")
         
         logger.info("All database connections closed")
     
-    def save_sensor_data(self, topic, data):
-        """Save sensor data to all databases"""
+    @timed("db_write_seconds", store="sql", op="sensor_data")
+    def save_sensor_data_to_sql(self, topic, data):
+        """Save sensor data to the SQL database"""
+        session = self.sql_session
+        if session is None:
+            return self._skipped("sql")
         try:
+            timestamp = datetime.datetime.utcnow()
             sensor_data = SensorData(
                 topic=topic,
                 sensor_id=data.get('sensor_id'),
                 value=data.get('value'),
-                unit=data.get('unit')
-            )
-            self.sql_session.add(sensor_data)
-            self.sql_session.commit()
-            logger.info(f"Sensor data saved to SQL database: {sensor_data}")
-            return True
-        except Exception as e:
-            self.sql_session.rollback()
-            logger.error(f"Error saving sensor data to SQL: {e}")
-            return False
-    
-    def save_social_data(self, topic, data):
-        """Save social media data to all databases"""
-        try:
-            # Convert date to suitable format
-            timestamp = data.get('created_at')
-            if isinstance(timestamp, str):
-                try:
-                    timestamp = datetime.datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                except ValueError:
-                    timestamp = datetime.datetime.now()
-            
-            social_post = SocialMediaPost(
-                platform=topic,
-                post_id=data.get('id'),
-                user_id=data.get('user_id'),
-                content=data.get('content'),
-                sentiment=data.get('sentiment'),
+                unit=data.get('unit'),
                 timestamp=timestamp
             )
-            self.sql_session.add(social_post)
-            self.sql_session.commit()
-            logger.info(f"Social media post saved to SQL database: {social_post}")
+            session.add(sensor_data)
+            session.commit()
+            self._succeeded("sql")
+            # Not sensor_data.timestamp: reading an attribute expired by the commit would open a new transaction
+            self.query_cache.invalidate("sql:sensor_data", timestamp)
+            logger.debug("Sensor data saved to SQL database: %s = %s", data.get("sensor_id"), data.get("value"),
+                         extra={"msg_class": "db.write"})
             return True
         except Exception as e:
-            self.sql_session.rollback()
-            logger.error(f"Error saving social post to SQL: {e}")
+            session.rollback()
+            self._failed("sql", e)
+            logger.error("Error saving sensor data to SQL: %s", e, extra={"msg_class": "db.error"})
             return False
     
+    def save_social_post_to_sql(self, topic, data, on_written=None):
+        """Queue a social media post for the next batched SQL write
+
+        on_written(ok) is called once it has been written or dropped (see SocialPostWriter.add).
+        """
+        post_writer = self.post_writer
+        if post_writer is None:
+            return self._skipped("sql")
+        return post_writer.add(topic, data, on_written)
+    
+    @timed("db_write_seconds", store="mongodb", op="insert")
     def save_data_to_mongodb(self, collection_name, data):
         """Save data to MongoDB"""
+        mongo_db = self.mongo_db
+        if mongo_db is None:
+            return self._skipped("mongo")
         try:
-            collection = self.mongo_db[collection_name]
+            collection = mongo_db[collection_name]
             if isinstance(data, list):
                 result = collection.insert_many(data)
-                logger.info(f"Multiple documents saved to MongoDB collection {collection_name}")
+                logger.debug("Multiple documents saved to MongoDB collection %s", collection_name, extra={"msg_class": "db.write"})
             else:
                 result = collection.insert_one(data)
-                logger.info(f"Document saved to MongoDB collection {collection_name}")
+                logger.debug("Document saved to MongoDB collection %s", collection_name, extra={"msg_class": "db.write"})
+            
+            # Documents of a batch may span days, so only single documents narrow the invalidation
+            timestamp = None if isinstance(data, list) else data.get("timestamp", data.get("created_at"))
+            self.query_cache.invalidate(f"mongo:{collection_name}", timestamp)
+            self._succeeded("mongo")
             return True
         except Exception as e:
-            logger.error(f"Error saving data to MongoDB: {e}")
+            self._failed("mongo", e)
+            logger.error("Error saving data to MongoDB: %s", e, extra={"msg_class": "db.error"})
             return False
-    
+
+    @timed("db_write_seconds", store="mongodb", op="update")
+    def increment_mongodb_field(self, collection_name, query, field, amount=1):
+        """Increment a counter field of the first matching MongoDB document"""
+        mongo_db = self.mongo_db
+        if mongo_db is None:
+            return self._skipped("mongo")
+        try:
+            result = mongo_db[collection_name].update_one(query, {"$inc": {field: amount}})
+            self.query_cache.invalidate(f"mongo:{collection_name}")
+            self._succeeded("mongo")
+            return result.matched_count > 0
+        except Exception as e:
+            self._failed("mongo", e)
+            logger.error("Error updating MongoDB document: %s", e, extra={"msg_class": "db.error"})
+            return False
+
+    @timed("db_write_seconds", store="neo4j", op="relationship")
     def save_social_relationship_to_neo4j(self, user1, user2, relationship_type, properties=None):
         """Sosyal ilişkileri Neo4j'ye kaydet"""
         if properties is None:
@@ -167,22 +389,227 @@ class DatabaseManager:
             f"RETURN a, r, b"
         )
         
+        driver = self.neo4j_driver
+        if driver is None:
+            return self._skipped("neo4j")
         try:
-            with self.neo4j_driver.session() as session:
-                result = session.run(
-                    query,
-                    user1_id=user1,
-                    user2_id=user2,
-                    properties=properties
+            with driver.session() as session:
+                # A managed transaction: transient errors such as deadlocks between
+                # concurrent merges of the same users are retried by the driver
+                session.execute_write(
+                    lambda tx: tx.run(query, user1_id=user1, user2_id=user2, properties=properties).consume()
                 )
-                logger.info(f"Social relationship saved to Neo4j: {user1}-[{relationship_type}]->{user2}")
+                logger.debug("Social relationship saved to Neo4j: %s-[%s]->%s", user1, relationship_type, user2,
+                             extra={"msg_class": "db.write"})
+                self.query_cache.invalidate("neo4j")
+                self._succeeded("neo4j")
                 return True
         except Exception as e:
-            logger.error(f"Error saving relationship to Neo4j: {e}")
+            self._failed("neo4j", e)
+            logger.error("Error saving relationship to Neo4j: %s", e, extra={"msg_class": "db.error"})
             return False
 
+    @timed("db_write_seconds", store="neo4j", op="weighted_edges")
+    def save_weighted_edges_to_neo4j(self, source_label, target_label, relationship_type, edges, batch_size=1000):
+        """Add weighted edges to Neo4j in bulk using UNWIND batches
+
+        Each edge is a dict with source, target and weight; the weight is added
+        to the existing relationship weight. Each batch is committed on its own;
+        returns the number of edges written, which is less than len(edges) when
+        a batch failed (edges[written:] were not added).
+        """
+        query = (
+            f"UNWIND $edges AS edge "
+            f"MERGE (a:{source_label} {{id: edge.source}}) "
+            f"MERGE (b:{target_label} {{id: edge.target}}) "
+            f"MERGE (a)-[r:{relationship_type}]->(b) "
+            f"ON CREATE SET r.weight = edge.weight "
+            f"ON MATCH SET r.weight = r.weight + edge.weight "
+            f"SET r.updated_at = $updated_at"
+        )
+
+        driver = self.neo4j_driver
+        if driver is None:
+            self._skipped("neo4j")
+            return 0
+        written = 0
+        try:
+            updated_at = datetime.datetime.now().isoformat()
+            with driver.session() as session:
+                for start in range(0, len(edges), batch_size):
+                    batch = edges[start:start + batch_size]
+                    session.run(query, edges=batch, updated_at=updated_at).consume()
+                    written += len(batch)
+            self._succeeded("neo4j")
+            logger.info(f"Saved {len(edges)} weighted {relationship_type} edges to Neo4j")
+        except Exception as e:
+            self._failed("neo4j", e)
+            logger.error(f"Error saving weighted edges to Neo4j after {written} of {len(edges)}: {e}")
+        if written:
+            self.query_cache.invalidate("neo4j")
+        return written
+
+    def export_relationships_from_neo4j(self, relationship_types):
+        """Stream (source, target, weight) tuples for User relationships of the given types"""
+        query = (
+            "MATCH (a:User)-[r]->(b:User) "
+            "WHERE type(r) IN $types "
+            "RETURN a.id AS source, b.id AS target, count(r) AS weight"
+        )
+
+        driver = self._require("neo4j")
+        try:
+            with driver.session() as session:
+                result = session.run(query, types=list(relationship_types))
+                for record in result:
+                    yield record["source"], record["target"], record["weight"]
+        except Exception as e:
+            self._failed("neo4j", e)
+            raise
+        self._succeeded("neo4j")
+
+    @timed("db_write_seconds", store="neo4j", op="node_properties")
+    def update_neo4j_node_properties(self, label, rows, batch_size=5000):
+        """Set properties on existing nodes in batches; each row needs an 'id' key"""
+        query = (
+            f"UNWIND $rows AS row "
+            f"MATCH (n:{label} {{id: row.id}}) "
+            f"SET n += row"
+        )
+
+        driver = self.neo4j_driver
+        if driver is None:
+            return self._skipped("neo4j")
+        try:
+            with driver.session() as session:
+                for start in range(0, len(rows), batch_size):
+                    session.run(query, rows=rows[start:start + batch_size]).consume()
+            self.query_cache.invalidate("neo4j")
+            self._succeeded("neo4j")
+            logger.info(f"Updated properties of {len(rows)} {label} nodes in Neo4j")
+            return True
+        except Exception as e:
+            self._failed("neo4j", e)
+            logger.error(f"Error updating node properties in Neo4j: {e}")
+            return False
+
+    def query_sql(self, tables, sql, params=None, window=None, ttl=None):
+        """Run a cached read-only SQL query and return rows as dicts
+
+        tables lists the tables the query reads, used for invalidation.
+        window is an optional (start, end) pair the query is restricted to.
+        """
+        if params is None:
+            params = {}
+        
+        def load(engine):
+            with engine.connect() as connection:
+                return [dict(row._mapping) for row in connection.execute(text(sql), params)]
+        
+        key = QueryCache.make_key("sql", sql, params)
+        sources = [f"sql:{table}" for table in tables]
+        return self.query_cache.get_or_load(key, lambda: self._read("sql", load), sources, window=window, ttl=ttl)
+    
+    def find_mongodb(self, collection_name, query=None, sort=None, limit=0, window=None, ttl=None):
+        """Run a cached MongoDB find and return the documents as a list"""
+        if query is None:
+            query = {}
+        
+        def load(mongo_db):
+            cursor = mongo_db[collection_name].find(query)
+            if sort:
+                cursor = cursor.sort(sort)
+            if limit:
+                cursor = cursor.limit(limit)
+            return list(cursor)
+        
+        key = QueryCache.make_key("mongo", collection_name, {"query": query, "sort": sort, "limit": limit})
+        return self.query_cache.get_or_load(
+            key, lambda: self._read("mongo", load), [f"mongo:{collection_name}"], window=window, ttl=ttl
+        )
+    
+    def query_neo4j(self, cypher, params=None, window=None, ttl=None):
+        """Run a cached read-only Cypher query and return records as dicts"""
+        if params is None:
+            params = {}
+        
+        def load(driver):
+            with driver.session() as session:
+                return [record.data() for record in session.run(cypher, **params)]
+        
+        key = QueryCache.make_key("neo4j", cypher, params)
+        return self.query_cache.get_or_load(key, lambda: self._read("neo4j", load), ["neo4j"], window=window, ttl=ttl)
+    
+    def get_sensor_stats(self, start, end):
+        """Per-sensor count, average, minimum and maximum for a time window"""
+        return self.query_sql(
+            ["sensor_data"],
+            """
+            SELECT sensor_id, unit, COUNT(*) AS count, AVG(value) AS avg_value,
+                   MIN(value) AS min_value, MAX(value) AS max_value
+            FROM sensor_data
+            WHERE timestamp >= :start AND timestamp < :end
+            GROUP BY sensor_id, unit
+            """,
+            {"start": start, "end": end},
+            window=(start, end)
+        )
+    
+    def get_social_post_stats(self, platform, start, end):
+        """Post count, distinct users and average sentiment for a platform and time window"""
+        rows = self.query_sql(
+            ["social_media_posts"],
+            """
+            SELECT COUNT(*) AS posts, COUNT(DISTINCT p.user_id) AS users, AVG(p.sentiment) AS avg_sentiment
+            FROM social_media_posts p JOIN social_platforms pl ON pl.id = p.platform_id
+            WHERE pl.name = :platform AND p.timestamp >= :start AND p.timestamp < :end
+            """,
+            {"platform": platform, "start": start, "end": end},
+            window=(start, end)
+        )
+        return rows[0] if rows else {}
+    
+    def get_latest_trends(self, platform):
+        """Return the most recent trend snapshot for a platform"""
+        documents = self.find_mongodb(f"{platform}_trends", sort=[("_id", -1)], limit=1)
+        return documents[0] if documents else None
+    
+    def get_latest_influencers(self, platform):
+        """Return the most recent influencer snapshot for a platform"""
+        documents = self.find_mongodb(f"{platform}_influencers", sort=[("_id", -1)], limit=1)
+        return documents[0] if documents else None
+    
+    def search_posts(self, query, platform=None, time_range=None, limit=20, after=None):
+        """Full-text search over social post content, best match first
+        
+        time_range is an optional (start, end) pair. Pass the returned
+        next_cursor as `after` to get the next page.
+        """
+        search_index = self.search_index
+        if search_index is None or not search_index.available:
+            logger.error("Full-text search is not available")
+            return {"results": [], "next_cursor": None}
+        
+        results, next_cursor = search_index.search(query, platform, time_range, limit, after)
+        return {"results": results, "next_cursor": next_cursor}
+    
+    def search_mongodb(self, collection_name, query, limit=20):
+        """Text search over a MongoDB collection (needs its text index), best match first"""
+        return self._read("mongo", lambda mongo_db: list(
+            mongo_db[collection_name]
+            .find({"$text": {"$search": query}}, {"score": {"$meta": "textScore"}})
+            .sort([("score", {"$meta": "textScore"})])
+            .limit(limit)
+        ))
+    
+    def get_cache_stats(self):
+        """Return query cache hit/miss statistics"""
+        return self.query_cache.get_stats()
+
 # Test amaçlı kullanım
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    
     # Test database connection
     db_manager = DatabaseManager(sql_conn_string="sqlite:///data/test_db.db")
     
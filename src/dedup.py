@@ -0,0 +1,171 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+
+from src.utils.metrics import REGISTRY
+
+DEDUP_CHECKS = {
+    "unique": REGISTRY.counter("dedup_checks_total", result="unique"),
+    "duplicate": REGISTRY.counter("dedup_checks_total", result="duplicate"),
+    "skipped": REGISTRY.counter("dedup_checks_total", result="skipped")
+}
+
+# Links differ between copies of the same spam message, so they are not compared
+_URL = re.compile(r"https?://\S+|www\.\S+")
+_SPACE = re.compile(r"\s+")
+
+def normalize_text(text):
+    return _SPACE.sub(" ", _URL.sub(" ", text.lower())).strip()
+
+class Cluster:
+    """A group of near-identical texts, represented by the first one seen"""
+
+    __slots__ = ("key", "signature", "band_keys", "first_seen", "last_seen", "count", "sentiment")
+
+    def __init__(self, key, signature, band_keys, now):
+        self.key = key
+        self.signature = signature
+        self.band_keys = band_keys
+        self.first_seen = now
+        self.last_seen = now
+        self.count = 1
+        # Sentiment of the representative, reused for the rest of the cluster
+        self.sentiment = None
+
+    def __repr__(self):
+        return f"<Cluster({self.key}, count={self.count})>"
+
+class NearDuplicateDetector:
+    """Streaming near-duplicate detection with MinHash and LSH banding
+
+    Each text becomes a MinHash signature over its character shingles. The
+    signature is cut into bands; texts sharing any band are candidates, and a
+    candidate is a duplicate when the estimated Jaccard similarity reaches
+    threshold. Only one signature per cluster is kept, clusters expire window
+    seconds after they were last seen, and at most max_clusters are held.
+    """
+
+    def __init__(self, num_perm=64, bands=16, shingle_size=5, threshold=0.8,
+                 window=3600, max_clusters=20000, min_length=20, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        if not 1 <= shingle_size <= 8:
+            raise ValueError("shingle_size must be between 1 and 8 bytes")
+
+        # NumPy is only imported by processes that deduplicate
+        import numpy as np
+
+        self.np = np
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        self.window = window
+        self.max_clusters = max_clusters
+        self.min_length = min_length
+
+        # Multiply-shift hash functions ((a * x + b) mod 2**64) >> 32 with odd a
+        random = np.random.RandomState(seed)
+        self._a = random.randint(0, 1 << 64, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = random.randint(0, 1 << 64, size=num_perm, dtype=np.uint64)
+        self._shifts = [np.uint64(8 * i) for i in range(shingle_size)]
+
+        # key -> Cluster, least recently seen first
+        self._clusters = OrderedDict()
+        # One dict per band: band bytes -> Cluster
+        self._buckets = [{} for _ in range(bands)]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._clusters)
+
+    def signature(self, text):
+        """MinHash signature of a normalized text, or None if it is too short"""
+        np = self.np
+        data = np.frombuffer(text.encode("utf-8"), dtype=np.uint8)
+        if len(data) < self.shingle_size:
+            return None
+
+        # Every shingle_size-byte window packed into one integer (at most 8 bytes)
+        data = data.astype(np.uint64)
+        count = len(data) - self.shingle_size + 1
+        shingles = data[:count].copy()
+        for offset in range(1, self.shingle_size):
+            shingles |= data[offset:offset + count] << self._shifts[offset]
+
+        # Repeated shingles do not change the minimum, so they are not removed
+        return ((shingles[:, None] * self._a + self._b) >> np.uint64(32)).min(axis=0)
+
+    def similarity(self, first, second):
+        """Estimated Jaccard similarity of two signatures"""
+        return float(self.np.count_nonzero(first == second)) / self.num_perm
+
+    def check(self, key, text, now=None):
+        """Return the cluster of text, adding a new cluster for unseen content
+
+        cluster.key == key means text is (the first of) its cluster; any other
+        key is the representative it duplicates. Returns None for texts too
+        short to compare.
+        """
+        text = normalize_text(text or "")
+        if len(text) < self.min_length:
+            DEDUP_CHECKS["skipped"].inc()
+            return None
+
+        signature = self.signature(text)
+        packed = signature.tobytes()
+        size = len(packed) // self.bands
+        band_keys = [packed[index * size:(index + 1) * size] for index in range(self.bands)]
+        now = time.monotonic() if now is None else now
+
+        with self._lock:
+            self._evict(now)
+
+            existing = self._clusters.get(key)
+            if existing is not None:
+                # The same item again (e.g. checked by the collector, then on ingestion)
+                DEDUP_CHECKS["unique"].inc()
+                return existing
+
+            best, best_similarity = None, self.threshold
+            for bucket, band_key in zip(self._buckets, band_keys):
+                candidate = bucket.get(band_key)
+                if candidate is None or candidate is best:
+                    continue
+                similarity = self.similarity(signature, candidate.signature)
+                if similarity >= best_similarity:
+                    best, best_similarity = candidate, similarity
+
+            if best is not None:
+                best.count += 1
+                best.last_seen = now
+                self._clusters.move_to_end(best.key)
+                DEDUP_CHECKS["duplicate"].inc()
+                return best
+
+            cluster = Cluster(key, signature, band_keys, now)
+            self._clusters[key] = cluster
+            for bucket, band_key in zip(self._buckets, band_keys):
+                bucket.setdefault(band_key, cluster)
+            DEDUP_CHECKS["unique"].inc()
+            return cluster
+
+    def _evict(self, now):
+        cutoff = now - self.window
+        while self._clusters:
+            cluster = next(iter(self._clusters.values()))
+            if cluster.last_seen >= cutoff and len(self._clusters) < self.max_clusters:
+                break
+            del self._clusters[cluster.key]
+            for bucket, band_key in zip(self._buckets, cluster.band_keys):
+                if bucket.get(band_key) is cluster:
+                    del bucket[band_key]
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "clusters": len(self._clusters),
+                "duplicates": sum(cluster.count - 1 for cluster in self._clusters.values())
+            }
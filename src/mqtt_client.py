@@ -2,25 +2,77 @@ import paho.mqtt.client as mqtt
 import json
 import time
 import logging
+import random
+import threading
+
+from src.utils.metrics import REGISTRY
 
-# Logging configuration
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+PUBLISHED = {
+    "ok": REGISTRY.counter("mqtt_publish_total", result="ok"),
+    "timeout": REGISTRY.counter("mqtt_publish_total", result="timeout"),
+    "error": REGISTRY.counter("mqtt_publish_total", result="error")
+}
+PUBLISH_ACK_SECONDS = REGISTRY.histogram("mqtt_publish_ack_seconds")
+PUBLISH_WAIT_SECONDS = REGISTRY.histogram("mqtt_publish_wait_seconds")
+DISCONNECTS = REGISTRY.counter("mqtt_disconnects_total")
+
 class MQTTClient:
-    def __init__(self, broker_address="localhost", broker_port=1883, client_id="python_client"):
+    """paho-mqtt client with a bounded window of unacknowledged publishes
+
+    publish() waits while max_inflight messages are unacknowledged (PUBACK for
+    QoS 1/2, written to the socket for QoS 0), so a slow or unreachable broker
+    slows publishers down instead of growing paho's queue without limit. After
+    publish_timeout seconds the message is dropped and publish() returns False.
+
+    The network loop keeps reconnecting after a lost connection, and also
+    when the broker is not up yet at connect(), waiting from
+    reconnect_min_delay up to reconnect_max_delay seconds between attempts.
+    The first delay is jittered so that restarted clients do not reconnect in
+    lockstep.
+    """
+
+    def __init__(self, broker_address="localhost", broker_port=1883, client_id="python_client",
+                 max_inflight=1000, publish_timeout=30.0, publish_qos=1, keepalive=60,
+                 reconnect_min_delay=1, reconnect_max_delay=120):
         self.broker_address = broker_address
         self.broker_port = broker_port
         self.client_id = client_id
+        self.keepalive = keepalive
         self.client = mqtt.Client(client_id=client_id)
         self.client.on_connect = self.on_connect
+        self.client.on_disconnect = self.on_disconnect
         self.client.on_message = self.on_message
+        self.client.on_publish = self.on_publish
+        self.client.reconnect_delay_set(
+            min_delay=max(1, round(reconnect_min_delay * random.uniform(1, 2))),
+            max_delay=reconnect_max_delay
+        )
         self.topics = []
+        self.connected = False
+        
+        # Flow control; paho's own queue is capped at the same size as a last resort
+        self.max_inflight = max_inflight
+        self.publish_timeout = publish_timeout
+        self.publish_qos = publish_qos
+        self.client.max_inflight_messages_set(min(max_inflight, 65535))
+        self.client.max_queued_messages_set(max_inflight)
+        self._inflight = 0
+        # mid -> perf_counter() at publish, for publish-to-ack latency
+        self._sent_at = {}
+        # Acks that arrived before publish() recorded the mid
+        self._early_acks = set()
+        self._condition = threading.Condition()
+        REGISTRY.gauge("mqtt_publish_inflight", callback=lambda: self._inflight)
+        REGISTRY.gauge("mqtt_publish_window", callback=lambda: self.max_inflight)
+        REGISTRY.gauge("mqtt_connected", callback=lambda: int(self.connected))
         
     def connect(self):
+        """Start connecting in the background; the network loop retries until the broker is reachable"""
         try:
             logger.info(f"Connecting to MQTT broker at {self.broker_address}:{self.broker_port}")
-            self.client.connect(self.broker_address, self.broker_port, 60)
+            self.client.connect_async(self.broker_address, self.broker_port, self.keepalive)
             self.client.loop_start()
             return True
         except Exception as e:
@@ -28,6 +80,9 @@ class MQTTClient:
             return False
     
     def disconnect(self):
+        # Give outstanding publishes a moment to be acknowledged
+        if not self.wait_for_publishes(timeout=5):
+            logger.warning(f"Disconnecting with {self._inflight} unacknowledged MQTT messages")
         self.client.loop_stop()
         self.client.disconnect()
         logger.info("Disconnected from MQTT broker")
@@ -37,15 +92,80 @@ class MQTTClient:
         self.client.subscribe(topic)
         logger.info(f"Subscribed to topic: {topic}")
     
-    def publish(self, topic, message):
+    def publish(self, topic, message, qos=None):
+        """Publish a message; returns False if it was dropped (window full or client error)"""
         if isinstance(message, dict):
             message = json.dumps(message)
-        self.client.publish(topic, message)
-        logger.info(f"Published message to topic {topic}")
+        
+        if not self._reserve():
+            PUBLISHED["timeout"].inc()
+            logger.warning("MQTT publish window full for %gs, dropped message to %s",
+                           self.publish_timeout, topic, extra={"msg_class": "mqtt.backpressure"})
+            return False
+        
+        qos = self.publish_qos if qos is None else qos
+        started = time.perf_counter()
+        info = self.client.publish(topic, message, qos=qos)
+        with self._condition:
+            # While disconnected paho keeps QoS 1/2 messages for the reconnect but drops QoS 0
+            queued = info.rc == mqtt.MQTT_ERR_SUCCESS or (info.rc == mqtt.MQTT_ERR_NO_CONN and qos > 0)
+            if not queued:
+                # No ack will free the slot
+                self._release()
+                PUBLISHED["error"].inc()
+                logger.warning("MQTT publish to %s failed: %s", topic, mqtt.error_string(info.rc), extra={"msg_class": "mqtt.error"})
+                return False
+            if info.mid in self._early_acks:
+                self._early_acks.discard(info.mid)
+                PUBLISH_ACK_SECONDS.observe(time.perf_counter() - started)
+            else:
+                self._sent_at[info.mid] = started
+        
+        PUBLISHED["ok"].inc()
+        logger.debug("Published message to topic %s", topic, extra={"msg_class": "mqtt.publish"})
+        return True
+    
+    def _reserve(self):
+        """Take a window slot, waiting up to publish_timeout for acks"""
+        # The network loop thread delivers the acks; waiting there would never end
+        if threading.current_thread() is getattr(self.client, "_thread", None):
+            with self._condition:
+                self._inflight += 1
+            return True
+        
+        started = time.perf_counter()
+        with self._condition:
+            if self._inflight >= self.max_inflight:
+                if not self._condition.wait_for(lambda: self._inflight < self.max_inflight, self.publish_timeout):
+                    return False
+                PUBLISH_WAIT_SECONDS.observe(time.perf_counter() - started)
+            self._inflight += 1
+            return True
+    
+    def _release(self):
+        # Called with self._condition held
+        self._inflight = max(self._inflight - 1, 0)
+        self._condition.notify()
+    
+    def on_publish(self, client, userdata, mid):
+        """Publish acknowledged (QoS 1/2) or written to the socket (QoS 0)"""
+        with self._condition:
+            started = self._sent_at.pop(mid, None)
+            if started is None:
+                self._early_acks.add(mid)
+            else:
+                PUBLISH_ACK_SECONDS.observe(time.perf_counter() - started)
+            self._release()
+    
+    def wait_for_publishes(self, timeout=None):
+        """Wait until every publish has been acknowledged; returns False on timeout"""
+        with self._condition:
+            return self._condition.wait_for(lambda: self._inflight == 0, timeout)
     
     def on_connect(self, client, userdata, flags, rc):
         """MQTT connection callback function"""
         if rc == 0:
+            self.connected = True
             logger.info("Connected to MQTT broker successfully")
             # Re-subscribe to all topics on reconnection
             for topic in self.topics:
@@ -53,11 +173,18 @@ class MQTTClient:
         else:
             logger.error(f"Failed to connect to MQTT broker with result code {rc}")
     
+    def on_disconnect(self, client, userdata, rc):
+        """MQTT disconnection callback function; rc is 0 only after disconnect()"""
+        self.connected = False
+        if rc != 0:
+            DISCONNECTS.inc()
+            logger.warning(f"Lost connection to MQTT broker ({mqtt.error_string(rc)}), reconnecting")
+    
     def on_message(self, client, userdata, msg):
         """MQTT message callback function"""
         try:
             payload = msg.payload.decode("utf-8")
-            logger.info(f"Received message on topic {msg.topic}: {payload}")
+            logger.debug("Received message on topic %s: %s", msg.topic, payload, extra={"msg_class": "mqtt.receive"})
             
             # Convert message to JSON
             try:
@@ -65,13 +192,15 @@ class MQTTClient:
                 # Add data processing logic here
                 # For example: self.process_data(msg.topic, payload_json)
             except json.JSONDecodeError:
-                logger.warning(f"Received message is not valid JSON: {payload}")
+                logger.warning("Received message is not valid JSON: %s", payload, extra={"msg_class": "mqtt.invalid"})
                 
         except Exception as e:
             logger.error(f"Error processing message: {e}")
 
 # Test usage
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    
     client = MQTTClient()
     if client.connect():
         client.subscribe("sensors/temperature")
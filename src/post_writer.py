@@ -0,0 +1,291 @@
+import datetime
+import logging
+import threading
+import time
+import zlib
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.exc import IntegrityError
+
+from src.connection_health import is_connection_error
+from src.utils.metrics import REGISTRY, timed
+
+# Optional: zstd compresses post bodies better and faster than zlib
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+POSTS_WRITTEN = REGISTRY.counter("sql_posts_written_total")
+POSTS_COMPRESSED = REGISTRY.counter("sql_posts_compressed_total")
+POSTS_DROPPED = REGISTRY.counter("sql_posts_dropped_total")
+
+# First byte of content_compressed names the codec
+_ZSTD = b"Z"
+_ZLIB = b"z"
+
+def compress_content(content):
+    data = content.encode("utf-8")
+    if zstandard is not None:
+        return _ZSTD + zstandard.ZstdCompressor(level=3).compress(data)
+    return _ZLIB + zlib.compress(data, 6)
+
+def decompress_content(blob):
+    """Plain text of a content_compressed value"""
+    if blob is None:
+        return None
+    blob = bytes(blob)
+    codec, data = blob[:1], blob[1:]
+    if codec == _ZSTD:
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed: pip install zstandard")
+        return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+    if codec == _ZLIB:
+        return zlib.decompress(data).decode("utf-8")
+    raise ValueError(f"Unknown content codec {codec!r}")
+
+def post_content(row):
+    """Content of a social_media_posts row, decompressing it if needed"""
+    mapping = row._mapping if hasattr(row, "_mapping") else row
+    if mapping.get("content") is not None:
+        return mapping["content"]
+    return decompress_content(mapping.get("content_compressed"))
+
+def _notify(pending, ok):
+    for _, _, on_written in pending:
+        if on_written is not None:
+            try:
+                on_written(ok)
+            except Exception as e:
+                logger.error(f"Error in post write callback: {e}")
+
+def _parse_timestamp(value):
+    if isinstance(value, str):
+        try:
+            return datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return datetime.datetime.utcnow()
+    return value
+
+class LookupTable:
+    """name -> id for a small table of repeated strings, cached in memory
+
+    New names are committed in their own short transaction, so ids handed out
+    stay valid even if the batch that first used them fails.
+    """
+
+    def __init__(self, engine, table):
+        self.engine = engine
+        self.table = table
+        self._ids = {}
+
+    def get_id(self, name):
+        if name is None:
+            return None
+        lookup_id = self._ids.get(name)
+        if lookup_id is None:
+            lookup_id = self._fetch(name)
+            if lookup_id is None:
+                try:
+                    with self.engine.begin() as connection:
+                        lookup_id = connection.execute(self.table.insert(), {"name": name}).inserted_primary_key[0]
+                except IntegrityError:
+                    # Another process added it first
+                    lookup_id = self._fetch(name)
+            self._ids[name] = lookup_id
+        return lookup_id
+
+    def _fetch(self, name):
+        with self.engine.connect() as connection:
+            return connection.execute(select(self.table.c.id).where(self.table.c.name == name)).scalar()
+
+class SocialPostWriter:
+    """Buffers social posts and writes them to SQL in batches
+
+    Posts are inserted with executemany, one transaction per batch of
+    batch_size posts or flush_interval seconds, whichever comes first.
+    Platform and subreddit names are stored once in lookup tables. On SQLite,
+    content of at least compress_min_bytes is stored compressed (zstd when
+    installed, zlib otherwise); PostgreSQL already compresses large values
+    itself (TOAST), and its full-text index needs the plain column.
+
+    A batch that fails because the database is unreachable is queued again,
+    in front of newer posts, and retried after flush_interval; at most
+    max_queued posts are kept, the oldest are dropped beyond that. A batch
+    that fails for any other reason is written again row by row, so only
+    the rows that cannot be written are dropped.
+    """
+
+    def __init__(self, engine, query_cache=None, batch_size=500,
+                 flush_interval=1.0, compress_min_bytes=1024, max_queued=10000):
+        from src.database_manager import SocialMediaPost, SocialPlatform, Subreddit
+
+        self.engine = engine
+        self.query_cache = query_cache
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queued = max(max_queued, batch_size)
+        self.compress_min_bytes = compress_min_bytes if engine.dialect.name != "postgresql" else 0
+        self.posts = SocialMediaPost.__table__
+        self.platforms = LookupTable(engine, SocialPlatform.__table__)
+        self.subreddits = LookupTable(engine, Subreddit.__table__)
+
+        # connection_health.Backend of the SQL store, set by DatabaseManager
+        self.backend = None
+
+        self._pending = []
+        self._oldest = None
+        # No flush from add() before this time after a connection failure
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+        # Flushes from the ingest thread and the flush job must not interleave
+        self._flush_lock = threading.Lock()
+
+    def setup(self):
+        """Add the lookup/compression columns to an existing table and move old rows to them"""
+        columns = {column["name"] for column in inspect(self.engine).get_columns(self.posts.name)}
+        blob_type = "BYTEA" if self.engine.dialect.name == "postgresql" else "BLOB"
+        with self.engine.begin() as connection:
+            for name, column_type in (("platform_id", "INTEGER"), ("subreddit_id", "INTEGER"), ("content_compressed", blob_type)):
+                if name not in columns:
+                    connection.execute(text(f"ALTER TABLE {self.posts.name} ADD COLUMN {name} {column_type}"))
+
+        # Rows written before the lookup tables keep their platform name in the old column
+        with self.engine.connect() as connection:
+            names = connection.execute(text(
+                f"SELECT DISTINCT platform FROM {self.posts.name} WHERE platform_id IS NULL AND platform IS NOT NULL"
+            )).scalars().all()
+        if names:
+            platform_ids = {name: self.platforms.get_id(name) for name in names}
+            with self.engine.begin() as connection:
+                for name, platform_id in platform_ids.items():
+                    connection.execute(
+                        text(f"UPDATE {self.posts.name} SET platform_id = :platform_id, platform = NULL WHERE platform = :name"),
+                        {"platform_id": platform_id, "name": name}
+                    )
+            logger.info(f"Moved posts of {len(names)} platforms to the social_platforms lookup table")
+
+        for index in self.posts.indexes:
+            index.create(self.engine, checkfirst=True)
+
+    def add(self, platform, data, on_written=None):
+        """Queue a post; written when the batch is full or flush_interval has passed
+
+        on_written(ok) is called once the post has been written (True) or
+        dropped (False).
+        """
+        with self._lock:
+            self._pending.append((platform, data, on_written))
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            now = time.monotonic()
+            due = (len(self._pending) >= self.batch_size or now - self._oldest >= self.flush_interval) and now >= self._retry_at
+        if due:
+            self.flush()
+        return True
+
+    @timed("db_write_seconds", store="sql", op="social_post_batch")
+    def flush(self):
+        """Write all queued posts; returns the number written"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending, self._oldest = self._pending, [], None
+            if not pending:
+                return 0
+
+            try:
+                days = self._write(pending)
+            except Exception as e:
+                if self.backend is not None:
+                    self.backend.failed(e)
+                if is_connection_error(e):
+                    logger.error("Error saving %d social posts to SQL, will retry: %s", len(pending), e, extra={"msg_class": "db.error"})
+                    self._requeue(pending)
+                    return 0
+                logger.error("Error saving %d social posts to SQL, retrying row by row: %s", len(pending), e, extra={"msg_class": "db.error"})
+                pending, days = self._write_rows(pending)
+
+        if self.backend is not None:
+            self.backend.succeeded()
+
+        _notify(pending, True)
+        POSTS_WRITTEN.inc(len(pending))
+        if self.query_cache:
+            for day in days:
+                self.query_cache.invalidate("sql:social_media_posts", day)
+        logger.debug("Saved %d social posts to SQL", len(pending), extra={"msg_class": "db.write"})
+        return len(pending)
+
+    def _requeue(self, pending):
+        """Put a batch that could not be written back in front of the queue"""
+        with self._lock:
+            queued = pending + self._pending
+            dropped = len(queued) - self.max_queued
+            if dropped > 0:
+                queued, dropped = queued[dropped:], queued[:dropped]
+            else:
+                dropped = []
+            self._pending = queued
+            now = time.monotonic()
+            self._oldest = now
+            self._retry_at = now + self.flush_interval
+        if dropped:
+            POSTS_DROPPED.inc(len(dropped))
+            logger.error("SQL post queue full, dropped %d oldest posts", len(dropped), extra={"msg_class": "db.error"})
+            _notify(dropped, False)
+
+    def _write_rows(self, pending):
+        """Write posts one by one; returns (posts written, days) and drops the ones that fail"""
+        written, days = [], set()
+        for index, item in enumerate(pending):
+            try:
+                days.update(self._write([item]))
+            except Exception as e:
+                if is_connection_error(e):
+                    # The database went away in the middle: keep the rest for the retry
+                    self._requeue(pending[index:])
+                    break
+                POSTS_DROPPED.inc()
+                _notify([item], False)
+                logger.error("Dropped social post %s: %s", item[1].get("id"), e, extra={"msg_class": "db.error"})
+                continue
+            written.append(item)
+        return written, days
+
+    def _write(self, pending):
+        rows, days, compressed = [], set(), 0
+        # Lookup ids are resolved before the batch transaction opens (SQLite allows one writer)
+        platform_ids = {platform: self.platforms.get_id(platform) for platform in {platform for platform, _, _ in pending}}
+        subreddit_ids = {name: self.subreddits.get_id(name) for name in {data.get("subreddit") for _, data, _ in pending}}
+        with self.engine.begin() as connection:
+            for platform, data, _ in pending:
+                content = data.get("content")
+                timestamp = _parse_timestamp(data.get("created_at"))
+                row = {
+                    "platform_id": platform_ids[platform],
+                    "subreddit_id": subreddit_ids[data.get("subreddit")],
+                    "post_id": data.get("id"),
+                    "user_id": data.get("user_id"),
+                    "content": content,
+                    "content_compressed": None,
+                    "sentiment": data.get("sentiment"),
+                    "timestamp": timestamp
+                }
+                if timestamp is not None:
+                    days.add(timestamp)
+                if self.compress_min_bytes and content and len(content) >= self.compress_min_bytes:
+                    row["content"] = None
+                    row["content_compressed"] = compress_content(content)
+                    compressed += 1
+                rows.append(row)
+
+            connection.execute(self.posts.insert(), rows)
+            POSTS_COMPRESSED.inc(compressed)
+
+        # One timestamp per day is enough to invalidate that day's cached windows
+        return list({timestamp.date(): timestamp for timestamp in days}.values())
+
+    def close(self):
+        self.flush()
@@ -0,0 +1,222 @@
+import datetime
+import logging
+import pickle
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Windows longer than this are tagged with the whole source instead of per-day buckets
+MAX_WINDOW_BUCKETS = 366
+
+class QueryCache:
+    """LRU + TTL cache for read queries across SQL, MongoDB and Neo4j
+
+    Entries are tagged with the source they read (e.g. 'sql:sensor_data') and,
+    for time-windowed reads, with the daily buckets the window covers. Write
+    paths call invalidate() for the source and the bucket they wrote to, so a
+    cached window is only dropped when data inside it changes. Windows that
+    ended before the current (UTC) day are kept without a TTL; windows and
+    written timestamps are naive UTC datetimes, like the stored rows.
+
+    Cached values are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, default_ttl=60):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+
+        # key -> (value, size, expires_at, tags)
+        self._entries = OrderedDict()
+        # source -> bucket (None for unwindowed reads) -> keys
+        self._tags = defaultdict(lambda: defaultdict(set))
+        self._bytes = 0
+        # Per-source counters bumped on invalidation, so loads that raced with a write are not cached
+        self._generations = defaultdict(int)
+        self._lock = threading.Lock()
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0
+        }
+
+    @staticmethod
+    def make_key(store, query, params=None):
+        """Build a cache key from a normalized query and its parameters"""
+        if isinstance(query, str):
+            query = _WHITESPACE.sub(" ", query).strip()
+        else:
+            query = repr(query)
+        return (store, query, _freeze(params))
+
+    @staticmethod
+    def bucket_for(timestamp):
+        """Return the daily bucket name for a timestamp, or None if unknown"""
+        if isinstance(timestamp, str):
+            try:
+                timestamp = datetime.datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+            except ValueError:
+                return None
+        if isinstance(timestamp, datetime.datetime):
+            return timestamp.date().isoformat()
+        if isinstance(timestamp, datetime.date):
+            return timestamp.isoformat()
+        return None
+
+    def _tags_for(self, sources, window):
+        if window is None:
+            return [(source, None) for source in sources]
+
+        start, end = window
+        days = (end.date() - start.date()).days + 1
+        if days > MAX_WINDOW_BUCKETS:
+            return [(source, None) for source in sources]
+
+        buckets = [(start.date() + datetime.timedelta(days=i)).isoformat() for i in range(days)]
+        return [(source, bucket) for source in sources for bucket in buckets]
+
+    def get_or_load(self, key, loader, sources, window=None, ttl=None):
+        """Return the cached value for key, calling loader() on a miss
+
+        sources names the tables/collections the query reads. window is an
+        optional (start, end) datetime pair; closed windows never expire.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[2] is None or entry[2] > now:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return entry[0]
+                self._remove(key)
+                self.stats["expirations"] += 1
+            self.stats["misses"] += 1
+            generations = [self._generations[source] for source in sources]
+
+        value = loader()
+
+        if window is not None and _is_closed(window[1]):
+            expires_at = None
+        else:
+            expires_at = now + (ttl if ttl is not None else self.default_ttl)
+
+        self.put(key, value, sources, window=window, expires_at=expires_at, generations=generations)
+        return value
+
+    def put(self, key, value, sources, window=None, expires_at=None, generations=None):
+        """Store a value and evict least recently used entries over budget
+
+        generations, as read from the sources before loading the value, makes
+        put() skip the value if one of them has been invalidated since.
+        """
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        tags = self._tags_for(sources, window)
+        with self._lock:
+            if generations is not None and generations != [self._generations[source] for source in sources]:
+                return
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (value, size, expires_at, tags)
+            self._bytes += size
+            for source, bucket in tags:
+                self._tags[source][bucket].add(key)
+
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.stats["evictions"] += 1
+
+    def invalidate(self, source, timestamp=None):
+        """Drop entries affected by a write to source
+
+        With a timestamp only unwindowed reads and windows covering that day are
+        dropped; without one every entry reading source is dropped.
+        """
+        with self._lock:
+            self._generations[source] += 1
+            buckets = self._tags.get(source)
+            if not buckets:
+                return 0
+
+            bucket = self.bucket_for(timestamp) if timestamp is not None else None
+            if bucket is None:
+                keys = set().union(*buckets.values())
+            else:
+                keys = buckets.get(None, set()) | buckets.get(bucket, set())
+
+            for key in keys:
+                self._remove(key)
+            self.stats["invalidations"] += len(keys)
+            return len(keys)
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            for source in self._generations:
+                self._generations[source] += 1
+            self._entries.clear()
+            self._tags.clear()
+            self._bytes = 0
+
+    def get_stats(self):
+        """Return hit/miss statistics and current usage"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry[1]
+        for source, bucket in entry[3]:
+            keys = self._tags[source][bucket]
+            keys.discard(key)
+            if not keys:
+                del self._tags[source][bucket]
+
+def _is_closed(end):
+    """True if a window ending at end can no longer receive writes stamped now
+
+    Writes invalidate daily buckets, so only windows that end before the
+    start of the current UTC day are treated as closed.
+    """
+    if end.tzinfo is not None:
+        end = end.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    today = datetime.datetime.combine(datetime.datetime.utcnow().date(), datetime.time())
+    return end <= today
+
+def _freeze(value):
+    """Turn query parameters into a hashable, order-independent value"""
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, set):
+        return tuple(sorted(_freeze(v) for v in value))
+    return value
+
+def _estimate_size(value):
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
@@ -0,0 +1,167 @@
+import datetime
+import json
+from dataclasses import dataclass
+from operator import attrgetter
+
+# Optional faster encoders; the standard json module is used without orjson
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Fields holding a datetime; decoded from ISO 8601 strings by from_dict()
+_DATETIME_FIELDS = ("timestamp", "created_at")
+
+def _encode_default(value):
+    """JSON/MessagePack fallback for values without a native encoding"""
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+# Reused encoder; json.dumps(default=...) would build a new one per call
+_JSON_ENCODER = json.JSONEncoder(default=_encode_default)
+
+def _parse_datetime(value):
+    if isinstance(value, str):
+        try:
+            return datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return value
+    return value
+
+class _Record:
+    """Encoding helpers shared by the record types
+
+    Subclasses are dataclasses with explicit __slots__ (one pointer per field,
+    no per-instance dict). Fields set to None are left out of the encoded
+    forms, so messages look the same as the dicts they replace.
+    """
+
+    __slots__ = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Reads every field in one call; faster than getattr() per field
+        cls._get_values = attrgetter(*cls.__slots__)
+        cls._datetime_fields = tuple(
+            (index, name) for index, name in enumerate(cls.__slots__) if name in _DATETIME_FIELDS
+        )
+
+    def to_dict(self):
+        return {
+            name: value
+            for name, value in zip(self.__slots__, self._get_values(self))
+            if value is not None
+        }
+
+    def to_json(self):
+        if orjson is not None:
+            # orjson encodes datetimes natively, in the same ISO 8601 form
+            return orjson.dumps(self.to_dict()).decode("utf-8")
+        return _JSON_ENCODER.encode(self.to_dict())
+
+    def to_msgpack(self):
+        if msgpack is None:
+            raise RuntimeError("msgpack is not installed: pip install msgpack")
+        return msgpack.packb(self.to_dict(), default=_encode_default)
+
+    @classmethod
+    def from_dict(cls, data):
+        values = list(map(data.get, cls.__slots__))
+        for index, _ in cls._datetime_fields:
+            values[index] = _parse_datetime(values[index])
+        return cls(*values)
+
+    @classmethod
+    def from_json(cls, payload):
+        return cls.from_dict(orjson.loads(payload) if orjson is not None else json.loads(payload))
+
+    @classmethod
+    def from_msgpack(cls, payload):
+        if msgpack is None:
+            raise RuntimeError("msgpack is not installed: pip install msgpack")
+        return cls.from_dict(msgpack.unpackb(payload))
+
+# Fields have no defaults: explicit __slots__ and dataclass defaults cannot be
+# combined before Python 3.10 (dataclass(slots=True)), and the image runs 3.9.
+
+@dataclass
+class SensorReading(_Record):
+    """A single sensor measurement"""
+
+    __slots__ = ("sensor_id", "value", "unit", "timestamp", "topic")
+
+    sensor_id: str
+    value: float
+    unit: str
+    timestamp: datetime.datetime
+    topic: str
+
+    def to_row(self):
+        """Column values of the sensor_data table"""
+        return {
+            "topic": self.topic,
+            "sensor_id": self.sensor_id,
+            "value": self.value,
+            "unit": self.unit,
+            "timestamp": self.timestamp
+        }
+
+@dataclass
+class SocialPost(_Record):
+    """A tweet or a Reddit post; fields that do not apply to a platform are None
+
+    duplicate_of is the "platform:id" of an earlier near-identical post.
+    """
+
+    __slots__ = (
+        "id", "platform", "user_id", "user_name", "title", "content", "created_at",
+        "sentiment", "hashtags", "mentions", "user_followers", "retweet_count",
+        "favorite_count", "score", "upvote_ratio", "num_comments", "url", "subreddit",
+        "duplicate_of"
+    )
+
+    id: str
+    platform: str
+    user_id: str
+    user_name: str
+    title: str
+    content: str
+    created_at: datetime.datetime
+    sentiment: float
+    hashtags: list
+    mentions: list
+    user_followers: int
+    retweet_count: int
+    favorite_count: int
+    score: int
+    upvote_ratio: float
+    num_comments: int
+    url: str
+    subreddit: str
+    duplicate_of: str
+
+@dataclass
+class Comment(_Record):
+    """A Reddit comment"""
+
+    __slots__ = (
+        "id", "post_id", "parent_id", "user_id", "content", "created_at", "score", "sentiment", "platform",
+        "duplicate_of"
+    )
+
+    id: str
+    post_id: str
+    parent_id: str
+    user_id: str
+    content: str
+    created_at: datetime.datetime
+    score: int
+    sentiment: float
+    platform: str
+    duplicate_of: str
@@ -0,0 +1,319 @@
+import datetime
+import fnmatch
+import gzip
+import json
+import logging
+import time
+from pathlib import Path
+
+from sqlalchemy import MetaData, String, Table, delete, func, insert, literal, select
+
+from src.database_manager import SensorDataHourly
+from src.post_writer import post_content
+
+logger = logging.getLogger(__name__)
+
+class RetentionPolicy:
+    """How long data in one table, collection or relationship type is kept
+
+    store is "sql", "mongo" or "neo4j"; target is a table name, a collection
+    name or pattern (e.g. "*_trends"), or a relationship type. Options:
+      archive  write expired rows/documents to gzip JSON lines before deleting
+      rollup   keep hourly aggregates of expired sensor_data rows
+      ttl      use a MongoDB TTL index on the time field instead of deletes
+      field=x  time field (default: timestamp); MongoDB deletes without ttl
+               always go by _id creation time and do not take one
+    """
+
+    def __init__(self, store, target, days, archive=False, rollup=False, ttl=False, field=None):
+        if store not in ("sql", "mongo", "neo4j"):
+            raise ValueError(f"Unknown retention store '{store}'")
+        if store == "mongo" and not ttl and field is not None:
+            raise ValueError(f"Retention mongo:{target}: documents are deleted by _id creation time; field= needs ttl")
+        self.store = store
+        self.target = target
+        self.days = float(days)
+        self.archive = archive
+        self.rollup = rollup
+        self.ttl = ttl
+        self.field = field or "timestamp"
+
+    @property
+    def name(self):
+        return f"{self.store}:{self.target}"
+
+    def __repr__(self):
+        return f"<RetentionPolicy({self.name}, days={self.days:g})>"
+
+def parse_retention_policies(value):
+    """Parse 'store:target=days[:option...],...' into RetentionPolicy objects
+
+    e.g. "sql:sensor_data=30:rollup,mongo:*_trends=90,mongo:sensor_data=7:ttl,
+    neo4j:CO_OCCURS_WITH=180:field=updated_at"
+    """
+    policies = []
+    for item in (value or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, spec = item.partition("=")
+        store, _, target = name.partition(":")
+        days, *options = spec.split(":")
+
+        kwargs = {}
+        for option in options:
+            key, _, option_value = option.partition("=")
+            if key == "field":
+                kwargs["field"] = option_value
+            elif key in ("archive", "rollup", "ttl"):
+                kwargs[key] = True
+            else:
+                raise ValueError(f"Unknown retention option '{option}' in '{item}'")
+        policies.append(RetentionPolicy(store.strip(), target.strip(), days, **kwargs))
+    return policies
+
+class _ArchiveWriter:
+    """Gzip JSON lines file, created on the first record"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def write(self, record):
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = gzip.open(self.path, "at", encoding="utf-8")
+        self._file.write(json.dumps(record, default=str) + "\n")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            logger.info(f"Archived expired data to {self.path}")
+
+class RetentionManager:
+    """Applies retention policies in small batches
+
+    Every batch is its own short transaction with a pause in between, so
+    expiring millions of rows never holds a long lock against ingestion.
+    """
+
+    def __init__(self, db_manager, policies, batch_size=5000, pause=0.05, archive_dir="data/archive"):
+        self.db_manager = db_manager
+        self.policies = list(policies)
+        self.batch_size = batch_size
+        self.pause = pause
+        self.archive_dir = Path(archive_dir)
+
+    def apply(self):
+        """Apply every policy; returns {policy name: rows/documents removed}"""
+        results = {}
+        for policy in self.policies:
+            started = time.monotonic()
+            try:
+                if policy.store == "sql":
+                    removed = self._apply_sql(policy)
+                elif policy.store == "mongo":
+                    removed = self._apply_mongo(policy)
+                else:
+                    removed = self._apply_neo4j(policy)
+            except Exception as e:
+                logger.error(f"Error applying retention policy {policy.name}: {e}")
+                removed = None
+            results[policy.name] = removed
+            if removed:
+                logger.info(f"Retention {policy.name}: removed {removed} in {time.monotonic() - started:.1f}s")
+        return results
+
+    def _archive_file(self, policy, target):
+        return _ArchiveWriter(self.archive_dir / f"{policy.store}_{target}_{datetime.datetime.now():%Y%m%d_%H%M%S}.jsonl.gz")
+
+    # SQL
+
+    def _apply_sql(self, policy):
+        engine = self.db_manager.sql_engine
+        if engine is None:
+            logger.warning(f"Retention {policy.name}: no SQL database")
+            return 0
+
+        table = Table(policy.target, MetaData(), autoload_with=engine)
+        time_column = table.c[policy.field]
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=policy.days)
+
+        if policy.rollup:
+            if policy.target != "sensor_data":
+                logger.warning(f"Retention {policy.name}: rollup is only supported for sensor_data")
+            else:
+                # Only whole hours are rolled up and removed; the rest waits for the next run
+                cutoff = cutoff.replace(minute=0, second=0, microsecond=0)
+
+        archive = self._archive_file(policy, policy.target) if policy.archive else None
+        removed = 0
+        try:
+            while True:
+                with engine.connect() as connection:
+                    oldest = connection.execute(select(func.min(time_column)).where(time_column < cutoff)).scalar()
+                if oldest is None:
+                    break
+
+                # Work through one day at a time so rollups cover complete hours
+                window_end = min(oldest.replace(minute=0, second=0, microsecond=0) + datetime.timedelta(days=1), cutoff)
+                if policy.rollup and policy.target == "sensor_data":
+                    self._rollup_sensor_data(engine, table, oldest, window_end)
+                removed += self._delete_sql_batches(engine, table, time_column, window_end, archive)
+        finally:
+            if archive:
+                archive.close()
+
+        if removed:
+            self.db_manager.query_cache.invalidate(f"sql:{policy.target}")
+        return removed
+
+    def _delete_sql_batches(self, engine, table, time_column, cutoff, archive):
+        removed = 0
+        while True:
+            with engine.begin() as connection:
+                if archive:
+                    rows = connection.execute(
+                        select(table).where(time_column < cutoff).order_by(table.c.id).limit(self.batch_size)
+                    ).fetchall()
+                    for row in rows:
+                        record = dict(row._mapping)
+                        if record.get("content_compressed") is not None:
+                            # Archives hold plain text
+                            record["content"] = post_content(record)
+                            del record["content_compressed"]
+                        archive.write(record)
+                    ids = [row.id for row in rows]
+                    count = connection.execute(delete(table).where(table.c.id.in_(ids))).rowcount if ids else 0
+                else:
+                    batch = select(table.c.id).where(time_column < cutoff).order_by(table.c.id).limit(self.batch_size)
+                    count = connection.execute(delete(table).where(table.c.id.in_(batch.scalar_subquery()))).rowcount
+            removed += count
+            if count < self.batch_size:
+                return removed
+            time.sleep(self.pause)
+
+    def _rollup_sensor_data(self, engine, table, start, end):
+        """Store hourly count/avg/min/max of sensor_data rows in [hour of start, end)"""
+        hourly = SensorDataHourly.__table__
+        start = start.replace(minute=0, second=0, microsecond=0)
+        if engine.dialect.name == "sqlite":
+            hour = func.strftime("%Y-%m-%d %H:00:00", table.c.timestamp)
+            # The hour column then holds these strings, which a bound datetime
+            # (with microseconds) does not compare equal to; bind strings as well
+            first_hour = literal(start.strftime("%Y-%m-%d %H:%M:%S"), String)
+            end_hour = literal(end.strftime("%Y-%m-%d %H:%M:%S"), String)
+        else:
+            hour = func.date_trunc("hour", table.c.timestamp)
+            first_hour, end_hour = start, end
+
+        aggregates = (
+            select(
+                table.c.sensor_id, table.c.unit, hour,
+                func.count(), func.avg(table.c.value), func.min(table.c.value), func.max(table.c.value)
+            )
+            .where(table.c.timestamp >= start, table.c.timestamp < end)
+            .group_by(table.c.sensor_id, table.c.unit, hour)
+        )
+        with engine.begin() as connection:
+            # Rolling up the same window twice (e.g. after a crash) replaces the earlier rollup
+            connection.execute(delete(hourly).where(hourly.c.hour >= first_hour, hourly.c.hour < end_hour))
+            connection.execute(insert(hourly).from_select(
+                ["sensor_id", "unit", "hour", "count", "avg_value", "min_value", "max_value"], aggregates
+            ))
+
+    # MongoDB
+
+    def _apply_mongo(self, policy):
+        database = self.db_manager.mongo_db
+        if database is None:
+            logger.warning(f"Retention {policy.name}: no MongoDB database")
+            return 0
+
+        if any(char in policy.target for char in "*?["):
+            collections = fnmatch.filter(database.list_collection_names(), policy.target)
+        else:
+            collections = [policy.target]
+
+        removed = 0
+        for name in collections:
+            if policy.ttl:
+                self._ensure_ttl_index(database, name, policy)
+            else:
+                removed += self._delete_mongo_batches(database[name], policy)
+                self.db_manager.query_cache.invalidate(f"mongo:{name}")
+        return removed
+
+    def _ensure_ttl_index(self, database, name, policy):
+        """MongoDB removes expired documents itself; the field must hold BSON dates"""
+        sample = database[name].find_one({policy.field: {"$exists": True}}, {policy.field: 1})
+        value = sample
+        for key in policy.field.split("."):
+            value = value.get(key) if isinstance(value, dict) else None
+        if sample is not None and not isinstance(value, datetime.datetime):
+            # A TTL index ignores documents whose field is not a date, e.g. the ISO strings of *_trends
+            logger.warning(
+                f"Retention {policy.name}: {name}.{policy.field} holds {type(value).__name__} values, "
+                f"which a TTL index never expires; use a policy without ttl"
+            )
+            return
+        index_name = f"retention_ttl_{policy.field}"
+        seconds = int(policy.days * 86400)
+        try:
+            database[name].create_index([(policy.field, 1)], name=index_name, expireAfterSeconds=seconds)
+        except Exception:
+            # The index exists with another expiry: change it in place
+            database.command("collMod", name, index={"name": index_name, "expireAfterSeconds": seconds})
+        logger.debug(f"TTL index on {name}.{policy.field}: {seconds}s")
+
+    def _delete_mongo_batches(self, collection, policy):
+        from bson import ObjectId
+
+        # ObjectIds start with their creation time, so _id ranges select by insertion time without an index
+        cutoff = ObjectId.from_datetime(datetime.datetime.utcnow() - datetime.timedelta(days=policy.days))
+        archive = self._archive_file(policy, collection.name) if policy.archive else None
+        removed = 0
+        try:
+            while True:
+                if archive:
+                    documents = list(collection.find({"_id": {"$lt": cutoff}}).sort("_id", 1).limit(self.batch_size))
+                    for document in documents:
+                        archive.write(document)
+                    ids = [document["_id"] for document in documents]
+                else:
+                    ids = [
+                        document["_id"] for document in
+                        collection.find({"_id": {"$lt": cutoff}}, {"_id": 1}).sort("_id", 1).limit(self.batch_size)
+                    ]
+                if not ids:
+                    break
+                removed += collection.delete_many({"_id": {"$in": ids}}).deleted_count
+                if len(ids) < self.batch_size:
+                    break
+                time.sleep(self.pause)
+        finally:
+            if archive:
+                archive.close()
+        return removed
+
+    # Neo4j
+
+    def _apply_neo4j(self, policy):
+        driver = self.db_manager.neo4j_driver
+        if driver is None:
+            logger.warning(f"Retention {policy.name}: no Neo4j database")
+            return 0
+        if policy.archive or policy.rollup:
+            logger.warning(f"Retention {policy.name}: archive/rollup are not supported for Neo4j")
+
+        # Relationship timestamps are local ISO strings, which compare correctly as strings
+        cutoff = (datetime.datetime.now() - datetime.timedelta(days=policy.days)).isoformat()
+        query = (
+            f"MATCH ()-[r:`{policy.target}`]->() WHERE r.`{policy.field}` < $cutoff "
+            f"CALL {{ WITH r DELETE r }} IN TRANSACTIONS OF $batch_size ROWS"
+        )
+        # CALL ... IN TRANSACTIONS needs an auto-commit transaction, i.e. session.run()
+        with driver.session() as session:
+            summary = session.run(query, cutoff=cutoff, batch_size=self.batch_size).consume()
+        self.db_manager.query_cache.invalidate("neo4j")
+        return summary.counters.relationships_deleted
@@ -0,0 +1,209 @@
+import logging
+import re
+
+from sqlalchemy import event, inspect, text
+
+from src.post_writer import decompress_content
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "social_posts_fts"
+
+_TOKEN = re.compile(r"[\w#@']+", re.UNICODE)
+
+def _post_text(content, content_compressed):
+    return content if content is not None else decompress_content(content_compressed)
+
+def _register_post_text(dbapi_connection, connection_record):
+    dbapi_connection.create_function("post_text", 2, _post_text, deterministic=True)
+
+def encode_cursor(score, post_id):
+    """Opaque keyset cursor for the next page: the last result's score and id"""
+    return f"{score!r}:{post_id}"
+
+def decode_cursor(cursor):
+    score, _, post_id = cursor.rpartition(":")
+    return float(score), int(post_id)
+
+class PostSearchIndex:
+    """Full-text index over social_media_posts.content
+
+    SQLite: a contentless FTS5 table keyed by the post id and kept in sync by
+    triggers, ranked with bm25(); the text itself is only stored (and possibly
+    compressed) in social_media_posts. PostgreSQL: a generated tsvector column with
+    a GIN index, ranked with ts_rank_cd(). Results are paged with a keyset
+    cursor (score, id), so later pages cost the same as the first.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.dialect = engine.dialect.name
+        self.available = False
+
+    def setup(self):
+        """Create the index (idempotent); returns False if the database has no full-text support"""
+        try:
+            if self.dialect == "sqlite":
+                self._setup_sqlite()
+            elif self.dialect == "postgresql":
+                self._setup_postgresql()
+            else:
+                logger.warning(f"Full-text search is not supported on {self.dialect}")
+                return False
+            self.available = True
+        except Exception as e:
+            logger.error(f"Could not set up full-text search: {e}")
+        return self.available
+
+    def _setup_sqlite(self):
+        # The triggers index compressed posts through post_text(); pooled connections
+        # opened before the listener was added do not have it
+        if not event.contains(self.engine, "connect", _register_post_text):
+            event.listen(self.engine, "connect", _register_post_text)
+            self.engine.dispose()
+
+        with self.engine.begin() as connection:
+            existing = connection.execute(
+                text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+            ).scalar()
+            if existing is not None and "content=''" in existing:
+                return
+            if existing is not None:
+                # An index from before it was contentless holds a second copy of every post
+                for trigger in ("insert", "delete", "update"):
+                    connection.execute(text(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{trigger}"))
+                connection.execute(text(f"DROP TABLE {FTS_TABLE}"))
+
+            # Contentless: only the index is stored, the text stays (compressed) in social_media_posts
+            connection.execute(text(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(content, content = '', tokenize = 'unicode61')"
+            ))
+            # A contentless index can only remove a row given the exact text it indexed
+            has_old = "old.content IS NOT NULL OR old.content_compressed IS NOT NULL"
+            has_new = "new.content IS NOT NULL OR new.content_compressed IS NOT NULL"
+            insert_new = (
+                f"INSERT INTO {FTS_TABLE}(rowid, content) "
+                f"SELECT new.id, post_text(new.content, new.content_compressed) WHERE {has_new};"
+            )
+            delete_old = (
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content) "
+                f"SELECT 'delete', old.id, post_text(old.content, old.content_compressed) WHERE {has_old};"
+            )
+            connection.execute(text(f"""
+                CREATE TRIGGER {FTS_TABLE}_insert AFTER INSERT ON social_media_posts
+                BEGIN
+                    {insert_new}
+                END
+            """))
+            connection.execute(text(f"""
+                CREATE TRIGGER {FTS_TABLE}_delete AFTER DELETE ON social_media_posts
+                BEGIN
+                    {delete_old}
+                END
+            """))
+            connection.execute(text(f"""
+                CREATE TRIGGER {FTS_TABLE}_update AFTER UPDATE OF content, content_compressed ON social_media_posts
+                BEGIN
+                    {delete_old}
+                    {insert_new}
+                END
+            """))
+            # Index posts stored before the index existed
+            result = connection.execute(text(
+                f"INSERT INTO {FTS_TABLE}(rowid, content) "
+                "SELECT id, post_text(content, content_compressed) FROM social_media_posts "
+                "WHERE content IS NOT NULL OR content_compressed IS NOT NULL"
+            ))
+            logger.info(f"Created full-text index {FTS_TABLE} ({result.rowcount} existing posts)")
+
+    def _setup_postgresql(self):
+        columns = {column["name"] for column in inspect(self.engine).get_columns("social_media_posts")}
+        with self.engine.begin() as connection:
+            if "content_tsv" not in columns:
+                connection.execute(text(
+                    "ALTER TABLE social_media_posts ADD COLUMN content_tsv tsvector "
+                    "GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED"
+                ))
+            connection.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_social_media_posts_content_tsv "
+                "ON social_media_posts USING GIN (content_tsv)"
+            ))
+
+    @staticmethod
+    def to_fts_query(query):
+        """Turn free text into an FTS5 query: every word must match, quoted so syntax characters are literal"""
+        return " ".join('"' + token.replace('"', '""') + '"' for token in _TOKEN.findall(query))
+
+    def search(self, query, platform=None, time_range=None, limit=20, after=None):
+        """Return (results, next cursor) for posts matching query, best match first"""
+        if not self.available:
+            raise RuntimeError("Full-text search is not available")
+
+        params = {"limit": limit}
+        filters = []
+        if platform:
+            filters.append("pl.name = :platform")
+            params["platform"] = platform
+        if time_range:
+            filters.append("p.timestamp >= :start AND p.timestamp < :end")
+            params["start"], params["end"] = time_range
+
+        if self.dialect == "sqlite":
+            params["query"] = self.to_fts_query(query)
+            if not params["query"]:
+                return [], None
+            # bm25() is lower for better matches, so pages go up in score
+            score = f"bm25({FTS_TABLE})"
+            if after:
+                filters.append(f"({score} > :after_score OR ({score} = :after_score AND f.rowid > :after_id))")
+                params["after_score"], params["after_id"] = decode_cursor(after)
+            sql = f"""
+                SELECT p.id, pl.name AS platform, p.post_id, p.user_id, p.content, p.content_compressed,
+                       p.sentiment, p.timestamp, {score} AS score
+                FROM {FTS_TABLE} f
+                JOIN social_media_posts p ON p.id = f.rowid
+                LEFT JOIN social_platforms pl ON pl.id = p.platform_id
+                WHERE {FTS_TABLE} MATCH :query {''.join(' AND ' + f for f in filters)}
+                ORDER BY score, p.id
+                LIMIT :limit
+            """
+        else:
+            params["query"] = query
+            # ts_rank_cd() is higher for better matches; negate it so pages go up in score like bm25()
+            score = "-ts_rank_cd(p.content_tsv, websearch_to_tsquery('english', :query))"
+            if after:
+                filters.append(f"({score} > :after_score OR ({score} = :after_score AND p.id > :after_id))")
+                params["after_score"], params["after_id"] = decode_cursor(after)
+            sql = f"""
+                SELECT p.id, pl.name AS platform, p.post_id, p.user_id, p.content, p.sentiment, p.timestamp, {score} AS score
+                FROM social_media_posts p
+                LEFT JOIN social_platforms pl ON pl.id = p.platform_id
+                WHERE p.content_tsv @@ websearch_to_tsquery('english', :query) {''.join(' AND ' + f for f in filters)}
+                ORDER BY score, p.id
+                LIMIT :limit
+            """
+
+        with self.engine.connect() as connection:
+            results = [dict(row._mapping) for row in connection.execute(text(sql), params)]
+        for result in results:
+            compressed = result.pop("content_compressed", None)
+            if result["content"] is None:
+                result["content"] = decompress_content(compressed)
+
+        next_cursor = None
+        if len(results) == limit:
+            next_cursor = encode_cursor(results[-1]["score"], results[-1]["id"])
+        return results, next_cursor
+
+def ensure_mongo_text_indexes(mongo_db, collections=("twitter_data", "reddit_data", "reddit_comment_data")):
+    """Text indexes over raw social documents; titles weigh more than bodies"""
+    for name in collections:
+        try:
+            mongo_db[name].create_index(
+                [("title", "text"), ("content", "text")],
+                name="content_text",
+                weights={"title": 3, "content": 1},
+                default_language="english"
+            )
+        except Exception as e:
+            logger.warning(f"Could not create text index on {name}: {e}")
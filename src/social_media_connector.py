@@ -1,23 +1,49 @@
-import tweepy
-import praw
 import time
 import json
 import logging
-from textblob import TextBlob
+from collections import deque
 from datetime import datetime, timedelta
-import pandas as pd
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# tweepy, praw, textblob and pandas are imported where they are used, so a
+# process that never touches an API or analysis does not pay their import time
+
+from src.records import SocialPost, Comment
+from src.utils.metrics import timed
+
 logger = logging.getLogger(__name__)
 
+def _to_frame(data):
+    """DataFrame from a list of records (or plain dicts)"""
+    import pandas as pd
+    
+    return pd.DataFrame([item.to_dict() if hasattr(item, "to_dict") else item for item in data])
+
+def _expanded_depths(items, depth):
+    """(item, depth) pairs for the flat list a MoreComments expanded into
+
+    The items that are not replies to another item of the list are siblings
+    of the MoreComments, at its depth; the others are one below their parent.
+    """
+    depths = {}
+    for item in items:
+        item_depth = depths.get(getattr(item, "parent_id", None), depth - 1) + 1
+        if getattr(item, "name", None):
+            depths[item.name] = item_depth
+        yield item, item_depth
+
 class SocialMediaConnector:
-    def __init__(self, twitter_credentials=None, reddit_credentials=None):
+    def __init__(self, twitter_credentials=None, reddit_credentials=None, near_duplicates=None):
         self.twitter_api = None
         self.reddit_api = None
         
+        # Optional NearDuplicateDetector; near-duplicates reuse their cluster's sentiment
+        self.near_duplicates = near_duplicates
+        
         # Twitter API kurulumu
         if twitter_credentials:
             try:
+                import tweepy
+                
                 auth = tweepy.OAuthHandler(
                     twitter_credentials["consumer_key"],
                     twitter_credentials["consumer_secret"]
@@ -34,6 +60,8 @@ class SocialMediaConnector:
         # Reddit API kurulumu
         if reddit_credentials:
             try:
+                import praw
+                
                 self.reddit_api = praw.Reddit(
                     client_id=reddit_credentials["client_id"],
                     client_secret=reddit_credentials["client_secret"],
@@ -47,44 +75,68 @@ class SocialMediaConnector:
     
     def analyze_sentiment(self, text):
         """Metin duygu analizi"""
+        from textblob import TextBlob
+        
         blob = TextBlob(text)
         return blob.sentiment.polarity
     
-    def search_twitter(self, query, count=100):
+    def _sentiment_and_duplicate(self, key, text):
+        """Sentiment of a text and the key of the post it nearly duplicates (None if new)"""
+        cluster = self.near_duplicates.check(key, text) if self.near_duplicates is not None else None
+        if cluster is None:
+            return self.analyze_sentiment(text), None
+        
+        # Only the first text of a cluster is analyzed
+        if cluster.sentiment is None:
+            cluster.sentiment = self.analyze_sentiment(text)
+        return cluster.sentiment, (cluster.key if cluster.key != key else None)
+    
+    @timed("connector_call_seconds", call="search_twitter")
+    def search_twitter(self, query, count=100, since_id=None):
         """Twitter'da arama yap ve sonuçları döndür"""
         if not self.twitter_api:
             logger.error("Twitter API connection not available")
             return []
         
         try:
+            import tweepy
+            
             tweets = []
-            for tweet in tweepy.Cursor(self.twitter_api.search_tweets, q=query, lang="en", tweet_mode="extended").items(count):
+            search_params = {"q": query, "lang": "en", "tweet_mode": "extended"}
+            if since_id:
+                # Only fetch tweets newer than the last one already collected
+                search_params["since_id"] = since_id
+            
+            for tweet in tweepy.Cursor(self.twitter_api.search_tweets, **search_params).items(count):
                 # Yeniden tweetleri atlayalım
                 if hasattr(tweet, "retweeted_status"):
                     continue
                     
-                tweet_data = {
-                    "id": tweet.id_str,
-                    "user_id": tweet.user.id_str,
-                    "user_name": tweet.user.screen_name,
-                    "user_followers": tweet.user.followers_count,
-                    "content": tweet.full_text,
-                    "created_at": tweet.created_at,
-                    "retweet_count": tweet.retweet_count,
-                    "favorite_count": tweet.favorite_count,
-                    "platform": "twitter"
-                }
-                
-                # Duygu analizi ekleyelim
-                tweet_data["sentiment"] = self.analyze_sentiment(tweet.full_text)
-                
-                # Hashtag'leri ekleyelim
-                if hasattr(tweet, "entities") and "hashtags" in tweet.entities:
-                    tweet_data["hashtags"] = [tag["text"] for tag in tweet.entities["hashtags"]]
-                
-                # Mentions ekleyelim 
-                if hasattr(tweet, "entities") and "user_mentions" in tweet.entities:
-                    tweet_data["mentions"] = [mention["screen_name"] for mention in tweet.entities["user_mentions"]]
+                entities = getattr(tweet, "entities", {})
+                sentiment, duplicate_of = self._sentiment_and_duplicate(f"twitter:{tweet.id_str}", tweet.full_text)
+                tweet_data = SocialPost(
+                    id=tweet.id_str,
+                    platform="twitter",
+                    user_id=tweet.user.id_str,
+                    user_name=tweet.user.screen_name,
+                    title=None,
+                    content=tweet.full_text,
+                    created_at=tweet.created_at,
+                    # Duygu analizi ekleyelim
+                    sentiment=sentiment,
+                    # Hashtag'leri ve mention'ları ekleyelim
+                    hashtags=[tag["text"] for tag in entities["hashtags"]] if "hashtags" in entities else None,
+                    mentions=[mention["screen_name"] for mention in entities["user_mentions"]] if "user_mentions" in entities else None,
+                    user_followers=tweet.user.followers_count,
+                    retweet_count=tweet.retweet_count,
+                    favorite_count=tweet.favorite_count,
+                    score=None,
+                    upvote_ratio=None,
+                    num_comments=None,
+                    url=None,
+                    subreddit=None,
+                    duplicate_of=duplicate_of
+                )
                 
                 tweets.append(tweet_data)
                 
@@ -94,6 +146,7 @@ class SocialMediaConnector:
             logger.error(f"Error searching Twitter: {e}")
             return []
     
+    @timed("connector_call_seconds", call="search_reddit")
     def search_reddit(self, subreddit_name, limit=100, time_filter="week"):
         """Reddit'te belirli bir subreddit'te arama yap"""
         if not self.reddit_api:
@@ -105,22 +158,29 @@ class SocialMediaConnector:
             subreddit = self.reddit_api.subreddit(subreddit_name)
             
             for post in subreddit.top(time_filter=time_filter, limit=limit):
-                post_data = {
-                    "id": post.id,
-                    "user_id": post.author.name if post.author else "[deleted]",
-                    "title": post.title,
-                    "content": post.selftext,
-                    "created_at": datetime.fromtimestamp(post.created_utc),
-                    "score": post.score,
-                    "upvote_ratio": post.upvote_ratio,
-                    "num_comments": post.num_comments,
-                    "url": post.url,
-                    "platform": "reddit",
-                    "subreddit": subreddit_name
-                }
-                
-                # Duygu analizi ekleyelim
-                post_data["sentiment"] = self.analyze_sentiment(post.title + " " + post.selftext)
+                sentiment, duplicate_of = self._sentiment_and_duplicate(f"reddit:{post.id}", post.title + " " + post.selftext)
+                post_data = SocialPost(
+                    id=post.id,
+                    platform="reddit",
+                    user_id=post.author.name if post.author else "[deleted]",
+                    user_name=None,
+                    title=post.title,
+                    content=post.selftext,
+                    created_at=datetime.fromtimestamp(post.created_utc),
+                    # Duygu analizi ekleyelim
+                    sentiment=sentiment,
+                    hashtags=None,
+                    mentions=None,
+                    user_followers=None,
+                    retweet_count=None,
+                    favorite_count=None,
+                    score=post.score,
+                    upvote_ratio=post.upvote_ratio,
+                    num_comments=post.num_comments,
+                    url=post.url,
+                    subreddit=subreddit_name,
+                    duplicate_of=duplicate_of
+                )
                 
                 posts.append(post_data)
             
@@ -130,46 +190,144 @@ class SocialMediaConnector:
             logger.error(f"Error searching Reddit: {e}")
             return []
     
+    @timed("connector_call_seconds", call="get_reddit_comments")
     def get_reddit_comments(self, post_id, limit=None):
         """Belirli bir Reddit gönderisinin yorumlarını al"""
         if not self.reddit_api:
             logger.error("Reddit API connection not available")
             return []
         
+        comments = list(self.iter_reddit_comments(post_id, max_more=limit))
+        logger.info(f"Retrieved {len(comments)} comments for post {post_id}")
+        return comments
+    
+    def iter_reddit_comments(self, post_id, max_depth=None, max_comments=None, max_more=32, since=None, skip_ids=None):
+        """Yield a post's comments breadth-first as they are loaded
+        
+        max_depth limits reply depth (1 = top-level only), max_comments the number
+        of comments yielded and max_more the number of MoreComments expansions
+        (None = unlimited). With since (a UTC epoch timestamp) comments are read
+        newest first and only comments newer than since are yielded. Once a
+        top-level comment is not newer, further top-level comments are not
+        loaded, but the replies of those already loaded are still read: new
+        replies under an old top-level comment are found as long as it is on the
+        first page of the thread. Comments whose id is in skip_ids are not
+        yielded either, but their replies are read.
+        
+        The generator returns True if the walk was complete, False if a budget
+        (max_comments or max_more) or an error cut it short; comments deeper
+        than max_depth do not count.
+        """
+        if not self.reddit_api:
+            logger.error("Reddit API connection not available")
+            return False
+        
         try:
-            comments = []
+            from praw.models import MoreComments
+            
             submission = self.reddit_api.submission(id=post_id)
-            submission.comments.replace_more(limit=limit)
+            if since is not None:
+                submission.comment_sort = "new"
             
-            for comment in submission.comments.list():
-                comment_data = {
-                    "id": comment.id,
-                    "post_id": post_id,
-                    "user_id": comment.author.name if comment.author else "[deleted]",
-                    "content": comment.body,
-                    "created_at": datetime.fromtimestamp(comment.created_utc),
-                    "score": comment.score,
-                    "platform": "reddit",
-                    "parent_id": comment.parent_id
-                }
-                
-                # Duygu analizi ekleyelim
-                comment_data["sentiment"] = self.analyze_sentiment(comment.body)
-                
-                comments.append(comment_data)
+            # Only the frontier of pending comments is kept, not the flattened tree
+            queue = deque((item, 0) for item in submission.comments)
+            yielded = 0
+            expansions = 0
+            reached_watermark = False
+            complete = True
             
-            logger.info(f"Retrieved {len(comments)} comments for post {post_id}")
-            return comments
+            while queue:
+                item, depth = queue.popleft()
+                
+                if isinstance(item, MoreComments):
+                    if reached_watermark and depth == 0:
+                        continue
+                    if max_more is not None and expansions >= max_more:
+                        complete = False
+                        continue
+                    expansions += 1
+                    queue.extend(_expanded_depths(item.comments(), depth))
+                    continue
+                
+                if max_depth is not None and depth >= max_depth:
+                    continue
+                
+                old = since is not None and item.created_utc <= since
+                if old or (skip_ids and item.id in skip_ids):
+                    # Top-level comments come newest first; replies may still be new
+                    if old and depth == 0:
+                        reached_watermark = True
+                    if max_depth is None or depth + 1 < max_depth:
+                        queue.extend((reply, depth + 1) for reply in item.replies)
+                    continue
+                
+                if reached_watermark and depth == 0:
+                    continue
+                
+                sentiment, duplicate_of = self._sentiment_and_duplicate(f"reddit_comment:{item.id}", item.body)
+                comment_data = Comment(
+                    id=item.id,
+                    post_id=post_id,
+                    parent_id=item.parent_id,
+                    user_id=item.author.name if item.author else "[deleted]",
+                    content=item.body,
+                    created_at=datetime.fromtimestamp(item.created_utc),
+                    score=item.score,
+                    # Duygu analizi ekleyelim
+                    sentiment=sentiment,
+                    platform="reddit",
+                    duplicate_of=duplicate_of
+                )
+                
+                yield comment_data
+                
+                yielded += 1
+                if max_depth is None or depth + 1 < max_depth:
+                    queue.extend((reply, depth + 1) for reply in item.replies)
+                
+                if max_comments is not None and yielded >= max_comments:
+                    return complete and not queue
+            return complete
         except Exception as e:
             logger.error(f"Error getting Reddit comments: {e}")
-            return []
+            return False
     
+    @timed("connector_call_seconds", call="get_rate_limit")
+    def get_rate_limit(self, platform):
+        """Return the remaining API budget as {"remaining", "reset_at"} or None if unknown
+
+        Read from the response headers of the last request, without another API call.
+        """
+        try:
+            if platform == "twitter" and self.twitter_api:
+                response = getattr(self.twitter_api, "last_response", None)
+                # Only search responses carry the search budget
+                if response is not None and "search/tweets" in response.url:
+                    headers = response.headers
+                    if "x-rate-limit-remaining" in headers:
+                        return {
+                            "remaining": int(headers["x-rate-limit-remaining"]),
+                            "reset_at": int(headers["x-rate-limit-reset"])
+                        }
+                return None
+            
+            if platform == "reddit" and self.reddit_api:
+                # PRAW tracks the limits from the response headers of the last request
+                limits = self.reddit_api.auth.limits
+                if limits.get("remaining") is not None:
+                    return {"remaining": limits["remaining"], "reset_at": limits["reset_timestamp"]}
+        except Exception as e:
+            logger.warning(f"Could not get {platform} rate limit: {e}")
+        
+        return None
+    
+    @timed("connector_call_seconds", call="identify_influencers")
     def identify_influencers(self, data, platform):
         """Etkileyen kullanıcıları tanımla"""
         if not data:
             return []
         
-        df = pd.DataFrame(data)
+        df = _to_frame(data)
         
         if platform == "twitter":
             # For Twitter, sort by follower count, retweets and favorites
@@ -190,12 +348,15 @@ class SocialMediaConnector:
         
         return []
     
+    @timed("connector_call_seconds", call="analyze_trends")
     def analyze_trends(self, data, platform, time_window_days=7):
         """Trend analizi yap"""
         if not data:
             return {}
         
-        df = pd.DataFrame(data)
+        import pandas as pd
+        
+        df = _to_frame(data)
         
         # Tarih sütununu datetime'a dönüştürelim
         if "created_at" in df.columns:
@@ -0,0 +1,401 @@
+import datetime
+import logging
+import re
+import threading
+
+from sqlalchemy import Column, DateTime, Float, Index, Integer, MetaData, String, Table, create_engine, inspect, text
+
+from src.connection_health import Backend, BackendUnavailable, CircuitBreaker
+from src.query_cache import QueryCache
+from src.records import SensorReading
+from src.utils.metrics import REGISTRY, timed
+
+logger = logging.getLogger(__name__)
+
+CHUNK_PREFIX = "sensor_data_"
+_CHUNK_NAME = re.compile(r"^sensor_data_(\d{8})$")
+
+def _reading_row(topic, data):
+    return SensorReading(
+        sensor_id=data.get("sensor_id"),
+        value=data.get("value"),
+        unit=data.get("unit"),
+        timestamp=datetime.datetime.utcnow(),
+        topic=topic
+    ).to_row()
+
+class SqlSensorStore:
+    """Current behaviour: one sensor_data table through DatabaseManager"""
+
+    name = "sql"
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+
+    def write(self, topic, data):
+        return self.db_manager.save_sensor_data_to_sql(topic, data)
+
+    def get_stats(self, start, end):
+        return self.db_manager.get_sensor_stats(start, end)
+
+    def apply_retention(self):
+        # Row-wise expiry of sensor_data is handled by the retention subsystem
+        return 0
+
+    def close(self):
+        pass
+
+class PartitionedSensorStore:
+    """Sensor readings in one table per UTC day (sensor_data_YYYYMMDD)
+
+    Range queries only read the chunks that overlap the window, and retention
+    drops whole chunk tables instead of deleting rows, so expiring a day of
+    readings is a single DROP TABLE regardless of its size. Works on any
+    SQLAlchemy database, including SQLite.
+    """
+
+    name = "partitioned"
+
+    def __init__(self, engine, query_cache=None, retention_days=None):
+        self.engine = engine
+        self.query_cache = query_cache
+        self.retention_days = retention_days
+        self.owns_engine = False
+        self.metadata = MetaData()
+        self._chunks = {}
+        self._lock = threading.Lock()
+        self.refresh_chunks()
+
+    @staticmethod
+    def chunk_name(day):
+        return f"{CHUNK_PREFIX}{day:%Y%m%d}"
+
+    def refresh_chunks(self):
+        """Reload the chunk list (other processes may have created chunks)"""
+        days = {}
+        for table_name in inspect(self.engine).get_table_names():
+            match = _CHUNK_NAME.match(table_name)
+            if match:
+                days[datetime.datetime.strptime(match.group(1), "%Y%m%d").date()] = table_name
+        with self._lock:
+            self._chunks = {day: self._define_chunk(name) for day, name in days.items()}
+
+    def _define_chunk(self, name):
+        if name in self.metadata.tables:
+            return self.metadata.tables[name]
+        return Table(
+            name, self.metadata,
+            Column("id", Integer, primary_key=True),
+            Column("topic", String),
+            Column("sensor_id", String),
+            Column("value", Float),
+            Column("unit", String),
+            Column("timestamp", DateTime, nullable=False),
+            Index(f"ix_{name}_sensor_time", "sensor_id", "timestamp")
+        )
+
+    def _chunk_for(self, day):
+        chunk = self._chunks.get(day)
+        if chunk is not None:
+            return chunk
+        with self._lock:
+            chunk = self._chunks.get(day)
+            if chunk is None:
+                chunk = self._define_chunk(self.chunk_name(day))
+                chunk.create(self.engine, checkfirst=True)
+                self._chunks[day] = chunk
+                logger.info(f"Created sensor data chunk {chunk.name}")
+        return chunk
+
+    @timed("db_write_seconds", store="timeseries", op="sensor_data")
+    def write(self, topic, data):
+        """Insert one reading; errors are raised to GuardedSensorStore"""
+        row = _reading_row(topic, data)
+        chunk = self._chunk_for(row["timestamp"].date())
+        with self.engine.begin() as connection:
+            connection.execute(chunk.insert(), row)
+        if self.query_cache:
+            self.query_cache.invalidate("timeseries:sensor_data", row["timestamp"])
+        logger.debug("Sensor data saved to chunk %s", chunk.name, extra={"msg_class": "db.write"})
+        return True
+
+    def chunks_between(self, start, end):
+        """Chunk tables that can hold readings in [start, end)"""
+        return [
+            chunk for day, chunk in sorted(self._chunks.items())
+            if start.date() <= day <= end.date()
+        ]
+
+    def get_stats(self, start, end):
+        """Per-sensor count, average, minimum and maximum for a time window"""
+        def load():
+            self.refresh_chunks()
+            chunks = self.chunks_between(start, end)
+            if not chunks:
+                return []
+            readings = " UNION ALL ".join(
+                f"SELECT sensor_id, unit, value FROM {chunk.name} WHERE timestamp >= :start AND timestamp < :end"
+                for chunk in chunks
+            )
+            sql = f"""
+                SELECT sensor_id, unit, COUNT(*) AS count, AVG(value) AS avg_value,
+                       MIN(value) AS min_value, MAX(value) AS max_value
+                FROM ({readings}) AS readings
+                GROUP BY sensor_id, unit
+            """
+            with self.engine.connect() as connection:
+                return [dict(row._mapping) for row in connection.execute(text(sql), {"start": start, "end": end})]
+
+        if not self.query_cache:
+            return load()
+        key = QueryCache.make_key("timeseries", "sensor_stats", {"start": start, "end": end})
+        return self.query_cache.get_or_load(key, load, ["timeseries:sensor_data"], window=(start, end))
+
+    def apply_retention(self):
+        """Drop chunks older than retention_days; returns the number dropped"""
+        if not self.retention_days:
+            return 0
+
+        self.refresh_chunks()
+        cutoff = datetime.datetime.utcnow().date() - datetime.timedelta(days=self.retention_days)
+        with self._lock:
+            expired = [(day, chunk) for day, chunk in self._chunks.items() if day < cutoff]
+            for day, chunk in expired:
+                chunk.drop(self.engine, checkfirst=True)
+                self.metadata.remove(chunk)
+                del self._chunks[day]
+                logger.info(f"Dropped expired sensor data chunk {chunk.name}")
+
+        if expired and self.query_cache:
+            self.query_cache.invalidate("timeseries:sensor_data")
+        return len(expired)
+
+    def close(self):
+        # The engine may be DatabaseManager's; only dispose one created for this store
+        if self.owns_engine:
+            self.engine.dispose()
+
+class TimescaleSensorStore:
+    """Sensor readings in a TimescaleDB hypertable with daily chunks
+
+    Retention and compression are TimescaleDB background policies, so old
+    chunks are dropped or compressed by the database itself.
+    """
+
+    name = "timescale"
+    table = "sensor_readings"
+
+    def __init__(self, engine, query_cache=None, retention_days=None, compress_after_days=None):
+        self.engine = engine
+        self.query_cache = query_cache
+        self.retention_days = retention_days
+        self.compress_after_days = compress_after_days
+        self.owns_engine = False
+        self._setup()
+
+    def _setup(self):
+        with self.engine.begin() as connection:
+            connection.execute(text(f"""
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    timestamp TIMESTAMP NOT NULL,
+                    sensor_id TEXT,
+                    topic TEXT,
+                    value DOUBLE PRECISION,
+                    unit TEXT
+                )
+            """))
+            connection.execute(text(
+                f"SELECT create_hypertable('{self.table}', 'timestamp', "
+                "chunk_time_interval => INTERVAL '1 day', if_not_exists => TRUE)"
+            ))
+            connection.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_{self.table}_sensor_time ON {self.table} (sensor_id, timestamp DESC)"
+            ))
+
+        if self.compress_after_days:
+            try:
+                with self.engine.begin() as connection:
+                    connection.execute(text(
+                        f"ALTER TABLE {self.table} SET (timescaledb.compress, timescaledb.compress_segmentby = 'sensor_id')"
+                    ))
+                    connection.execute(text(
+                        f"SELECT add_compression_policy('{self.table}', make_interval(days => :days), if_not_exists => TRUE)"
+                    ), {"days": int(self.compress_after_days)})
+            except Exception as e:
+                logger.warning(f"Could not enable compression on {self.table}: {e}")
+
+        if self.retention_days:
+            with self.engine.begin() as connection:
+                connection.execute(text(
+                    f"SELECT add_retention_policy('{self.table}', make_interval(days => :days), if_not_exists => TRUE)"
+                ), {"days": int(self.retention_days)})
+
+    @timed("db_write_seconds", store="timeseries", op="sensor_data")
+    def write(self, topic, data):
+        """Insert one reading; errors are raised to GuardedSensorStore"""
+        row = _reading_row(topic, data)
+        with self.engine.begin() as connection:
+            connection.execute(text(
+                f"INSERT INTO {self.table} (timestamp, sensor_id, topic, value, unit) "
+                "VALUES (:timestamp, :sensor_id, :topic, :value, :unit)"
+            ), row)
+        if self.query_cache:
+            self.query_cache.invalidate("timeseries:sensor_data", row["timestamp"])
+        return True
+
+    def get_stats(self, start, end):
+        def load():
+            with self.engine.connect() as connection:
+                rows = connection.execute(text(f"""
+                    SELECT sensor_id, unit, COUNT(*) AS count, AVG(value) AS avg_value,
+                           MIN(value) AS min_value, MAX(value) AS max_value
+                    FROM {self.table}
+                    WHERE timestamp >= :start AND timestamp < :end
+                    GROUP BY sensor_id, unit
+                """), {"start": start, "end": end})
+                return [dict(row._mapping) for row in rows]
+
+        if not self.query_cache:
+            return load()
+        key = QueryCache.make_key("timeseries", "sensor_stats", {"start": start, "end": end})
+        return self.query_cache.get_or_load(key, load, ["timeseries:sensor_data"], window=(start, end))
+
+    def apply_retention(self):
+        # The retention policy runs inside TimescaleDB
+        return 0
+
+    def close(self):
+        # The engine may be DatabaseManager's; only dispose one created for this store
+        if self.owns_engine:
+            self.engine.dispose()
+
+def _has_timescaledb(engine):
+    if engine.dialect.name != "postgresql":
+        return False
+    try:
+        with engine.connect() as connection:
+            return connection.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'timescaledb'")).first() is not None
+    except Exception as e:
+        logger.warning(f"Could not check for TimescaleDB: {e}")
+        return False
+
+class GuardedSensorStore:
+    """A partitioned or TimescaleDB store built on first use, behind a circuit breaker
+
+    backend is the connection_health.Backend whose client is the engine:
+    DatabaseManager's SQL backend, or one of its own for a separate
+    database. While it is unavailable writes are skipped instead of waiting
+    on timeouts, and the process starts without the database.
+    """
+
+    def __init__(self, backend, build, owns_engine=False):
+        self.backend = backend
+        self.owns_engine = owns_engine
+        self.store = None
+        self._build = build
+        self._lock = threading.Lock()
+        self._skipped = REGISTRY.counter("db_writes_skipped_total", store="timeseries")
+
+    @property
+    def name(self):
+        return self.store.name if self.store is not None else "partitioned"
+
+    def _get(self):
+        engine = self.backend.get()
+        if engine is None:
+            return None
+        if self.store is None:
+            with self._lock:
+                if self.store is None:
+                    try:
+                        self.store = self._build(engine)
+                    except Exception as e:
+                        self.backend.failed(e)
+                        logger.error(f"Could not set up the sensor store: {e}")
+                        return None
+                    logger.info(f"Sensor data stored with the {self.store.name} backend")
+        return self.store
+
+    def write(self, topic, data):
+        store = self._get()
+        if store is None:
+            self._skipped.inc()
+            return False
+        try:
+            store.write(topic, data)
+        except Exception as e:
+            self.backend.failed(e)
+            logger.error("Error saving sensor data to the %s store: %s", store.name, e, extra={"msg_class": "db.error"})
+            return False
+        self.backend.succeeded()
+        return True
+
+    def get_stats(self, start, end):
+        store = self._get()
+        if store is None:
+            # Also when the database is reachable but setting up the store failed
+            raise BackendUnavailable(f"{self.backend.name} is unavailable")
+        try:
+            stats = store.get_stats(start, end)
+        except Exception as e:
+            self.backend.failed(e)
+            raise
+        self.backend.succeeded()
+        return stats
+
+    def apply_retention(self):
+        store = self._get()
+        return store.apply_retention() if store is not None else 0
+
+    def close(self):
+        if self.owns_engine:
+            self.backend.close()
+
+def create_sensor_store(backend, db_manager, conn_string=None, retention_days=None, compress_after_days=None):
+    """Build the sensor store selected by configuration
+
+    backend "sql" keeps the single sensor_data table. "partitioned" uses a
+    TimescaleDB hypertable when the database has the extension, and daily
+    chunk tables otherwise (e.g. SQLite), decided when the database is first
+    reached. conn_string defaults to the SQL database of db_manager.
+    """
+    if backend == "sql":
+        return SqlSensorStore(db_manager)
+    if backend != "partitioned":
+        raise ValueError(f"Unknown sensor store '{backend}', expected 'sql' or 'partitioned'")
+
+    if conn_string:
+        def connect():
+            connect_args = {}
+            if conn_string.startswith("postgresql"):
+                connect_args["connect_timeout"] = int(db_manager.connect_timeout)
+            engine = create_engine(conn_string, connect_args=connect_args)
+            try:
+                _probe(engine)
+            except Exception:
+                engine.dispose()
+                raise
+            return engine
+
+        # Same backoff settings as the stores of db_manager
+        other = next(iter(db_manager.backends.values()), None)
+        if other is None:
+            breaker = CircuitBreaker("timeseries")
+        else:
+            breaker = CircuitBreaker("timeseries", other.breaker.failure_threshold, other.breaker.base_delay, other.breaker.max_delay)
+        sql_backend = Backend("timeseries", connect, _probe, lambda engine: engine.dispose(), breaker)
+    else:
+        sql_backend = db_manager.backends.get("sql")
+        if sql_backend is None:
+            raise ValueError("The partitioned sensor store needs a SQL database")
+
+    def build(engine):
+        if _has_timescaledb(engine):
+            return TimescaleSensorStore(engine, db_manager.query_cache, retention_days, compress_after_days)
+        return PartitionedSensorStore(engine, db_manager.query_cache, retention_days)
+
+    return GuardedSensorStore(sql_backend, build, owns_engine=bool(conn_string))
+
+def _probe(engine):
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
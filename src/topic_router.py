@@ -0,0 +1,203 @@
+import importlib
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Returned by a handler to stop later handlers from seeing the message
+STOP = object()
+
+class Route:
+    """A handler registered for an MQTT topic pattern
+
+    Single handlers are called as handler(topic, data). Batch handlers are
+    called as handler(messages) with a list of (topic, data) pairs, once
+    batch_size messages are queued or the oldest has waited max_delay seconds
+    (or on TopicRouter.flush()). Routes run in priority order (lower first);
+    fallback routes only run when no other route matches the topic.
+    """
+
+    def __init__(self, pattern, handler, name=None, batch=False, batch_size=100, max_delay=1.0,
+                 priority=100, fallback=False, order=0):
+        self.pattern = pattern
+        self.handler = handler
+        self.name = name or getattr(handler, "__name__", repr(handler))
+        self.batch = batch
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.priority = priority
+        self.fallback = fallback
+        self.order = order
+
+        self._pending = []
+        self._oldest = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<Route({self.pattern} -> {self.name})>"
+
+    def queue(self, topic, data):
+        """Add a message to the batch; returns the batch if it is due"""
+        with self._lock:
+            self._pending.append((topic, data))
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            if len(self._pending) < self.batch_size and time.monotonic() - self._oldest < self.max_delay:
+                return None
+            return self._take()
+
+    def take(self):
+        with self._lock:
+            return self._take()
+
+    def _take(self):
+        batch, self._pending, self._oldest = self._pending, [], None
+        return batch
+
+class _Node:
+    __slots__ = ("children", "routes", "multi")
+
+    def __init__(self):
+        # Topic level (or "+") -> child node
+        self.children = {}
+        # Routes whose pattern ends at this node
+        self.routes = []
+        # Routes whose pattern ends with "#" after this node
+        self.multi = []
+
+def validate_pattern(pattern):
+    levels = pattern.split("/")
+    for index, level in enumerate(levels):
+        if "#" in level and (level != "#" or index != len(levels) - 1):
+            raise ValueError(f"Invalid topic pattern '{pattern}': '#' must be the whole last level")
+        if "+" in level and level != "+":
+            raise ValueError(f"Invalid topic pattern '{pattern}': '+' must be a whole level")
+    return levels
+
+class TopicRouter:
+    """Dispatch MQTT messages to handlers registered for topic patterns
+
+    Patterns use MQTT wildcards ("+" for one level, "#" for the rest) and are
+    compiled into a trie. The routes matching a topic are looked up once and
+    cached, so dispatching costs one dict lookup however many routes exist.
+    """
+
+    def __init__(self, cache_size=4096):
+        self.cache_size = cache_size
+        self.routes = []
+        self._root = _Node()
+        self._cache = {}
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+
+    def add(self, pattern, handler, **options):
+        """Register handler for pattern; options are those of Route"""
+        levels = validate_pattern(pattern)
+        route = Route(pattern, handler, order=next(self._order), **options)
+
+        with self._lock:
+            node = self._root
+            for level in levels:
+                if level == "#":
+                    node.multi.append(route)
+                    break
+                node = node.children.setdefault(level, _Node())
+            else:
+                node.routes.append(route)
+            self.routes.append(route)
+            self._cache = {}
+
+        logger.debug(f"Registered route {route}")
+        return route
+
+    def route(self, pattern, **options):
+        """Decorator form of add()"""
+        def decorator(handler):
+            self.add(pattern, handler, **options)
+            return handler
+        return decorator
+
+    def load_plugins(self, modules, *args):
+        """Import each module and call its register_routes(router, *args)"""
+        for module_name in modules:
+            module = importlib.import_module(module_name)
+            module.register_routes(self, *args)
+            logger.info(f"Loaded route plugin {module_name}")
+
+    def match(self, topic):
+        """Routes for a topic, in the order they run"""
+        routes = self._cache.get(topic)
+        if routes is None:
+            routes = self._match(topic)
+            cache = self._cache
+            if len(cache) >= self.cache_size:
+                # Topics are few in practice; start over rather than track recency
+                cache = self._cache = {}
+            cache[topic] = routes
+        return routes
+
+    def _match(self, topic):
+        levels = topic.split("/")
+        found = []
+        nodes = [self._root]
+        for index, level in enumerate(levels):
+            next_nodes = []
+            for node in nodes:
+                found.extend(node.multi)
+                child = node.children.get(level)
+                if child is not None:
+                    next_nodes.append(child)
+                # Wildcards at the first level do not match $SYS-style topics
+                if not (index == 0 and level.startswith("$")):
+                    child = node.children.get("+")
+                    if child is not None:
+                        next_nodes.append(child)
+            nodes = next_nodes
+        for node in nodes:
+            # "a/#" also matches "a"
+            found.extend(node.multi)
+            found.extend(node.routes)
+
+        routes = [route for route in found if not route.fallback] or [route for route in found if route.fallback]
+        routes.sort(key=lambda route: (route.priority, route.order))
+        return tuple(routes)
+
+    def dispatch(self, topic, data):
+        """Run the routes of one message; returns False if no route matched"""
+        routes = self.match(topic)
+        for route in routes:
+            if route.batch:
+                batch = route.queue(topic, data)
+                if batch:
+                    self._run_batch(route, batch)
+            elif route.handler(topic, data) is STOP:
+                break
+        return bool(routes)
+
+    def dispatch_many(self, messages):
+        """Run the routes of several (topic, data) messages; batch routes get them in one call"""
+        batches = {}
+        for topic, data in messages:
+            for route in self.match(topic):
+                if route.batch:
+                    batches.setdefault(route, []).append((topic, data))
+                elif route.handler(topic, data) is STOP:
+                    break
+        for route, batch in batches.items():
+            self._run_batch(route, route.take() + batch)
+
+    def flush(self):
+        """Hand every queued batch to its handler"""
+        for route in self.routes:
+            if route.batch:
+                batch = route.take()
+                if batch:
+                    self._run_batch(route, batch)
+
+    def _run_batch(self, route, batch):
+        try:
+            route.handler(batch)
+        except Exception as e:
+            logger.error(f"Error in batch handler {route.name} ({len(batch)} messages): {e}")
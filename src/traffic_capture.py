@@ -0,0 +1,87 @@
+import gzip
+import logging
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Record header: receive time (float seconds), topic length, payload length
+_HEADER = struct.Struct(">dHI")
+
+class TrafficRecorder:
+    """Append received MQTT messages to a gzip-compressed, length-prefixed log
+
+    Each record is a fixed header followed by the raw topic and payload bytes,
+    so payloads are stored exactly as received and reading needs no parsing.
+    Reopening an existing file appends a new gzip member, which gzip readers
+    handle transparently.
+    """
+
+    def __init__(self, path, compresslevel=1):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            Path(directory).mkdir(parents=True, exist_ok=True)
+        # Level 1 keeps compression cheap enough for the message callback
+        self._file = gzip.open(path, "ab", compresslevel=compresslevel)
+        self._lock = threading.Lock()
+        self.records = 0
+        logger.info(f"Capturing MQTT traffic to {path}")
+
+    def record(self, topic, payload, timestamp=None):
+        if isinstance(topic, str):
+            topic = topic.encode("utf-8")
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        header = _HEADER.pack(time.time() if timestamp is None else timestamp, len(topic), len(payload))
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(header + topic + payload)
+            self.records += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                logger.info(f"Captured {self.records} messages to {self.path}")
+
+def read_capture(path):
+    """Yield (timestamp, topic, payload) records from a capture file
+
+    A truncated final record (e.g. the process was killed while capturing) ends
+    the iteration instead of raising.
+    """
+    with gzip.open(path, "rb") as f:
+        while True:
+            try:
+                header = f.read(_HEADER.size)
+            except EOFError:
+                logger.warning(f"Capture file {path} ends with an incomplete gzip stream")
+                return
+            if len(header) < _HEADER.size:
+                return
+            timestamp, topic_length, payload_length = _HEADER.unpack(header)
+            try:
+                body = f.read(topic_length + payload_length)
+            except EOFError:
+                body = b""
+            if len(body) < topic_length + payload_length:
+                logger.warning(f"Capture file {path} ends with a truncated record")
+                return
+            yield timestamp, body[:topic_length].decode("utf-8"), body[topic_length:]
+
+class CapturedMessage:
+    """Message object with the attributes DataProcessor.on_mqtt_message reads"""
+
+    __slots__ = ("topic", "payload", "qos", "retain")
+
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+        self.qos = 0
+        self.retain = False
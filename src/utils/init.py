@@ -1,12 +1,65 @@
 #!/usr/bin/env python3
 
 import os
+import json
 import logging
-import nltk
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# NLTK packages and the resource path nltk.data.find() looks for
+NLTK_DATA = {
+    "punkt": "tokenizers/punkt",
+    "averaged_perceptron_tagger": "taggers/averaged_perceptron_tagger",
+    "maxent_ne_chunker": "chunkers/maxent_ne_chunker",
+    "words": "corpora/words",
+    "stopwords": "corpora/stopwords",
+    "vader_lexicon": "sentiment/vader_lexicon.zip"
+}
+
+# Packages already found or downloaded; lets restarts skip importing nltk at all
+NLTK_MARKER_FILE = "data/.nltk_data_ready"
+
+def ensure_nltk_data(packages=NLTK_DATA, marker_file=NLTK_MARKER_FILE):
+    """Download missing NLTK data, checking the marker file before touching nltk"""
+    try:
+        with open(marker_file) as f:
+            ready = set(json.load(f))
+    except (OSError, ValueError):
+        ready = set()
+    
+    missing = [name for name in packages if name not in ready]
+    if not missing:
+        logger.debug("NLTK data already available")
+        return True
+    
+    import nltk
+    
+    for name in missing:
+        try:
+            nltk.data.find(packages[name])
+            ready.add(name)
+            continue
+        except LookupError:
+            pass
+        try:
+            if nltk.download(name, quiet=True):
+                ready.add(name)
+                logger.info(f"Downloaded NLTK data: {name}")
+            else:
+                logger.warning(f"Could not download NLTK data {name}")
+        except Exception as e:
+            logger.warning(f"Could not download NLTK data {name}: {e}")
+    
+    try:
+        Path(marker_file).parent.mkdir(parents=True, exist_ok=True)
+        with open(marker_file, "w") as f:
+            json.dump(sorted(ready), f)
+    except OSError as e:
+        logger.warning(f"Could not write NLTK marker file {marker_file}: {e}")
+    
+    return len(ready) == len(packages)
+
 def initialize_project():
     """Initialize required project settings."""
     try:
@@ -24,22 +77,8 @@ def initialize_project():
             Path(directory).mkdir(parents=True, exist_ok=True)
             logger.info(f"Created directory: {directory}")
         
-        # NLTK verilerini indir
-        nltk_data = [
-            "punkt",
-            "averaged_perceptron_tagger",
-            "maxent_ne_chunker",
-            "words",
-            "stopwords",
-            "vader_lexicon"
-        ]
-        
-        for data in nltk_data:
-            try:
-                nltk.download(data, quiet=True)
-                logger.info(f"Downloaded NLTK data: {data}")
-            except Exception as e:
-                logger.warning(f"Could not download NLTK data {data}: {e}")
+        # NLTK verilerini indir (only what is missing; checks are cached across restarts)
+        ensure_nltk_data()
         
         # Çevre değişkenlerini kontrol et
         required_env_vars = [
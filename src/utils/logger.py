@@ -1,56 +1,224 @@
+import atexit
+import json
 import logging
 import os
+import queue
+import random
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 
-def setup_logger(name, log_level=logging.INFO, log_file=None):
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+# Queue listeners started by setup_logger, stopped at exit
+_listeners = {}
+
+class JsonFormatter(logging.Formatter):
+    """Format log records as one JSON object per line, including `extra` fields"""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of the records of each message class
+
+    Records are classified by the `msg_class` extra field, e.g.
+    logger.debug("...", extra={"msg_class": "mqtt.receive"}). Records without a
+    class, or with a class that has no rate, always pass.
+    """
+
+    def __init__(self, sample_rates):
+        super().__init__()
+        self.sample_rates = dict(sample_rates)
+
+    def filter(self, record):
+        # The same record can reach several handlers; decide only once
+        decision = getattr(record, "_sampled", None)
+        if decision is None:
+            rate = self.sample_rates.get(getattr(record, "msg_class", None))
+            decision = rate is None or random.random() < rate
+            record._sampled = decision
+        return decision
+
+class RateLimitFilter(logging.Filter):
+    """Allow at most N records per second for each message class"""
+
+    def __init__(self, rate_limits):
+        super().__init__()
+        self.rate_limits = dict(rate_limits)
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        decision = getattr(record, "_rate_limited", None)
+        if decision is not None:
+            return decision
+
+        msg_class = getattr(record, "msg_class", None)
+        limit = self.rate_limits.get(msg_class)
+        if limit is None:
+            decision = True
+        else:
+            now = time.monotonic()
+            with self._lock:
+                tokens, updated_at = self._buckets.get(msg_class, (limit, now))
+                tokens = min(limit, tokens + (now - updated_at) * limit)
+                decision = tokens >= 1
+                self._buckets[msg_class] = (tokens - 1 if decision else tokens, now)
+
+        record._rate_limited = decision
+        return decision
+
+# Log arguments of these types are immutable and safe to format on another thread
+_PLAIN_TYPES = (str, int, float, bool, type(None), bytes)
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread when it is safe
+
+    The stock QueueHandler formats the message in the logging thread before
+    enqueueing it; here records whose arguments are all plain values are
+    passed through untouched, so the calling thread only pays for creating
+    the record. Any other argument (an ORM object, a dict that is still
+    being changed) may not be safe to read from another thread, so those
+    messages are formatted here.
+    """
+
+    def prepare(self, record):
+        args = record.args
+        if args:
+            values = args.values() if isinstance(args, dict) else args
+            if not all(isinstance(value, _PLAIN_TYPES) for value in values):
+                record.msg = record.getMessage()
+                record.args = None
+        return record
+
+def parse_log_rates(value):
+    """Parse 'msg_class=number,msg_class=number' into a dict"""
+    rates = {}
+    for item in (value or "").split(","):
+        name, _, number = item.partition("=")
+        if name.strip() and number.strip():
+            rates[name.strip()] = float(number)
+    return rates
+
+def setup_logger(name=None, log_level=logging.INFO, log_file=None, async_mode=False,
+                 json_format=False, sample_rates=None, rate_limits=None):
     """
     Helper function to create logging configuration
-    
+
     Args:
-        name (str): Logger name
+        name (str, optional): Logger name. The root logger if not specified.
         log_level (int): Log level
         log_file (str, optional): Log file path. If not specified, logs only to console.
-    
+        async_mode (bool): Write logs from a background thread via QueueHandler/QueueListener
+        json_format (bool): Write one JSON object per line instead of plain text
+        sample_rates (dict, optional): Fraction of records to keep per msg_class
+        rate_limits (dict, optional): Maximum records per second per msg_class
+
     Returns:
         logging.Logger: Configured logger
     """
     # Create logger
     logger = logging.getLogger(name)
     logger.setLevel(log_level)
-    
+
+    # Remove handlers from an earlier call so reconfiguring does not duplicate output
+    for handler in [h for h in logger.handlers if getattr(h, "_setup_logger", False)]:
+        logger.removeHandler(handler)
+        handler.close()
+    listener = _listeners.pop(name, None)
+    if listener:
+        listener.stop()
+
     # Create formatter
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    
+    if json_format:
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
     # Add console handler
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
+    handlers = [console_handler]
+
     # If log file is specified, add file handler
     if log_file:
         # Create log directory
         log_dir = os.path.dirname(log_file)
-        Path(log_dir).mkdir(parents=True, exist_ok=True)
-        
+        if log_dir:
+            Path(log_dir).mkdir(parents=True, exist_ok=True)
+
         # Dosya handler'ı ekle
         file_handler = logging.FileHandler(log_file)
         file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
-    
+        handlers.append(file_handler)
+
+    filters = []
+    if sample_rates:
+        filters.append(SamplingFilter(sample_rates))
+    if rate_limits:
+        filters.append(RateLimitFilter(rate_limits))
+
+    if async_mode:
+        # Filtered records never reach the queue; formatting and I/O happen on the listener thread
+        log_queue = queue.SimpleQueue()
+        queue_handler = DeferredQueueHandler(log_queue)
+        front_handlers = [queue_handler]
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        _listeners[name] = listener
+    else:
+        front_handlers = handlers
+
+    for handler in front_handlers:
+        for log_filter in filters:
+            handler.addFilter(log_filter)
+        handler._setup_logger = True
+        logger.addHandler(handler)
+
     return logger
 
+def shutdown_logging():
+    """Flush and stop background log listeners"""
+    while _listeners:
+        _, listener = _listeners.popitem()
+        listener.stop()
+
+atexit.register(shutdown_logging)
+
 # Usage example
 if __name__ == "__main__":
     # Create main logger
     main_logger = setup_logger("mqtt_social_bigdata", log_file="logs/app.log")
-    
+
     # Create loggers for submodules
     mqtt_logger = setup_logger("mqtt_social_bigdata.mqtt", log_file="logs/mqtt.log")
     db_logger = setup_logger("mqtt_social_bigdata.database", log_file="logs/database.log")
     social_logger = setup_logger("mqtt_social_bigdata.social", log_file="logs/social.log")
-    
+
     # Test log messages
     main_logger.info("Main application started")
     mqtt_logger.info("MQTT connection established")
     db_logger.error("Database connection error")
     social_logger.warning("Approaching API limits")
+
+    # Asynchronous, structured and sampled logging for the hot path
+    hot_logger = setup_logger("mqtt_social_bigdata.hot", log_level=logging.DEBUG, async_mode=True,
+                              json_format=True, sample_rates={"mqtt.receive": 0.1})
+    hot_logger.propagate = False
+    for i in range(20):
+        hot_logger.debug("Received message %d", i, extra={"msg_class": "mqtt.receive"})
+    shutdown_logging()
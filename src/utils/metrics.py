@@ -0,0 +1,277 @@
+import functools
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter_ns
+
+logger = logging.getLogger(__name__)
+
+# Log-linear buckets: 8 sub-buckets per power of two (~12.5% relative error)
+_SUB_BUCKET_BITS = 3
+_SUB_BUCKETS = 1 << _SUB_BUCKET_BITS
+# Enough buckets for observations up to 2^40 ns (~18 minutes)
+_BUCKET_COUNT = (40 - _SUB_BUCKET_BITS + 1) * _SUB_BUCKETS
+
+# Bucket boundaries (seconds) used for the Prometheus exposition
+EXPORT_BUCKETS = (
+    0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005,
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+def _bucket_bounds(index):
+    """Return the [lower, upper) nanosecond range of a histogram bucket"""
+    if index < 2 * _SUB_BUCKETS:
+        return index, index + 1
+    shift = index // _SUB_BUCKETS - 1
+    mantissa = index % _SUB_BUCKETS + _SUB_BUCKETS
+    return mantissa << shift, (mantissa + 1) << shift
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + list(extra or [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in items) + "}"
+
+class Counter:
+    """Monotonic counter"""
+
+    def __init__(self, name, labels=()):
+        self.name = name
+        self.labels = labels
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+class Gauge:
+    """Value that can go up and down, or be read from a callback at scrape time"""
+
+    def __init__(self, name, labels=(), callback=None):
+        self.name = name
+        self.labels = labels
+        self.callback = callback
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def get(self):
+        return self.callback() if self.callback else self.value
+
+class Histogram:
+    """HDR-style latency histogram with log-linear nanosecond buckets
+
+    observe_ns() does a handful of integer operations and no locking, so it
+    stays well under a microsecond. Concurrent observations from several
+    threads can very rarely lose an increment, which is acceptable for
+    monitoring.
+    """
+
+    def __init__(self, name, labels=()):
+        self.name = name
+        self.labels = labels
+        self.counts = [0] * _BUCKET_COUNT
+        self.count = 0
+        self.sum_ns = 0
+
+    def observe_ns(self, value):
+        if value < 2 * _SUB_BUCKETS:
+            index = value if value > 0 else 0
+        else:
+            shift = value.bit_length() - _SUB_BUCKET_BITS - 1
+            index = (shift + 1) * _SUB_BUCKETS + (value >> shift) - _SUB_BUCKETS
+            if index >= _BUCKET_COUNT:
+                index = _BUCKET_COUNT - 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum_ns += value
+
+    def observe(self, seconds):
+        self.observe_ns(int(seconds * 1e9))
+
+    def quantile(self, q):
+        """Approximate quantile in seconds (upper bound of the matching bucket)"""
+        counts = list(self.counts)
+        total = sum(counts)
+        if total == 0:
+            return 0.0
+        target = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= target and count:
+                return _bucket_bounds(index)[1] / 1e9
+        return _bucket_bounds(len(counts) - 1)[1] / 1e9
+
+    def cumulative(self, boundaries=EXPORT_BUCKETS):
+        """Cumulative counts for the given upper bounds (seconds)"""
+        counts = list(self.counts)
+        result = []
+        index = 0
+        seen = 0
+        for boundary in boundaries:
+            limit_ns = boundary * 1e9
+            while index < len(counts) and _bucket_bounds(index)[1] <= limit_ns:
+                seen += counts[index]
+                index += 1
+            result.append(seen)
+        return result
+
+class MetricsRegistry:
+    """Named collection of counters, gauges and histograms"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, labels):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    metric = cls(name, key[1])
+                    self._metrics[key] = metric
+        return metric
+
+    def counter(self, name, **labels):
+        return self._get(Counter, name, labels)
+
+    def gauge(self, name, callback=None, **labels):
+        gauge = self._get(Gauge, name, labels)
+        if callback is not None:
+            gauge.callback = callback
+        return gauge
+
+    def histogram(self, name, **labels):
+        return self._get(Histogram, name, labels)
+
+    def snapshot(self):
+        """Return metric values as a plain dict (histograms as count/p50/p99)"""
+        result = {}
+        for (name, labels), metric in list(self._metrics.items()):
+            key = name + _format_labels(labels)
+            if isinstance(metric, Histogram):
+                result[key] = {
+                    "count": metric.count,
+                    "p50": metric.quantile(0.5),
+                    "p99": metric.quantile(0.99)
+                }
+            elif isinstance(metric, Gauge):
+                result[key] = metric.get()
+            else:
+                result[key] = metric.value
+        return result
+
+    def render_prometheus(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        by_name = {}
+        for (name, labels), metric in list(self._metrics.items()):
+            by_name.setdefault(name, []).append(metric)
+
+        lines = []
+        for name in sorted(by_name):
+            metrics = by_name[name]
+            if isinstance(metrics[0], Histogram):
+                lines.append(f"# TYPE {name} histogram")
+                for metric in metrics:
+                    for boundary, count in zip(EXPORT_BUCKETS, metric.cumulative()):
+                        lines.append(f"{name}_bucket{_format_labels(metric.labels, [('le', repr(boundary))])} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(metric.labels, [('le', '+Inf')])} {metric.count}")
+                    lines.append(f"{name}_sum{_format_labels(metric.labels)} {metric.sum_ns / 1e9}")
+                    lines.append(f"{name}_count{_format_labels(metric.labels)} {metric.count}")
+            elif isinstance(metrics[0], Gauge):
+                lines.append(f"# TYPE {name} gauge")
+                for metric in metrics:
+                    try:
+                        value = metric.get()
+                    except Exception as e:
+                        logger.warning(f"Could not read gauge {name}: {e}")
+                        continue
+                    lines.append(f"{name}{_format_labels(metric.labels)} {value}")
+            else:
+                lines.append(f"# TYPE {name} counter")
+                for metric in metrics:
+                    lines.append(f"{name}{_format_labels(metric.labels)} {metric.value}")
+        return "\n".join(lines) + "\n"
+
+# Process-wide registry used by the timed() decorator
+REGISTRY = MetricsRegistry()
+
+def timed(name, registry=REGISTRY, **labels):
+    """Decorator recording the call latency of a function in a histogram"""
+    histogram = registry.histogram(name, **labels)
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe_ns(perf_counter_ns() - start)
+        return wrapper
+    return decorator
+
+class MetricsServer:
+    """Serves the registry at /metrics from a background thread"""
+
+    def __init__(self, host="127.0.0.1", port=9108, registry=REGISTRY):
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self._server = None
+
+    def start(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Scrapes are not worth a log line each
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            logger.error(f"Could not start metrics server on {self.host}:{self.port}: {e}")
+            return False
+
+        thread = threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True)
+        thread.start()
+        logger.info(f"Metrics available at http://{self.host}:{self.port}/metrics")
+        return True
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+# Usage example
+if __name__ == "__main__":
+    import timeit
+
+    histogram = REGISTRY.histogram("example_seconds")
+    per_call = timeit.timeit(lambda: histogram.observe_ns(123456), number=1000000) / 1000000
+    print(f"observe_ns: {per_call * 1e9:.0f} ns per observation")
+    print(f"p50: {histogram.quantile(0.5) * 1e6:.1f} us")
+    print(REGISTRY.render_prometheus())
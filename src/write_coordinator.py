@@ -0,0 +1,242 @@
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from src.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+GROUP_SECONDS = REGISTRY.histogram("store_write_group_seconds")
+
+# The SQL session and the SQLite writer lock allow one writer at a time; the
+# MongoDB and Neo4j drivers are thread-safe and pool their connections
+DEFAULT_WORKERS = {"sql": 1, "mongo": 4, "neo4j": 4}
+
+class WriteGroup:
+    """The store writes of one message or batch
+
+    Complete once every write submitted to it has finished; results maps each
+    store to True if all of its writes succeeded.
+    """
+
+    __slots__ = ("on_complete", "results", "started", "_remaining", "_lock")
+
+    def __init__(self, on_complete=None):
+        self.on_complete = on_complete
+        self.results = {}
+        self.started = time.perf_counter_ns()
+        # The submitter holds one reference until the group is sealed
+        self._remaining = 1
+        self._lock = threading.Lock()
+
+    def _add(self):
+        with self._lock:
+            self._remaining += 1
+
+    def _finish(self, store, ok):
+        with self._lock:
+            self.results[store] = self.results.get(store, True) and ok
+            self._remaining -= 1
+            complete = self._remaining == 0
+        if complete:
+            self._complete()
+
+    def seal(self):
+        """No more writes will be added; runs on_complete if they already finished"""
+        with self._lock:
+            self._remaining -= 1
+            complete = self._remaining == 0
+        if complete:
+            self._complete()
+
+    def _complete(self):
+        if not self.results:
+            # Nothing was written (e.g. a message whose handlers store nothing)
+            return
+        GROUP_SECONDS.observe_ns(time.perf_counter_ns() - self.started)
+        if self.on_complete is not None:
+            try:
+                self.on_complete(self.results)
+            except Exception as e:
+                logger.error(f"Error in write completion callback: {e}")
+
+class WriteCoordinator:
+    """Runs the writes of a message to different stores concurrently
+
+    Each store has its own worker threads, so a message's MongoDB insert, SQL
+    insert and Neo4j merges overlap and the message is stored after the
+    slowest store rather than after all of them in turn. Each worker runs its
+    writes in submission order; writes given the same key (e.g. a document id
+    or a user id) always go to the same worker, so they keep their order even
+    when the store has several workers. Writes without a key are spread over
+    the workers in turn.
+
+    A write fails if it raises or returns False; failures are logged and
+    counted per store and never affect the other stores. At most max_pending
+    writes are queued or running; submit() waits for room beyond that, which
+    slows the MQTT loop down to the pace of the stores. With concurrent=False
+    writes run inline, in submission order.
+
+    Writes that are buffered and written in batches (social posts) go
+    through submit_deferred(), so their message is only complete once the
+    batch holding them has been written.
+    """
+
+    def __init__(self, workers=None, max_pending=10000, concurrent=True):
+        self.workers = dict(DEFAULT_WORKERS if workers is None else workers)
+        self.max_pending = max_pending
+        self.concurrent = concurrent
+
+        # store -> one single-threaded executor per worker
+        self._executors = {}
+        self._turns = {}
+        self._counters = {}
+        self._pending = 0
+        self._condition = threading.Condition()
+        self._local = threading.local()
+        self._closed = False
+        REGISTRY.gauge("store_writes_pending", callback=lambda: self._pending)
+
+    @contextmanager
+    def group(self, on_complete=None):
+        """Collect the writes submitted by this thread inside the block into one WriteGroup
+
+        on_complete(results) runs once all of them have finished, on the
+        thread that finished last.
+        """
+        group = WriteGroup(on_complete)
+        previous = getattr(self._local, "group", None)
+        self._local.group = group
+        try:
+            yield group
+        finally:
+            self._local.group = previous
+            group.seal()
+
+    def submit(self, store, func, *args, key=None, **kwargs):
+        """Run func(*args, **kwargs) on the store's executor as part of the current group
+
+        Writes with the same key run one after another, in submission order.
+        """
+        group = getattr(self._local, "group", None)
+        single = group is None
+        if single:
+            group = WriteGroup()
+        self._submit(group, store, func, args, kwargs, key=key)
+        if single:
+            group.seal()
+        return group
+
+    def submit_deferred(self, store, func, *args, key=None):
+        """Like submit(), for writes that func only queues and that are written later
+
+        func is called as func(*args, on_written) and must eventually call
+        on_written(ok) once, when the write succeeded or failed; if it
+        raises or returns False the write is failed right away. The group is
+        complete only after on_written, so a store acknowledges what it
+        wrote rather than what it queued.
+        """
+        group = getattr(self._local, "group", None)
+        single = group is None
+        if single:
+            group = WriteGroup()
+        # Held for the write itself; the queueing call below holds its own
+        group._add()
+        done = []
+
+        def on_written(ok):
+            if not done:
+                done.append(ok)
+                self._counter(store, ok).inc()
+                group._finish(store, ok)
+
+        def queue():
+            try:
+                queued = func(*args, on_written) is not False
+            except Exception:
+                on_written(False)
+                raise
+            if not queued:
+                on_written(False)
+            return queued
+
+        self._submit(group, store, queue, (), {}, key=key, count=False)
+        if single:
+            group.seal()
+        return group
+
+    def _submit(self, group, store, func, args, kwargs, key=None, count=True):
+        group._add()
+        if not self.concurrent or self._closed:
+            self._run(group, store, func, args, kwargs, pending=False, count=count)
+        else:
+            with self._condition:
+                while self._pending >= self.max_pending:
+                    self._condition.wait()
+                self._pending += 1
+            self._executor(store, key).submit(self._run, group, store, func, args, kwargs, count=count)
+
+    def _executor(self, store, key=None):
+        executors = self._executors.get(store)
+        if executors is None:
+            with self._condition:
+                executors = self._executors.get(store)
+                if executors is None:
+                    executors = [
+                        ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"write-{store}-{index}")
+                        for index in range(max(self.workers.get(store, 1), 1))
+                    ]
+                    self._turns[store] = itertools.count()
+                    self._executors[store] = executors
+        if len(executors) == 1:
+            return executors[0]
+        index = next(self._turns[store]) if key is None else hash(key)
+        return executors[index % len(executors)]
+
+    def _run(self, group, store, func, args, kwargs, pending=True, count=True):
+        try:
+            ok = func(*args, **kwargs) is not False
+        except Exception as e:
+            logger.error("Error writing to %s: %s", store, e, extra={"msg_class": "db.error"})
+            ok = False
+        finally:
+            if pending:
+                with self._condition:
+                    self._pending -= 1
+                    self._condition.notify_all()
+
+        if count:
+            self._counter(store, ok).inc()
+        group._finish(store, ok)
+
+    def _counter(self, store, ok):
+        key = (store, ok)
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters[key] = REGISTRY.counter(
+                "store_writes_total", store=store, result="ok" if ok else "failed"
+            )
+        return counter
+
+    def wait(self, timeout=None):
+        """Wait until every submitted write has finished; returns False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def close(self):
+        """Finish pending writes and stop the executors; later writes run inline"""
+        self.wait()
+        self._closed = True
+        for executors in self._executors.values():
+            for executor in executors:
+                executor.shutdown(wait=True)
+        self._executors = {}
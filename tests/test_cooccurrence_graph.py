@@ -0,0 +1,62 @@
+from src.cooccurrence_graph import CooccurrenceGraph
+from src.dashboard_api import Dashboard
+
+def test_related_hashtags_follow_incremental_updates():
+    graph = CooccurrenceGraph()
+    graph.add_message("alice", ["#IoT", "MQTT"])
+    assert graph.related_hashtags("iot") == [{"hashtag": "mqtt", "weight": 1}]
+
+    graph.add_message("bob", ["iot", "#BigData"])
+    graph.add_message("alice", ["IoT", "bigdata", "Python"])
+    assert graph.related_hashtags("#IoT") == [
+        {"hashtag": "bigdata", "weight": 2},
+        {"hashtag": "mqtt", "weight": 1},
+        {"hashtag": "python", "weight": 1}
+    ]
+    assert graph.top_users_for_hashtag("iot") == [{"user_id": "alice", "weight": 2}, {"user_id": "bob", "weight": 1}]
+
+def test_community_grows_as_edges_reach_min_weight():
+    graph = CooccurrenceGraph()
+    graph.add_message("alice", ["iot", "mqtt"])
+    graph.add_message("bob", ["mqtt", "broker"])
+    assert graph.community("iot") == {"hashtags": [{"hashtag": "iot", "distance": 0}], "users": [{"user_id": "alice", "weight": 1}]}
+
+    graph.add_message("carol", ["iot", "mqtt"])
+    graph.add_message("bob", ["mqtt", "broker"])
+    community = graph.community("iot")
+    assert community["hashtags"] == [
+        {"hashtag": "iot", "distance": 0},
+        {"hashtag": "mqtt", "distance": 1},
+        {"hashtag": "broker", "distance": 2}
+    ]
+    assert {user["user_id"] for user in community["users"]} == {"alice", "bob", "carol"}
+
+def test_pending_edges_hold_only_the_changes_since_the_last_sync():
+    graph = CooccurrenceGraph()
+    graph.add_message("alice", ["iot", "mqtt"])
+    hashtag_edges, user_edges = graph.take_pending_edges()
+    assert hashtag_edges == [{"source": "iot", "target": "mqtt", "weight": 1}]
+    assert len(user_edges) == 2
+
+    graph.add_message(None, ["mqtt", "iot"])
+    assert graph.take_pending_edges() == ([{"source": "iot", "target": "mqtt", "weight": 1}], [])
+    # The in-memory graph keeps the totals
+    assert graph.related_hashtags("iot") == [{"hashtag": "mqtt", "weight": 2}]
+
+def test_evicted_hashtags_leave_their_neighbours():
+    graph = CooccurrenceGraph(max_hashtags=2)
+    graph.add_message("alice", ["iot", "mqtt"])
+    graph.add_message("alice", ["mqtt", "python"])
+    assert graph.related_hashtags("mqtt") == [{"hashtag": "python", "weight": 1}]
+    assert graph.related_hashtags("iot") == []
+
+def test_dashboard_trends_list_related_hashtags():
+    graph = CooccurrenceGraph()
+    dashboard = Dashboard(related_hashtags=graph.related_hashtags)
+    for hashtags in (["iot", "mqtt"], ["iot", "python"], ["iot", "mqtt"]):
+        graph.add_message("alice", hashtags)
+        dashboard.record_post("social/twitter", {"hashtags": hashtags})
+
+    top = dashboard._build_trends()["hashtags"][0]
+    assert top["tag"] == "iot"
+    assert top["related"] == [{"hashtag": "mqtt", "weight": 2}, {"hashtag": "python", "weight": 1}]
@@ -0,0 +1,145 @@
+import datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from src.database_manager import Base
+from src.post_writer import SocialPostWriter, post_content
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/posts.db")
+    yield engine
+    engine.dispose()
+
+def make_writer(engine, **kwargs):
+    Base.metadata.create_all(engine)
+    writer = SocialPostWriter(engine, **kwargs)
+    writer.setup()
+    return writer
+
+def post(index, platform="twitter", **fields):
+    data = {
+        "id": f"{platform}_{index}",
+        "user_id": f"user_{index}",
+        "content": f"post {index}",
+        "created_at": datetime.datetime(2024, 1, 1, 12, 0).isoformat(),
+        "sentiment": 0.5
+    }
+    data.update(fields)
+    return platform, data
+
+def rows(engine):
+    with engine.connect() as connection:
+        return connection.execute(text(
+            "SELECT p.post_id, p.platform, p.content, p.content_compressed, s.name AS platform_name, r.name AS subreddit "
+            "FROM social_media_posts p "
+            "LEFT JOIN social_platforms s ON s.id = p.platform_id "
+            "LEFT JOIN subreddits r ON r.id = p.subreddit_id "
+            "ORDER BY p.id"
+        )).all()
+
+def test_batch_is_written_with_lookup_ids_and_compressed_content(engine):
+    writer = make_writer(engine, batch_size=3, compress_min_bytes=100)
+    writer.add(*post(1))
+    writer.add(*post(2, "reddit", subreddit="IoT", content="long body " * 50))
+    assert rows(engine) == []
+
+    writer.add(*post(3, "reddit", subreddit="IoT"))
+    # Compressed rows are inserted after the plain ones
+    written = {row.post_id: row for row in rows(engine)}
+    assert sorted(written) == ["reddit_2", "reddit_3", "twitter_1"]
+    assert [written[post_id].platform_name for post_id in ("twitter_1", "reddit_2", "reddit_3")] == ["twitter", "reddit", "reddit"]
+    assert [written[post_id].subreddit for post_id in ("twitter_1", "reddit_2", "reddit_3")] == [None, "IoT", "IoT"]
+    assert written["reddit_2"].content is None and written["reddit_2"].content_compressed is not None
+    assert post_content(written["reddit_2"]) == "long body " * 50
+    assert post_content(written["reddit_3"]) == "post 3"
+
+def test_close_writes_partial_batch(engine):
+    writer = make_writer(engine, batch_size=100)
+    writer.add(*post(1))
+    writer.close()
+    assert [row.post_id for row in rows(engine)] == ["twitter_1"]
+
+def test_setup_moves_platform_names_to_lookup_table(engine):
+    # A table from before the lookup and compression columns
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE social_media_posts (id INTEGER PRIMARY KEY, platform VARCHAR, post_id VARCHAR, "
+            "user_id VARCHAR, content VARCHAR, sentiment FLOAT, timestamp DATETIME)"
+        ))
+        connection.execute(text(
+            "INSERT INTO social_media_posts (platform, post_id, user_id, content) VALUES "
+            "('twitter', 'old_1', 'a', 'x'), ('reddit', 'old_2', 'b', 'y'), ('twitter', 'old_3', 'c', 'z')"
+        ))
+
+    writer = make_writer(engine)
+    writer.add(*post(4))
+    writer.flush()
+
+    written = rows(engine)
+    assert [row.post_id for row in written] == ["old_1", "old_2", "old_3", "twitter_4"]
+    assert [row.platform_name for row in written] == ["twitter", "reddit", "twitter", "twitter"]
+    assert all(row.platform is None for row in written)
+
+    # Running it again changes nothing
+    writer.setup()
+    assert rows(engine) == written
+
+def test_invalid_row_is_dropped_alone(engine):
+    writer = make_writer(engine, batch_size=100)
+    with engine.begin() as connection:
+        connection.execute(text("CREATE UNIQUE INDEX ix_test_post_id ON social_media_posts (post_id)"))
+    writer.add(*post(1))
+    writer.flush()
+
+    for index in (2, 1, 3):
+        writer.add(*post(index))
+    assert writer.flush() == 2
+    assert [row.post_id for row in rows(engine)] == ["twitter_1", "twitter_2", "twitter_3"]
+
+def test_batch_is_requeued_after_connection_error(engine):
+    writer = make_writer(engine, batch_size=1, flush_interval=60)
+    write = writer._write
+    failures = []
+
+    def failing_write(pending):
+        if not failures:
+            failures.append(len(pending))
+            raise OperationalError("INSERT", {}, Exception("database is unreachable"))
+        return write(pending)
+
+    writer._write = failing_write
+    writer.add(*post(1))
+    # Not retried before flush_interval has passed
+    writer.add(*post(2))
+    assert failures == [1]
+    assert rows(engine) == []
+
+    assert writer.flush() == 2
+    assert [row.post_id for row in rows(engine)] == ["twitter_1", "twitter_2"]
+
+def test_requeue_keeps_at_most_max_queued_posts(engine):
+    writer = make_writer(engine, batch_size=2, max_queued=3)
+
+    def unreachable(pending):
+        raise OperationalError("INSERT", {}, Exception("database is unreachable"))
+
+    writer._write = unreachable
+    for index in range(5):
+        writer._pending.append(post(index) + (None,))
+        writer.flush()
+    assert [data["id"] for _, data, _ in writer._pending] == ["twitter_2", "twitter_3", "twitter_4"]
+
+def test_on_written_reports_written_and_dropped_posts(engine):
+    writer = make_writer(engine, batch_size=100)
+    with engine.begin() as connection:
+        connection.execute(text("CREATE UNIQUE INDEX ix_test_post_id ON social_media_posts (post_id)"))
+    results = []
+    for index in (1, 1, 2):
+        writer.add(*post(index), on_written=lambda ok, index=index: results.append((index, ok)))
+    assert results == []
+
+    writer.flush()
+    assert sorted(results) == [(1, False), (1, True), (2, True)]
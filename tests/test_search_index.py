@@ -0,0 +1,59 @@
+import pytest
+from sqlalchemy import create_engine, text
+
+from src.database_manager import Base
+from src.post_writer import SocialPostWriter
+from src.search_index import FTS_TABLE, PostSearchIndex
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/posts.db")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+def write_posts(engine, *contents):
+    writer = SocialPostWriter(engine, batch_size=100, compress_min_bytes=100)
+    writer.setup()
+    for index, content in enumerate(contents):
+        writer.add("twitter", {"id": f"twitter_{index}", "user_id": "a", "content": content})
+    writer.flush()
+
+def search(index, query):
+    results, _ = index.search(query)
+    return sorted(result["content"] for result in results)
+
+def test_plain_and_compressed_posts_are_found_without_a_second_copy(engine):
+    index = PostSearchIndex(engine)
+    assert index.setup()
+    long_post = "smart home sensors " * 20
+    write_posts(engine, "smart home hub", long_post, "weather station")
+
+    assert search(index, "smart home") == sorted(["smart home hub", long_post])
+    assert search(index, "weather") == ["weather station"]
+
+    # A contentless FTS5 table has no shadow table holding the text
+    with engine.connect() as connection:
+        tables = connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'")).scalars().all()
+    assert f"{FTS_TABLE}_content" not in tables
+
+def test_deleted_posts_leave_the_index(engine):
+    index = PostSearchIndex(engine)
+    index.setup()
+    write_posts(engine, "smart home hub", "smart home sensors " * 20)
+
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM social_media_posts"))
+        connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('integrity-check')"))
+    assert search(index, "smart") == []
+
+def test_setup_replaces_an_index_that_stores_content(engine):
+    write_posts(engine, "smart home hub", "smart home sensors " * 20)
+    with engine.begin() as connection:
+        connection.execute(text(f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(content)"))
+
+    index = PostSearchIndex(engine)
+    index.setup()
+    # Idempotent once contentless
+    index.setup()
+    assert len(search(index, "smart home")) == 2
@@ -0,0 +1,33 @@
+import random
+import threading
+import time
+
+from src.write_coordinator import WriteCoordinator
+
+def test_writes_with_the_same_key_keep_their_order():
+    coordinator = WriteCoordinator(workers={"mongo": 4})
+    order = {key: [] for key in range(8)}
+    lock = threading.Lock()
+
+    def write(key, sequence):
+        time.sleep(random.random() / 1000)
+        with lock:
+            order[key].append(sequence)
+
+    for sequence in range(50):
+        for key in order:
+            coordinator.submit("mongo", write, key, sequence, key=key)
+    coordinator.close()
+
+    assert all(sequences == list(range(50)) for sequences in order.values())
+
+def test_group_completes_after_keyed_and_unkeyed_writes():
+    coordinator = WriteCoordinator(workers={"mongo": 4, "neo4j": 2})
+    results = []
+    with coordinator.group(results.append):
+        coordinator.submit("mongo", lambda: True, key="twitter:1")
+        coordinator.submit("mongo", lambda: False)
+        coordinator.submit("neo4j", lambda: True, key="alice")
+    coordinator.close()
+
+    assert results == [{"mongo": False, "neo4j": True}]